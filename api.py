@@ -0,0 +1,585 @@
+# api.py
+#
+# JSON API, /api/v1. Same session login and role rules as the pages.
+#
+#   GET /api/v1/projects                          managers, leads
+#   GET /api/v1/requirements?project_id=          managers, leads
+#   GET /api/v1/tasks?project_id=&status=&assigned_to=
+#                                                 all roles (developers: own tasks)
+#   GET /api/v1/dashboard                         all roles
+#   GET /api/v1/search?q=&kind=&limit=            all roles (see search.py)
+#   POST /api/v1/tasks/bulk                       leads (status, reassign, delete),
+#                                                 developers (status of own tasks)
+#   POST /api/v1/tasks/{id}/time-entries          developers (own tasks, see timelog.py)
+#   GET /api/v1/projects/{id}/effort              managers, leads
+#   GET /api/v1/developers/{id}/effort?weeks=     all roles (developers: themselves)
+#   GET /api/v1/projects/{id}/burndown?days=      managers, leads (see snapshots.py)
+#   GET /api/v1/projects/{id}/velocity?weeks=     managers, leads
+#   DELETE /api/v1/projects/{id}                  managers (queued, see purge.py)
+#   GET /api/v1/jobs/{id}                         the user who queued the job
+#
+# List endpoints take `fields=id,name,...` (default: every field), and
+# `cursor` / `page_size` for keyset pagination (newest first, see
+# pagination.py). They return:
+#
+#   {"data": [...], "next_cursor": "...", "prev_cursor": null}
+#
+# Only the requested columns are selected, rows stay plain tuples and are
+# dumped with the stdlib json encoder - no ORM objects, no pydantic models.
+
+import json
+from datetime import date, datetime, time, timezone
+from enum import Enum
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel
+
+from auth import api_role_required
+from bulk import bulk_change_tasks, lead_owns_task, developer_owns_task, BULK_ACTIONS, BULK_MAX_IDS
+from counters import get_counters, get_counter
+from database import get_db
+from models import Project, Requirement, Task, TaskStatus, User, UserRole, Job
+from purge import queue_project_delete
+from replica import read_replica
+from pagination import keyset_page, clamp_page_size
+from search import search, SEARCH_KINDS
+from snapshots import burndown, velocity, SNAPSHOT_MAX_DAYS, SNAPSHOT_MAX_WEEKS
+from stats import manager_dashboard_stats
+from timelog import log_time, entry_error, get_effort, developer_weeks
+
+API_PAGE_SIZE = 50
+EFFORT_MAX_WEEKS = 104
+
+router = APIRouter(prefix="/api/v1")
+
+
+# ==============================
+# RESOURCES
+# ==============================
+
+RESOURCE_FIELDS = {
+    "projects": {
+        "id": Project.id,
+        "name": Project.name,
+        "project_owner": Project.project_owner,
+        "created_by": Project.created_by,
+        "created_at": Project.created_at,
+        "updated_at": Project.updated_at,
+    },
+    "requirements": {
+        "id": Requirement.id,
+        "project_id": Requirement.project_id,
+        "requirement": Requirement.requirement,
+        "created_by": Requirement.created_by,
+        "created_at": Requirement.created_at,
+        "updated_at": Requirement.updated_at,
+    },
+    "tasks": {
+        "id": Task.id,
+        "project_id": Task.project_id,
+        "requirement_id": Task.requirement_id,
+        "task": Task.task,
+        "created_by": Task.created_by,
+        "assigned_to": Task.assigned_to,
+        "start_time": Task.start_time,
+        "end_time": Task.end_time,
+        "effort": Task.effort,
+        "status": Task.status,
+        "created_at": Task.created_at,
+        "updated_at": Task.updated_at,
+    },
+}
+
+# Needed for the keyset cursor even when not requested
+CURSOR_FIELDS = ("created_at", "id")
+
+
+def project_scope(request: Request):
+    user_id = request.session.get("user_id")
+    if request.session.get("role") == "PROJECT_MANAGER":
+        return Project.created_by == user_id
+    return Project.project_owner == user_id
+
+
+async def visible_project(db, request, project_id):
+    project = await db.scalar(
+        select(Project.id).filter(Project.id == project_id, project_scope(request))
+    )
+    if not project:
+        raise HTTPException(status_code=404)
+
+
+def parse_fields(resource, fields):
+    available = RESOURCE_FIELDS[resource]
+    if not fields:
+        return list(available)
+
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s) for {resource}: {', '.join(unknown)}"
+        )
+    return list(dict.fromkeys(requested))
+
+
+def select_fields(resource, fields):
+    available = RESOURCE_FIELDS[resource]
+    selected = fields + [name for name in CURSOR_FIELDS if name not in fields]
+    return select(*(available[name].label(name) for name in selected))
+
+
+# ==============================
+# SERIALIZATION
+# ==============================
+
+def _default(value):
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def json_response(payload):
+    return Response(
+        json.dumps(payload, default=_default, separators=(",", ":")),
+        media_type="application/json"
+    )
+
+
+async def list_response(db, query, model, fields, cursor, page_size):
+    rows, next_cursor, prev_cursor = await keyset_page(
+        db, query, model,
+        cursor=cursor,
+        page_size=clamp_page_size(page_size),
+        scalars=False
+    )
+
+    # Rows are (*fields, *cursor columns not requested); zip drops the extras
+    return json_response({
+        "data": [dict(zip(fields, row)) for row in rows],
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    })
+
+
+# ==============================
+# ENDPOINTS
+# ==============================
+
+@router.get("/projects")
+@api_role_required("PROJECT_MANAGER", "LEAD")
+@read_replica
+async def api_projects(
+    request: Request,
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    page_size: int = Query(API_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    fields = parse_fields("projects", fields)
+
+    query = select_fields("projects", fields).filter(project_scope(request))
+
+    return await list_response(db, query, Project, fields, cursor, page_size)
+
+
+@router.get("/requirements")
+@api_role_required("PROJECT_MANAGER", "LEAD")
+@read_replica
+async def api_requirements(
+    request: Request,
+    project_id: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    page_size: int = Query(API_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    fields = parse_fields("requirements", fields)
+
+    query = select_fields("requirements", fields).join(
+        Project, Project.id == Requirement.project_id
+    ).filter(project_scope(request))
+
+    if project_id:
+        query = query.filter(Requirement.project_id == project_id)
+
+    return await list_response(db, query, Requirement, fields, cursor, page_size)
+
+
+@router.get("/tasks")
+@api_role_required("PROJECT_MANAGER", "LEAD", "DEVELOPER")
+@read_replica
+async def api_tasks(
+    request: Request,
+    project_id: Optional[int] = Query(None),
+    status: Optional[str] = Query(None),
+    assigned_to: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    page_size: int = Query(API_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    fields = parse_fields("tasks", fields)
+
+    query = select_fields("tasks", fields)
+
+    if request.session.get("role") == "DEVELOPER":
+        query = query.filter(Task.assigned_to == request.session.get("user_id"))
+    else:
+        # Correlated EXISTS keeps the task rows un-joined
+        query = query.filter(exists().where(
+            Project.id == Task.project_id,
+            project_scope(request)
+        ))
+
+    if project_id:
+        query = query.filter(Task.project_id == project_id)
+
+    if assigned_to:
+        query = query.filter(Task.assigned_to == assigned_to)
+
+    if status:
+        if status not in TaskStatus.__members__:
+            raise HTTPException(status_code=400, detail="Unknown status")
+        query = query.filter(Task.status == TaskStatus[status])
+
+    return await list_response(db, query, Task, fields, cursor, page_size)
+
+
+@router.get("/dashboard")
+@api_role_required("PROJECT_MANAGER", "LEAD", "DEVELOPER")
+@read_replica
+async def api_dashboard(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    user_id = request.session.get("user_id")
+    role = request.session.get("role")
+
+    if role == "PROJECT_MANAGER":
+        return json_response(await manager_dashboard_stats(db, user_id))
+
+    if role == "DEVELOPER":
+        counter = await get_counter(db, "assignee", user_id)
+        counters = [counter]
+    else:
+        project_ids = (await db.execute(
+            select(Project.id).filter(Project.project_owner == user_id)
+        )).scalars().all()
+        counters = list((await get_counters(db, "project", project_ids)).values())
+
+    totals = {
+        column: sum(getattr(counter, column) for counter in counters)
+        for column in ("not_started", "in_progress", "completed")
+    }
+    total_tasks = sum(totals.values())
+
+    return json_response({
+        "total_tasks": total_tasks,
+        **totals,
+        "progress": int(totals["completed"] / total_tasks * 100) if total_tasks else 0,
+    })
+
+
+@router.get("/search")
+@api_role_required("PROJECT_MANAGER", "LEAD", "DEVELOPER")
+@read_replica
+async def api_search(
+    request: Request,
+    q: str = Query(...),
+    kind: Optional[List[str]] = Query(None),
+    limit: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    kinds = kind or list(SEARCH_KINDS)
+    unknown = [name for name in kinds if name not in SEARCH_KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail="kind must be tasks or requirements")
+
+    # {"tasks": [...], "requirements": [...]}, best match first; "snippet"
+    # is escaped HTML with the matched words in <mark>
+    return json_response(await search(
+        db, q,
+        request.session.get("user_id"),
+        request.session.get("role"),
+        kinds=kinds,
+        limit=limit
+    ))
+
+
+class BulkTaskRequest(BaseModel):
+    ids: List[int]
+    action: str
+    status: Optional[str] = None
+    assigned_to: Optional[int] = None
+
+
+@router.post("/tasks/bulk")
+@api_role_required("LEAD", "DEVELOPER")
+async def api_tasks_bulk(
+    request: Request,
+    body: BulkTaskRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    user_id = request.session.get("user_id")
+    is_lead = request.session.get("role") == "LEAD"
+
+    if body.action not in BULK_ACTIONS:
+        raise HTTPException(status_code=400, detail="action must be status, reassign or delete")
+
+    if not is_lead and body.action != "status":
+        raise HTTPException(status_code=403, detail="Developers can only change status")
+
+    if not body.ids or len(body.ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Send 1 to {BULK_MAX_IDS} task ids")
+
+    status = None
+    if body.action == "status":
+        if body.status not in TaskStatus.__members__:
+            raise HTTPException(status_code=400, detail="Unknown status")
+        status = TaskStatus[body.status]
+
+    if body.action == "reassign":
+        developer = await db.scalar(
+            select(User.id).filter(
+                User.id == body.assigned_to,
+                User.role == UserRole.DEVELOPER
+            )
+        )
+        if not developer:
+            raise HTTPException(status_code=400, detail="assigned_to must be a developer")
+
+    ownership = lead_owns_task(user_id) if is_lead else developer_owns_task(user_id)
+
+    results = await bulk_change_tasks(
+        db, body.ids, ownership, body.action,
+        status=status, assigned_to=body.assigned_to
+    )
+    await db.commit()
+
+    return json_response({
+        "results": [
+            {"id": task_id, "result": result}
+            for task_id, result in results.items()
+        ]
+    })
+
+
+# ==============================
+# TIME ENTRIES / EFFORT
+# ==============================
+
+class TimeEntryRequest(BaseModel):
+    started_at: datetime
+    duration_minutes: int
+
+
+@router.post("/tasks/{task_id}/time-entries")
+@api_role_required("DEVELOPER")
+async def api_log_time(
+    request: Request,
+    task_id: int,
+    body: TimeEntryRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    developer_id = request.session.get("user_id")
+
+    task = (await db.execute(
+        select(Task).filter(
+            Task.id == task_id,
+            Task.assigned_to == developer_id
+        )
+    )).scalars().first()
+
+    if not task:
+        raise HTTPException(status_code=404)
+
+    # Stored as naive UTC, like every other timestamp
+    started_at = body.started_at
+    if started_at.tzinfo is not None:
+        started_at = started_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    duration = body.duration_minutes * 60
+    error = entry_error(started_at, duration)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    entry = await log_time(db, task, developer_id, started_at, duration)
+    await db.commit()
+
+    response = json_response({
+        "id": entry.id,
+        "task_id": entry.task_id,
+        "developer_id": entry.developer_id,
+        "started_at": entry.started_at,
+        "duration_seconds": entry.duration_seconds,
+    })
+    response.status_code = 201
+    return response
+
+
+@router.get("/projects/{project_id}/effort")
+@api_role_required("PROJECT_MANAGER", "LEAD")
+@read_replica
+async def api_project_effort(
+    request: Request,
+    project_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    await visible_project(db, request, project_id)
+
+    requirement_ids = (await db.execute(
+        select(Requirement.id).filter(Requirement.project_id == project_id).order_by(Requirement.id)
+    )).scalars().all()
+
+    # Rollup rows only - no scan over the time entries
+    requirements = await get_effort(db, "requirement", requirement_ids)
+
+    return json_response({
+        "project_id": project_id,
+        **(await get_effort(db, "project", [project_id]))[project_id],
+        "requirements": [
+            {"id": requirement_id, **effort}
+            for requirement_id, effort in requirements.items()
+        ],
+    })
+
+
+@router.get("/developers/{developer_id}/effort")
+@api_role_required("PROJECT_MANAGER", "LEAD", "DEVELOPER")
+@read_replica
+async def api_developer_effort(
+    request: Request,
+    developer_id: int,
+    weeks: int = Query(12),
+    db: AsyncSession = Depends(get_db)
+):
+    if request.session.get("role") == "DEVELOPER":
+        if developer_id != request.session.get("user_id"):
+            raise HTTPException(status_code=404)
+    else:
+        developer = await db.scalar(
+            select(User.id).filter(
+                User.id == developer_id,
+                User.role == UserRole.DEVELOPER
+            )
+        )
+        if not developer:
+            raise HTTPException(status_code=404)
+
+    weeks = max(1, min(weeks, EFFORT_MAX_WEEKS))
+
+    return json_response({
+        "developer_id": developer_id,
+        **(await get_effort(db, "developer", [developer_id]))[developer_id],
+        "weeks": await developer_weeks(db, developer_id, weeks),
+    })
+
+
+# ==============================
+# HISTORY (burndown / velocity)
+# ==============================
+
+@router.get("/projects/{project_id}/burndown")
+@api_role_required("PROJECT_MANAGER", "LEAD")
+@read_replica
+async def api_project_burndown(
+    request: Request,
+    project_id: int,
+    days: int = Query(30),
+    db: AsyncSession = Depends(get_db)
+):
+    await visible_project(db, request, project_id)
+
+    # [{"day", "remaining", "completed", "total"}], oldest first; days
+    # before the first snapshot are left out
+    return json_response({
+        "project_id": project_id,
+        "days": await burndown(db, project_id, max(1, min(days, SNAPSHOT_MAX_DAYS))),
+    })
+
+
+@router.get("/projects/{project_id}/velocity")
+@api_role_required("PROJECT_MANAGER", "LEAD")
+@read_replica
+async def api_project_velocity(
+    request: Request,
+    project_id: int,
+    weeks: int = Query(8),
+    db: AsyncSession = Depends(get_db)
+):
+    await visible_project(db, request, project_id)
+
+    # [{"week": monday, "completed": n or null}]; null until the week and
+    # the one before it both have snapshots
+    return json_response({
+        "project_id": project_id,
+        "weeks": await velocity(db, project_id, max(1, min(weeks, SNAPSHOT_MAX_WEEKS))),
+    })
+
+
+# ==============================
+# PROJECT DELETE / JOBS
+# ==============================
+
+def job_payload(job):
+    return {
+        "id": job.id,
+        "name": job.name,
+        "status": job.status,
+        "attempts": job.attempts,
+        "progress": job.progress,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+@router.delete("/projects/{project_id}")
+@api_role_required("PROJECT_MANAGER")
+async def api_delete_project(
+    request: Request,
+    project_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    manager_id = request.session.get("user_id")
+
+    project = await db.scalar(
+        select(Project).filter(Project.id == project_id, Project.created_by == manager_id)
+    )
+    if not project:
+        raise HTTPException(status_code=404)
+
+    # 202: the project is deleted in batches by a job; poll /jobs/{id}
+    job = await queue_project_delete(db, project, manager_id)
+    await db.commit()
+
+    response = json_response(job_payload(job))
+    response.status_code = 202
+    return response
+
+
+@router.get("/jobs/{job_id}")
+@api_role_required("PROJECT_MANAGER", "LEAD", "DEVELOPER")
+async def api_job(
+    request: Request,
+    job_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    job = await db.scalar(
+        select(Job).filter(
+            Job.id == job_id,
+            Job.payload["requested_by"].as_integer() == request.session.get("user_id")
+        )
+    )
+    if not job:
+        raise HTTPException(status_code=404)
+
+    return json_response(job_payload(job))
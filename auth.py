@@ -0,0 +1,61 @@
+# auth.py
+#
+# Session role checks shared by the HTML pages and the JSON API.
+#
+# Both decorators read the same session keys set by /login; they only
+# differ in how they refuse: pages redirect, the API answers 401 / 403.
+
+from functools import wraps
+
+from fastapi import HTTPException, Request
+from fastapi.responses import RedirectResponse
+
+
+def session_access(request: Request, roles):
+    # None when allowed, otherwise "login" / "forbidden"
+    # Sessions from before tenants existed have no tenant_id: log in again
+    if "user_id" not in request.session or "tenant_id" not in request.session:
+        return "login"
+
+    if request.session.get("role") not in roles:
+        return "forbidden"
+
+    return None
+
+
+def role_required(*roles):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request: Request, *args, **kwargs):
+
+            denied = session_access(request, roles)
+
+            if denied == "login":
+                return RedirectResponse("/login", status_code=303)
+
+            if denied == "forbidden":
+                return RedirectResponse("/dashboard", status_code=303)
+
+            return await func(request, *args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def api_role_required(*roles):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request: Request, *args, **kwargs):
+
+            denied = session_access(request, roles)
+
+            if denied == "login":
+                raise HTTPException(status_code=401, detail="Not logged in")
+
+            if denied == "forbidden":
+                raise HTTPException(status_code=403, detail="Not allowed for this role")
+
+            return await func(request, *args, **kwargs)
+
+        return wrapper
+    return decorator
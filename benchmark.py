@@ -0,0 +1,76 @@
+# benchmark.py
+#
+# Concurrent throughput check for a running server.
+#
+#   uvicorn main:app --workers 1
+#   python benchmark.py --email lead@example.com --password secret \
+#       --path /lead-manager/dashboard --concurrency 50 --requests 1000
+#
+# Logs in once, then fires `--requests` GETs at `--path` with at most
+# `--concurrency` in flight and reports requests/sec and latency percentiles.
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+
+        # Login (session cookie is kept by the client)
+        response = await client.post(
+            "/login",
+            data={"email": args.email, "password": args.password}
+        )
+        if response.status_code != 303:
+            raise SystemExit(f"Login failed for {args.email}")
+
+        latencies = []
+        errors = 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(args.path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"path         {args.path}")
+    print(f"requests     {args.requests} (concurrency {args.concurrency})")
+    print(f"errors       {errors}")
+    print(f"elapsed      {elapsed:.2f}s")
+    print(f"throughput   {args.requests / elapsed:.1f} req/s")
+    print(f"latency p50  {percentile(0.50):.1f} ms")
+    print(f"latency p95  {percentile(0.95):.1f} ms")
+    print(f"latency max  {latencies[-1] * 1000:.1f} ms")
+    print(f"latency mean {statistics.mean(latencies) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent request benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--path", default="/dashboard")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
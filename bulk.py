@@ -0,0 +1,117 @@
+# bulk.py
+#
+# Set-based task changes: status, reassignment and delete for many task
+# ids in one statement.
+#
+#   WITH locked AS (
+#       SELECT tasks.id, <old values>, <project owner / creator>
+#       FROM tasks JOIN projects ...
+#       WHERE tasks.id = ANY(:ids) AND <ownership rule>
+#       FOR UPDATE OF tasks
+#   )
+#   UPDATE tasks SET ... FROM locked WHERE tasks.id = locked.id
+#   RETURNING <old values>, <new values>
+#
+# The ownership rule is the same as in the single-task handlers (leads:
+# Project.project_owner, developers: Task.assigned_to). Ids that are
+# missing or not the caller's come back as "not_found"; the caller cannot
+# tell the two apart. Counters, cached pages and live events (live.py) are
+# updated from the RETURNING rows in the same transaction.
+
+from sqlalchemy import select, update, delete, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from cache import mark_stale, project_tags
+from counters import record_task_changes
+from live import tasks_changed
+from models import Project, Task
+
+BULK_MAX_IDS = 1000
+
+BULK_ACTIONS = ("status", "reassign", "delete")
+
+
+def lead_owns_task(lead_id):
+    return Project.project_owner == lead_id
+
+
+def developer_owns_task(developer_id):
+    return Task.assigned_to == developer_id
+
+
+def _locked(ids, ownership):
+    return select(
+        Task.id,
+        Task.project_id,
+        Task.requirement_id,
+        Task.assigned_to,
+        Task.status,
+        Project.project_owner,
+        Project.created_by
+    ).join(Project, Project.id == Task.project_id).filter(
+        Task.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))),
+        ownership
+    ).with_for_update(of=Task).cte("locked")
+
+
+def _snapshot(project_id, requirement_id, assigned_to, status):
+    return {
+        "project": project_id,
+        "requirement": requirement_id,
+        "assignee": assigned_to,
+        "status": status,
+    }
+
+
+async def bulk_change_tasks(db, ids, ownership, action, status=None, assigned_to=None):
+    # Returns {task_id: "updated" / "deleted" / "not_found"}; caller commits
+    ids = sorted(set(ids))
+    locked = _locked(ids, ownership)
+
+    if action == "delete":
+        stmt = delete(Task).where(Task.id == locked.c.id)
+    else:
+        values = {"status": status} if action == "status" else {"assigned_to": assigned_to}
+        stmt = update(Task).where(Task.id == locked.c.id).values(**values)
+
+    stmt = stmt.returning(
+        locked.c.id,
+        locked.c.project_id,
+        locked.c.requirement_id,
+        locked.c.assigned_to,
+        locked.c.status,
+        locked.c.project_owner,
+        locked.c.created_by,
+        Task.assigned_to.label("new_assigned_to"),
+        Task.status.label("new_status")
+    ).execution_options(synchronize_session=False)
+
+    rows = (await db.execute(stmt)).all()
+
+    changes = []
+    tags = set()
+    events = {}
+    done = "deleted" if action == "delete" else "updated"
+    for row in rows:
+        before = _snapshot(row.project_id, row.requirement_id, row.assigned_to, row.status)
+        after = None
+        if action != "delete":
+            after = _snapshot(row.project_id, row.requirement_id, row.new_assigned_to, row.new_status)
+        changes.append((before, after))
+        row_tags = project_tags(row.project_id, row.project_owner, row.created_by)
+        tags.update(row_tags)
+
+        event = {"action": done, "task": row.id, "project": row.project_id}
+        if action != "delete":
+            event["status"] = row.new_status.name
+        if row.new_assigned_to != row.assigned_to:
+            event["changed"] = ["assigned_to"]
+        events.setdefault(row_tags, []).append(event)
+
+    await record_task_changes(db, changes)
+    mark_stale(db, *tags)
+    for row_tags, project_events in events.items():
+        tasks_changed(db, row_tags, project_events)
+
+    changed = {row.id for row in rows}
+    return {task_id: done if task_id in changed else "not_found" for task_id in ids}
@@ -0,0 +1,254 @@
+# cache.py
+#
+# Write-invalidated render cache for the heavy read pages.
+#
+# A cached page is stored under (view, user_id, project_id) together with
+# the tags it depends on:
+#
+#   "manager:<id>"  manager dashboard of that manager
+#   "lead:<id>"     lead dashboard of that lead
+#   "project:<id>"  project detail pages (manager and lead views)
+#
+# Write handlers call `mark_stale(db, ...)` / `mark_project_stale(db, project)`
+# before they commit. The tags are dropped from the cache right after the
+# commit succeeds (nothing happens on rollback).
+#
+# With RENDER_CACHE_NOTIFY=1 the tags are also sent with Postgres NOTIFY in
+# the same transaction, and every uvicorn worker listening on the channel
+# drops them too. NOTIFY is delivered on commit only, so other workers never
+# hear about writes that rolled back.
+#
+# On @read_replica pages a cache miss is rendered from the primary: a
+# lagging replica would otherwise put the pre-write page into the cache
+# under the new tag versions, for everyone, until the next write.
+#
+# A browser holding the replica.py "primary" cookie (it wrote a moment ago,
+# or a live page reloads after a change) skips the lookup: another worker
+# may not have had the invalidation yet.
+#
+# Settings (environment):
+#   RENDER_CACHE_SIZE    max cached pages per worker, 0 disables (default 512)
+#   RENDER_CACHE_NOTIFY  1 to propagate invalidations across workers
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from functools import wraps
+
+import asyncpg
+from fastapi import Request
+from fastapi.responses import HTMLResponse
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME, db_routing
+from replica import wants_primary
+
+logger = logging.getLogger(__name__)
+
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "512"))
+RENDER_CACHE_NOTIFY = os.getenv("RENDER_CACHE_NOTIFY", "0") == "1"
+
+NOTIFY_CHANNEL = "render_cache"
+
+# NOTIFY payloads must stay under 8000 bytes; a tag is at most 19
+# ("manager:<10 digits>,")
+NOTIFY_BATCH = 400
+
+
+# ==============================
+# LRU WITH TAGS
+# ==============================
+
+class RenderCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # key -> (body, tags)
+        self.tag_keys = {}             # tag -> set(keys)
+        self.tag_versions = {}         # tag -> int, bumped on invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def versions(self, tags):
+        return {tag: self.tag_versions.get(tag, 0) for tag in tags}
+
+    def put(self, key, body, tags, versions):
+        if self.max_entries <= 0:
+            return
+
+        # A write landed while we were rendering - the body may be stale
+        if self.versions(tags) != versions:
+            return
+
+        self._remove(key)
+        self.entries[key] = (body, tags)
+        for tag in tags:
+            self.tag_keys.setdefault(tag, set()).add(key)
+
+        while len(self.entries) > self.max_entries:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.tag_versions[tag] = self.tag_versions.get(tag, 0) + 1
+            for key in self.tag_keys.pop(tag, set()):
+                self._remove(key)
+
+    def clear(self):
+        for tag in list(self.tag_keys):
+            self.invalidate(tag)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self.tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tag_keys[tag]
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "notify": RENDER_CACHE_NOTIFY,
+        }
+
+
+render_cache = RenderCache(RENDER_CACHE_SIZE)
+
+
+# ==============================
+# VIEW DECORATOR
+# ==============================
+
+def cached_view(view, scope):
+    # scope: "manager" / "lead" -> tag on the session user,
+    #        "project"          -> tag on the project_id path parameter
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request: Request, *args, **kwargs):
+            user_id = request.session.get("user_id")
+            project_id = kwargs.get("project_id")
+
+            key = (view, user_id, project_id)
+            if scope == "project":
+                tags = (f"project:{project_id}",)
+            else:
+                tags = (f"{scope}:{user_id}",)
+
+            body = None if wants_primary(request) else render_cache.get(key)
+            if body is not None:
+                return HTMLResponse(body)
+
+            # Only hits come from the (possibly lagging) replica
+            routing = db_routing.get()
+            if routing is not None and render_cache.max_entries > 0:
+                routing.read_only = False
+
+            versions = render_cache.versions(tags)
+            response = await func(request, *args, **kwargs)
+
+            if response.status_code == 200 and hasattr(response, "body"):
+                render_cache.put(key, response.body, tags, versions)
+
+            return response
+
+        return wrapper
+    return decorator
+
+
+# ==============================
+# INVALIDATION FROM WRITES
+# ==============================
+
+def mark_stale(db, *tags):
+    db.info.setdefault("render_cache_tags", set()).update(tags)
+
+
+def project_tags(project_id, project_owner, created_by):
+    return (
+        f"project:{project_id}",
+        f"lead:{project_owner}",
+        f"manager:{created_by}"
+    )
+
+
+def mark_project_stale(db, project):
+    mark_stale(db, *project_tags(project.id, project.project_owner, project.created_by))
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_other_workers(session):
+    tags = session.info.get("render_cache_tags")
+    if tags and RENDER_CACHE_NOTIFY:
+        # A bulk change over many projects needs several
+        tags = sorted(tags)
+        for start in range(0, len(tags), NOTIFY_BATCH):
+            session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": NOTIFY_CHANNEL, "payload": ",".join(tags[start:start + NOTIFY_BATCH])}
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    tags = session.info.pop("render_cache_tags", None)
+    if tags:
+        render_cache.invalidate(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("render_cache_tags", None)
+
+
+# ==============================
+# LISTEN (cross-worker)
+# ==============================
+
+def _on_notify(connection, pid, channel, payload):
+    render_cache.invalidate(*payload.split(","))
+
+
+async def listen_for_invalidations():
+    # Runs for the lifetime of the app; reconnects if Postgres goes away.
+    # Everything cached before a reconnect is dropped - we may have missed
+    # notifications in between.
+    while True:
+        try:
+            conn = await asyncpg.connect(
+                user=DB_USER, password=DB_PASSWORD,
+                host=DB_HOST, port=DB_PORT, database=DB_NAME
+            )
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.warning("render cache listener: connect failed (%s), retrying", exc)
+            await asyncio.sleep(5)
+            continue
+
+        try:
+            render_cache.clear()
+            await conn.add_listener(NOTIFY_CHANNEL, _on_notify)
+
+            while not conn.is_closed():
+                await asyncio.sleep(5)
+        finally:
+            if not conn.is_closed():
+                await conn.close()
+
+        logger.warning("render cache listener: connection lost, reconnecting")
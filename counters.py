@@ -0,0 +1,186 @@
+# counters.py
+#
+# Per-project / per-requirement / per-assignee task status counters.
+#
+# Write handlers snapshot a task before and after they change it and call
+# `record_task_change` in the same transaction, so `task_counters` always
+# matches `tasks`. Dashboards read progress with `get_counters` instead of
+# loading every task.
+#
+# If the table ever drifts (manual SQL, a crash mid-deploy):
+#
+#   python counters.py rebuild
+
+import argparse
+
+from sqlalchemy import select, func, delete, insert, literal, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import SessionLocal
+from models import Task, TaskCounter, TaskStatus
+
+SCOPES = ("project", "requirement", "assignee")
+
+STATUS_COLUMNS = {
+    TaskStatus.NOT_STARTED: "not_started",
+    TaskStatus.IN_PROGRESS: "in_progress",
+    TaskStatus.COMPLETED: "completed",
+}
+
+
+# ==============================
+# WRITE SIDE
+# ==============================
+
+def task_snapshot(task):
+    # What the counters care about; None for "no task" (create / delete)
+    return {
+        "project": task.project_id,
+        "requirement": task.requirement_id,
+        "assignee": task.assigned_to,
+        "status": task.status or TaskStatus.NOT_STARTED,
+    }
+
+
+def _add_deltas(deltas, snapshot, sign):
+    if snapshot is None:
+        return
+
+    column = STATUS_COLUMNS[snapshot["status"]]
+
+    for scope in SCOPES:
+        scope_id = snapshot[scope]
+        if scope_id is None:
+            continue
+        row = deltas.setdefault((scope, scope_id), dict.fromkeys(STATUS_COLUMNS.values(), 0))
+        row[column] += sign
+
+
+async def record_task_change(db: AsyncSession, before, after):
+    await record_task_changes(db, [(before, after)])
+
+
+async def record_task_changes(db: AsyncSession, changes):
+    # changes: iterable of (before, after) snapshots, e.g. a bulk import
+    deltas = {}
+    for before, after in changes:
+        _add_deltas(deltas, before, -1)
+        _add_deltas(deltas, after, +1)
+
+    # Drop keys that cancel out (e.g. rename only)
+    rows = [
+        {"scope": scope, "scope_id": scope_id, **counts}
+        for (scope, scope_id), counts in sorted(deltas.items())
+        if any(counts.values())
+    ]
+
+    if not rows:
+        return
+
+    # One upsert for all affected scopes, sorted so concurrent writers
+    # lock rows in the same order
+    stmt = pg_insert(TaskCounter).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TaskCounter.scope, TaskCounter.scope_id],
+        set_={
+            column: getattr(TaskCounter, column) + getattr(stmt.excluded, column)
+            for column in STATUS_COLUMNS.values()
+        } | {"updated_at": func.now()}
+    )
+
+    await db.execute(stmt)
+
+
+# ==============================
+# READ SIDE
+# ==============================
+
+def empty_counter(scope, scope_id):
+    return TaskCounter(
+        scope=scope,
+        scope_id=scope_id,
+        not_started=0,
+        in_progress=0,
+        completed=0
+    )
+
+
+async def get_counters(db: AsyncSession, scope, scope_ids):
+    scope_ids = list(scope_ids)
+
+    counters = {
+        scope_id: empty_counter(scope, scope_id)
+        for scope_id in scope_ids
+    }
+
+    if scope_ids:
+        rows = (await db.execute(
+            select(TaskCounter).filter(
+                TaskCounter.scope == scope,
+                TaskCounter.scope_id.in_(scope_ids)
+            )
+        )).scalars().all()
+
+        for row in rows:
+            counters[row.scope_id] = row
+
+    return counters
+
+
+async def get_counter(db: AsyncSession, scope, scope_id):
+    return (await get_counters(db, scope, [scope_id]))[scope_id]
+
+
+# ==============================
+# REBUILD (repair drift)
+# ==============================
+
+def _rebuild_select(scope, column):
+    counts = [
+        func.count(Task.id).filter(
+            func.coalesce(
+                Task.status, literal(TaskStatus.NOT_STARTED, Task.status.type)
+            ) == status
+        ).label(name)
+        for status, name in STATUS_COLUMNS.items()
+    ]
+
+    return select(
+        literal(scope).label("scope"),
+        column.label("scope_id"),
+        *counts,
+        func.now().label("updated_at")
+    ).filter(column != None).group_by(column)
+
+
+def rebuild(db):
+    db.execute(delete(TaskCounter))
+    db.execute(
+        insert(TaskCounter).from_select(
+            ["scope", "scope_id", *STATUS_COLUMNS.values(), "updated_at"],
+            union_all(
+                _rebuild_select("project", Task.project_id),
+                _rebuild_select("requirement", Task.requirement_id),
+                _rebuild_select("assignee", Task.assigned_to)
+            )
+        )
+    )
+    db.commit()
+
+    return db.scalar(select(func.count()).select_from(TaskCounter))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task counters maintenance")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        with SessionLocal() as db:
+            rows = rebuild(db)
+        print(f"Rebuilt task_counters: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
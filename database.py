@@ -1,29 +1,126 @@
 # database.py
+import os
+
+from contextvars import ContextVar
+
+from fastapi import Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
 
 # ==============================
 # DATABASE CONFIGURATION
 # ==============================
+#
+# Everything comes from the environment (defaults: local development).
+#
+#   DB_USER / DB_PASSWORD / DB_HOST / DB_PORT / DB_NAME
+#   DB_REPLICA_HOST          read replica; unset = every query on the primary
+#   DB_REPLICA_PORT          default DB_PORT
+#   DB_REPLICA_NAME          default DB_NAME
+#   DB_POOL_SIZE             pooled connections per worker (default 5)
+#   DB_MAX_OVERFLOW          extra connections under load (default 10)
+#   DB_POOL_TIMEOUT          seconds to wait for a free connection (default 30)
+#   DB_POOL_RECYCLE          reconnect after this many seconds (default 1800)
+#   DB_POOL_PRE_PING         1 = test connections on checkout (default 1)
+#   DB_STATEMENT_TIMEOUT_MS  per-statement limit for the app, 0 = none (default 0)
+#
+# The pool and timeout settings apply to the app engines (primary and
+# replica); the sync engine used by migrations and scripts keeps the
+# SQLAlchemy defaults and no statement timeout.
+
+DB_USER = os.getenv("DB_USER", "project_user")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "project_pass")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_NAME = os.getenv("DB_NAME", "project_management")
+
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+DB_REPLICA_NAME = os.getenv("DB_REPLICA_NAME", DB_NAME)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+DATABASE_URL = URL.create(
+    "postgresql", DB_USER, DB_PASSWORD, DB_HOST, int(DB_PORT), DB_NAME
+)
+ASYNC_DATABASE_URL = URL.create(
+    "postgresql+asyncpg", DB_USER, DB_PASSWORD, DB_HOST, int(DB_PORT), DB_NAME
+)
+
+# SQL_ECHO=1 logs every statement (local debugging only). In the app use
+# per-request tracing instead, see sqltrace.py
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+
+
+def create_app_engine(url):
+    server_settings = {"application_name": "project-management"}
+    if DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
 
+    return create_async_engine(
+        url,
+        echo=SQL_ECHO,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={"server_settings": server_settings}
+    )
 
-DB_USER = "project_user"
-DB_PASSWORD = "project_pass"
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DB_NAME = "project_management"
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Sync engine (psycopg2) - used for schema setup and command line scripts
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
 
-engine = create_engine(DATABASE_URL, echo=True)  # echo prints SQL statements
-print("Engine",engine)
+# Async engine (asyncpg) - used by every FastAPI route
+async_engine = create_app_engine(ASYNC_DATABASE_URL)
 
+# Read replica (asyncpg) - only used by handlers marked @read_replica,
+# see replica.py
+replica_engine = None
+if DB_REPLICA_HOST:
+    replica_engine = create_app_engine(URL.create(
+        "postgresql+asyncpg", DB_USER, DB_PASSWORD,
+        DB_REPLICA_HOST, int(DB_REPLICA_PORT), DB_REPLICA_NAME
+    ))
+
+# Engines serving requests (event hooks in sqltrace.py / loading.py)
+APP_ENGINES = tuple(e for e in (async_engine, replica_engine) if e is not None)
 
 
 # ==============================
 # SESSION CONFIGURATION
 # ==============================
 
+# Set per request by replica.ReplicaRoutingMiddleware; None outside requests
+db_routing = ContextVar("db_routing", default=None)
+
+
+class RoutingSession(Session):
+    # Reads of a @read_replica handler go to the replica, unless the user
+    # wrote something a moment ago (read-your-writes). Flushes and
+    # INSERT / UPDATE / DELETE always go to the primary.
+    def get_bind(self, mapper=None, clause=None, **kw):
+        routing = db_routing.get()
+        if (
+            replica_engine is not None
+            and routing is not None
+            and routing.use_replica
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+        ):
+            return replica_engine.sync_engine
+        return async_engine.sync_engine
+
+
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
@@ -31,6 +128,15 @@ SessionLocal = sessionmaker(
     future=True
 )
 
+# expire_on_commit=False so objects stay readable after commit
+# (an expired attribute would need a lazy load, which async sessions can't do)
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # ==============================
 # BASE CLASS FOR MODELS
 # ==============================
@@ -41,9 +147,16 @@ Base = declarative_base()
 # DEPENDENCY (For FastAPI)
 # ==============================
 
-def get_db():
+async def get_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        # Scopes every query to the logged-in user's tenant (tenancy.py)
+        db.info["tenant_id"] = request.session.get("tenant_id")
+        yield db
+
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
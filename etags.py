@@ -0,0 +1,166 @@
+# etags.py
+#
+# Conditional GET (ETag / If-None-Match) for the heavy read pages.
+#
+# Each page has a "stamp" query: max(updated_at) and row counts over exactly
+# the rows the page shows. It is one small indexed round trip. The ETag is a
+# hash of the stamp plus everything else the HTML depends on (user, role and
+# name from the session, template files). When the browser sends the ETag
+# back and nothing changed, we answer 304 before the page's own queries
+# and the Jinja render run.
+#
+# Counts are part of the stamp because a DELETE leaves max(updated_at) as
+# it was. For the same reason If-Modified-Since alone is not trusted:
+# Last-Modified is sent for information, If-None-Match decides.
+#
+# Usage:
+#
+#   @app.get("/lead-manager/projects/{project_id}")
+#   @role_required("LEAD")
+#   @conditional_view("lead_project_detail", lead_project_stamp)
+#   async def lead_project_detail(request, project_id, db = Depends(get_db)):
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from functools import wraps
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import select, func, literal
+
+from models import Project, Requirement, Task
+from schedule import calendar_window, lead_calendar_filter
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+
+
+def _template_version():
+    # A deploy that changes a template must not be answered with 304
+    return max(
+        (int(path.stat().st_mtime) for path in TEMPLATE_DIR.glob("*.html")),
+        default=0
+    )
+
+
+TEMPLATE_VERSION = _template_version()
+
+
+# ==============================
+# STAMPS
+# ==============================
+
+def _project_stamp(project_filter, project_id):
+    project_rows = select(
+        func.max(Project.updated_at)
+    ).filter(Project.id == project_id, project_filter)
+
+    requirement_rows = Requirement.project_id == project_id
+    task_rows = Task.project_id == project_id
+
+    return select(
+        project_rows.scalar_subquery(),
+        select(func.max(Requirement.updated_at)).filter(requirement_rows).scalar_subquery(),
+        select(func.count(Requirement.id)).filter(requirement_rows).scalar_subquery(),
+        select(func.max(Task.updated_at)).filter(task_rows).scalar_subquery(),
+        select(func.count(Task.id)).filter(task_rows).scalar_subquery(),
+    )
+
+
+def manager_project_stamp(user_id, project_id, **_):
+    return _project_stamp(Project.created_by == user_id, project_id)
+
+
+def lead_project_stamp(user_id, project_id, **_):
+    return _project_stamp(Project.project_owner == user_id, project_id)
+
+
+def developer_dashboard_stamp(user_id, **_):
+    # Project names are shown next to each task
+    return select(
+        func.max(Task.updated_at),
+        func.max(Project.updated_at),
+        func.count(Task.id)
+    ).join(Project).filter(Task.assigned_to == user_id)
+
+
+def lead_calendar_stamp(user_id, view="month", start=None, **_):
+    # The window is part of the stamp: without ?start= it moves with today
+    window = calendar_window(view, start)
+    return select(
+        literal(window.start.isoformat()),
+        func.max(Task.updated_at),
+        func.max(Project.updated_at),
+        func.count(Task.id)
+    ).join(Project).filter(
+        lead_calendar_filter(user_id, window)
+    )
+
+
+# ==============================
+# VIEW DECORATOR
+# ==============================
+
+def _make_etag(view, session, stamp_row):
+    key = repr((
+        view,
+        session.get("user_id"),
+        session.get("role"),
+        session.get("name"),
+        TEMPLATE_VERSION,
+        tuple(stamp_row)
+    ))
+    return 'W/"%s"' % hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def _last_modified(stamp_row):
+    stamps = [value for value in stamp_row if isinstance(value, datetime)]
+    if not stamps:
+        return None
+    # updated_at is naive UTC
+    return format_datetime(max(stamps).replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" are the same validator
+    opaque = etag[2:]
+    # "*" is not honoured: the stamp cannot tell a missing page from an empty one
+    return any(candidate.removeprefix("W/") == opaque for candidate in candidates)
+
+
+def conditional_view(view, stamp):
+    # stamp(user_id, **path_and_query_params) -> SELECT returning one row
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(request: Request, *args, **kwargs):
+            db = kwargs["db"]
+            params = {name: value for name, value in kwargs.items() if name != "db"}
+
+            stamp_row = (await db.execute(
+                stamp(request.session.get("user_id"), **params)
+            )).one()
+
+            etag = _make_etag(view, request.session, stamp_row)
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+            last_modified = _last_modified(stamp_row)
+            if last_modified:
+                headers["Last-Modified"] = last_modified
+
+            if _matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+
+            response = await func(request, *args, **kwargs)
+
+            # Only successful pages get a validator (never a 404 / redirect)
+            if response.status_code == 200:
+                response.headers.update(headers)
+
+            return response
+
+        return wrapper
+    return decorator
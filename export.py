@@ -0,0 +1,183 @@
+# export.py
+#
+# Streaming CSV / NDJSON export of projects, requirements and tasks.
+#
+# Rows are fetched through a server-side cursor (`yield_per`) in batches
+# of EXPORT_BATCH_SIZE, encoded and sent to the client batch by batch, so
+# memory stays flat whatever the size of the portfolio. With gzip the
+# encoded batches go through one zlib stream on the way out.
+#
+# The task export uses the importer's column names (task, requirement_id,
+# assignee_email, start_time, end_time, status), so a project's export can
+# be imported back into that project (e.g. after editing it). The
+# requirement_ids are that project's own: the importer rejects rows whose
+# requirement belongs to another project.
+#
+# The generator opens its own session (scoped to the caller's tenant): the
+# response body is produced after the route has returned and its request
+# session may already be closed.
+
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import date, time
+from enum import Enum
+
+from sqlalchemy import select
+
+from database import AsyncSessionLocal
+from models import Project, Requirement, Task, User
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+# ==============================
+# QUERIES
+# ==============================
+
+def _projects(scope_filter):
+    return select(
+        Project.id,
+        Project.name,
+        User.email.label("owner_email"),
+        Project.created_at,
+        Project.updated_at
+    ).outerjoin(
+        User, User.id == Project.project_owner
+    ).filter(scope_filter).order_by(Project.id)
+
+
+def _requirements(scope_filter):
+    return select(
+        Requirement.id,
+        Requirement.project_id,
+        Requirement.requirement,
+        Requirement.created_at,
+        Requirement.updated_at
+    ).join(Project).filter(scope_filter).order_by(
+        Requirement.project_id, Requirement.id
+    )
+
+
+def _tasks(scope_filter):
+    # Same order as ix_tasks_project_created_at_id: no sort step
+    return select(
+        Task.id,
+        Task.project_id,
+        Task.requirement_id,
+        Task.task,
+        User.email.label("assignee_email"),
+        Task.start_time,
+        Task.end_time,
+        Task.effort,
+        Task.status,
+        Task.created_at,
+        Task.updated_at
+    ).join(
+        Project, Project.id == Task.project_id
+    ).outerjoin(
+        User, User.id == Task.assigned_to
+    ).filter(scope_filter).order_by(
+        Task.project_id, Task.created_at, Task.id
+    )
+
+
+EXPORT_KINDS = {
+    "projects": _projects,
+    "requirements": _requirements,
+    "tasks": _tasks,
+}
+
+
+def export_query(kind, scope_filter, project_id=None):
+    if project_id is not None:
+        scope_filter = scope_filter & (Project.id == project_id)
+    return EXPORT_KINDS[kind](scope_filter)
+
+
+# ==============================
+# ENCODING
+# ==============================
+
+def _value(value):
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+class _CsvEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self):
+        self.writer.writerow(self.columns)
+        return self._take()
+
+    def rows(self, rows):
+        self.writer.writerows([_value(value) for value in row] for row in rows)
+        return self._take()
+
+    def _take(self):
+        text = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return text
+
+
+class _NdjsonEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self):
+        return ""
+
+    def rows(self, rows):
+        return "".join(
+            json.dumps(dict(zip(self.columns, map(_value, row))), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+ENCODERS = {
+    "csv": _CsvEncoder,
+    "ndjson": _NdjsonEncoder,
+}
+
+
+async def stream_export(query, fmt="csv", compress=False, tenant_id=None):
+    # gzip container (wbits=31), one stream for the whole response
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def output(text):
+        data = text.encode()
+        return compressor.compress(data) if compressor else data
+
+    async with AsyncSessionLocal() as db:
+        db.info["tenant_id"] = tenant_id
+        result = await db.stream(
+            query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        encoder = ENCODERS[fmt](list(result.keys()))
+
+        data = output(encoder.header())
+        if data:
+            yield data
+
+        async for partition in result.partitions():
+            data = output(encoder.rows(partition))
+            if data:
+                yield data
+
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,420 @@
+# importer.py
+#
+# Bulk task import into one project, from CSV or JSON lines.
+#
+#   python importer.py backlog.csv --project 12
+#   python importer.py backlog.jsonl --project 12 --skip-invalid
+#   python importer.py backlog.csv --project 12 --dry-run
+#
+# or POST the file to /lead-manager/projects/{id}/tasks/import (lead only).
+#
+# Columns / keys:
+#
+#   task            required, up to 255 characters
+#   requirement_id  required, a requirement of the same project
+#   assignee_email  optional, must be a developer
+#   start_time      optional, ISO 8601
+#   end_time        optional, ISO 8601, not before start_time
+#   status          optional, NOT_STARTED / IN_PROGRESS / COMPLETED
+#                   (or "Not Started", ...), default NOT_STARTED
+#
+# The file is read and validated in chunks of IMPORT_CHUNK_SIZE rows, in a
+# worker thread (reading an upload and parsing are blocking, and would
+# otherwise hold up every other request on the event loop).
+# Requirements and developers are resolved with one lookup per chunk
+# (only for values not seen in an earlier chunk). Valid rows go to
+# Postgres with COPY, and the task counters are updated once per chunk.
+#
+# Everything happens in one transaction. By default a single bad row
+# rolls the whole import back; --skip-invalid loads the good rows. Either
+# way the report lists every bad row by line number (the first
+# IMPORT_MAX_ERRORS of them). A file that can't be read on (not UTF-8,
+# broken CSV quoting) is reported at that line and never loads.
+#
+# An import of IMPORT_ANALYZE_ROWS rows or more also queues a "db.analyze"
+# job (jobs.py), so the planner sees the new rows without waiting for
+# autovacuum.
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from itertools import islice
+
+import asyncpg
+from sqlalchemy import select
+
+from cache import mark_project_stale, project_tags
+from counters import record_task_changes
+from live import tasks_changed
+from jobs import enqueue
+from database import AsyncSessionLocal
+from models import Project, Requirement, User, UserRole, TaskStatus
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+IMPORT_ANALYZE_ROWS = int(os.getenv("IMPORT_ANALYZE_ROWS", "10000"))
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+COPY_COLUMNS = [
+    "tenant_id", "task", "project_id", "requirement_id", "created_by", "assigned_to",
+    "start_time", "end_time", "status", "created_at", "updated_at",
+]
+
+STATUSES = {
+    key: status
+    for status in TaskStatus
+    for key in (status.name.lower(), status.value.lower())
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.valid = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+        self.committed = False
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "valid": self.valid,
+            "imported": self.imported,
+            "invalid": self.error_count,
+            "committed": self.committed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+
+def detect_format(filename):
+    if filename and filename.lower().endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+
+# ==============================
+# PARSING / VALIDATION
+# ==============================
+
+def read_rows(stream, fmt):
+    # Yields (line_number, dict), or (line_number, RowError) for lines
+    # that cannot be parsed at all
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, RowError("invalid JSON")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError("expected a JSON object")
+            continue
+        yield line_number, row
+
+
+def _text(row, key):
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _datetime(row, key):
+    value = _text(row, key)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"{key}: not an ISO 8601 datetime")
+
+
+def parse_row(row):
+    task = _text(row, "task")
+    if not task:
+        raise RowError("task: required")
+    if len(task) > 255:
+        raise RowError("task: longer than 255 characters")
+
+    try:
+        requirement_id = int(_text(row, "requirement_id") or "")
+    except ValueError:
+        raise RowError("requirement_id: required integer")
+
+    start_time = _datetime(row, "start_time")
+    end_time = _datetime(row, "end_time")
+    if start_time and end_time and end_time < start_time:
+        raise RowError("end_time: before start_time")
+
+    status = TaskStatus.NOT_STARTED
+    status_text = _text(row, "status")
+    if status_text:
+        status = STATUSES.get(status_text.lower())
+        if status is None:
+            raise RowError(f"status: unknown value {status_text!r}")
+
+    email = _text(row, "assignee_email")
+    return {
+        "task": task,
+        "requirement_id": requirement_id,
+        "assignee_email": email,
+        "start_time": start_time,
+        "end_time": end_time,
+        "status": status,
+    }
+
+
+# ==============================
+# LOADING
+# ==============================
+
+class _Lookups:
+    # Requirement ids / developer emails already resolved in earlier chunks
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.requirements = {}   # id -> bool (belongs to the project)
+        self.developers = {}     # email -> user id or None
+
+    async def resolve(self, db, parsed):
+        new_requirements = {
+            row["requirement_id"] for row in parsed
+        } - self.requirements.keys()
+        new_emails = {
+            row["assignee_email"] for row in parsed if row["assignee_email"]
+        } - self.developers.keys()
+
+        if new_requirements:
+            found = set((await db.execute(
+                select(Requirement.id).filter(
+                    Requirement.id.in_(new_requirements),
+                    Requirement.project_id == self.project_id
+                )
+            )).scalars().all())
+            for requirement_id in new_requirements:
+                self.requirements[requirement_id] = requirement_id in found
+
+        if new_emails:
+            found = dict((await db.execute(
+                select(User.email, User.id).filter(
+                    User.email.in_(new_emails),
+                    User.role == UserRole.DEVELOPER
+                )
+            )).all())
+            for email in new_emails:
+                self.developers[email] = found.get(email)
+
+
+async def _copy(db, records):
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    driver = raw.driver_connection
+
+    # The lookups above already opened the session's transaction on this
+    # connection; COPY outside it would autocommit
+    if not driver.is_in_transaction():
+        raise RuntimeError("COPY must run inside the import transaction")
+
+    await driver.copy_records_to_table("tasks", records=records, columns=COPY_COLUMNS)
+
+
+def _parse_chunk(rows, last_line):
+    # Blocking: reads the next chunk from the stream and validates it.
+    # Returns (line numbers read, [(line, parsed row)], [(line, error)],
+    # (line, error) if the rest of the file can't be read, else None)
+    chunk = []
+    fatal = None
+    try:
+        for item in islice(rows, IMPORT_CHUNK_SIZE):
+            chunk.append(item)
+    except UnicodeDecodeError:
+        fatal = "file is not UTF-8 text (at or after this line)"
+    except csv.Error as exc:
+        fatal = f"not valid CSV: {exc}"
+    if fatal:
+        fatal = (chunk[-1][0] + 1 if chunk else last_line + 1, fatal)
+
+    parsed = []
+    errors = []
+    for line_number, row in chunk:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            parsed.append((line_number, parse_row(row)))
+        except RowError as exc:
+            errors.append((line_number, str(exc)))
+    return [line_number for line_number, _ in chunk], parsed, errors, fatal
+
+
+async def import_tasks(db, project, created_by, stream, fmt="csv",
+                       skip_invalid=False, dry_run=False):
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"unknown import format {fmt!r}")
+
+    report = ImportReport()
+    lookups = _Lookups(project.id)
+    now = datetime.utcnow()
+    rows = read_rows(stream, fmt)
+    loading = not dry_run
+    last_line = 0
+
+    while True:
+        # One chunk at a time, so the thread never touches the generator
+        # while the loop does
+        lines, parsed, errors, fatal = await asyncio.to_thread(_parse_chunk, rows, last_line)
+        if lines:
+            last_line = lines[-1]
+
+        report.rows += len(lines)
+        for line_number, message in errors:
+            report.add_error(line_number, message)
+        if fatal:
+            report.add_error(*fatal)
+            loading = False
+        if not lines:
+            break
+
+        await lookups.resolve(db, [row for _, row in parsed])
+
+        records = []
+        snapshots = []
+        for line_number, row in parsed:
+            if not lookups.requirements[row["requirement_id"]]:
+                report.add_error(line_number, "requirement_id: not a requirement of this project")
+                continue
+
+            assigned_to = None
+            if row["assignee_email"]:
+                assigned_to = lookups.developers[row["assignee_email"]]
+                if assigned_to is None:
+                    report.add_error(line_number, "assignee_email: no developer with this email")
+                    continue
+
+            records.append((
+                project.tenant_id, row["task"], project.id, row["requirement_id"],
+                created_by, assigned_to, row["start_time"], row["end_time"],
+                row["status"].name, now, now,
+            ))
+            snapshots.append((None, {
+                "project": project.id,
+                "requirement": row["requirement_id"],
+                "assignee": assigned_to,
+                "status": row["status"],
+            }))
+
+        report.valid += len(records)
+
+        # All-or-nothing: after the first bad row keep validating for the
+        # report, but stop loading
+        if report.error_count and not skip_invalid:
+            loading = False
+
+        if loading and records:
+            try:
+                await _copy(db, records)
+            except asyncpg.PostgresError as exc:
+                first, last = lines[0], lines[-1]
+                report.add_error(first, f"lines {first}-{last} rejected by the database: {exc}")
+                loading = False
+                break
+
+            await record_task_changes(db, snapshots)
+            report.imported += len(records)
+
+        if fatal:
+            break
+
+    if loading and report.imported:
+        mark_project_stale(db, project)
+        # One event for the whole file, not one per row
+        tasks_changed(
+            db, project_tags(project.id, project.project_owner, project.created_by),
+            [{"action": "imported", "project": project.id, "count": report.imported}]
+        )
+        if report.imported >= IMPORT_ANALYZE_ROWS:
+            enqueue(db, "db.analyze", {"tables": ["tasks", "task_counters"]})
+        await db.commit()
+        report.committed = True
+    else:
+        await db.rollback()
+        report.imported = 0
+
+    return report
+
+
+# ==============================
+# CLI
+# ==============================
+
+async def _run(args):
+    async with AsyncSessionLocal() as db:
+        project = await db.get(Project, args.project)
+        if not project:
+            print(f"Project {args.project} not found")
+            return False
+
+        # Requirement / developer lookups stay inside the project's tenant
+        db.info["tenant_id"] = project.tenant_id
+
+        fmt = args.format or detect_format(args.file)
+        created_by = project.project_owner or project.created_by
+
+        if args.file == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+            report = await import_tasks(db, project, created_by, stream, fmt, args.skip_invalid, args.dry_run)
+        else:
+            with open(args.file, encoding="utf-8-sig", newline="") as stream:
+                report = await import_tasks(db, project, created_by, stream, fmt, args.skip_invalid, args.dry_run)
+
+    for error in report.errors:
+        print(f"line {error['line']}: {error['error']}")
+
+    if args.dry_run:
+        print(f"Dry run: {report.rows} rows, {report.valid} valid, {report.error_count} invalid")
+        return not report.error_count
+
+    state = "committed" if report.committed else "rolled back"
+    print(f"{report.rows} rows, {report.imported} imported, {report.error_count} invalid ({state})")
+    return report.committed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk task import")
+    parser.add_argument("file", help="CSV or JSON lines file, - for stdin")
+    parser.add_argument("--project", type=int, required=True)
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="default: from the file name")
+    parser.add_argument("--skip-invalid", action="store_true", help="load the valid rows anyway")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    args = parser.parse_args()
+
+    if not asyncio.run(_run(args)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
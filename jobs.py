@@ -0,0 +1,485 @@
+# jobs.py
+#
+# Background jobs, kept in Postgres (`jobs` table).
+#
+# Request handlers call `enqueue(db, name, payload)` for follow-up work that
+# does not have to be done before the redirect. The job row is added to
+# the request's own transaction, so it exists exactly when the request's
+# changes were committed. Workers pick jobs up later:
+#
+#   UPDATE jobs SET status = 'running', ...
+#   WHERE id IN (SELECT id FROM jobs WHERE queue = :queue AND status = 'queued'
+#                AND run_at <= :now ORDER BY run_at LIMIT :free
+#                FOR UPDATE SKIP LOCKED)
+#
+# Each queue has a concurrency limit for the whole cluster (JOB_QUEUES):
+# a claim takes a per-queue advisory lock, counts the queue's running jobs
+# and only claims the free slots. A failed job goes back to the queue with
+# exponential backoff (plus jitter) until it has used up its attempts, then
+# stays as `failed` with the last error. Jobs of a worker that died are
+# requeued once they have been running for JOB_TIMEOUT + a minute.
+#
+# Handlers are registered with @job(name, queue=...) and get their own
+# session: `await handler(db, **payload)`. Job sessions have no tenant
+# (see tenancy.py) - a handler that works for one tenant sets
+# db.info["tenant_id"] itself. Long handlers call `report_progress(...)`;
+# the values show up in the job's `progress` column (and `jobs.py stats`).
+#
+# Workers run inside the app (JOB_WORKERS > 0) or on their own:
+#
+#   python jobs.py work                       # every queue
+#   python jobs.py work --queue maintenance
+#   python jobs.py enqueue counters.rebuild
+#   python jobs.py stats
+#
+# Settings (environment):
+#   JOB_WORKERS           jobs run at once by the app process, 0 = none (default 2)
+#   JOB_QUEUES            queue=limit list for the cluster (default "default=4,maintenance=1")
+#   JOB_POLL_SECONDS      idle wait between claims (default 1)
+#   JOB_TIMEOUT_SECONDS   longest run of a single job (default 300)
+#   JOB_MAX_ATTEMPTS      default attempts per job (default 5)
+#   JOB_KEEP_DAYS         finished jobs are purged after this (default 7)
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, SessionLocal, engine
+from models import Base, Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_TIMEOUT_SECONDS = int(os.getenv("JOB_TIMEOUT_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_KEEP_DAYS = int(os.getenv("JOB_KEEP_DAYS", "7"))
+
+
+def parse_queues(value):
+    # "default=4,maintenance=1" -> {"default": 4, "maintenance": 1}
+    queues = {}
+    for item in value.split(","):
+        if item.strip():
+            name, _, limit = item.partition("=")
+            queues[name.strip()] = int(limit or 1)
+    return queues
+
+
+JOB_QUEUES = parse_queues(os.getenv("JOB_QUEUES", "default=4,maintenance=1"))
+
+# Retry delays: 10s, 20s, 40s, ... at most an hour, each 50-100% of that
+JOB_BACKOFF_SECONDS = 10
+JOB_BACKOFF_MAX_SECONDS = 3600
+
+# A running job older than this lost its worker
+JOB_STALE_AFTER = timedelta(seconds=JOB_TIMEOUT_SECONDS + 60)
+JOB_REAP_SECONDS = 60
+
+# pg_advisory_xact_lock(key, hashtext(queue)) for claims ("jobs"),
+# pg_try_advisory_xact_lock(key, 0) for the reaper
+JOB_LOCK_KEY = 0x6A6F6273
+
+JOB_ERROR_MAX_LENGTH = 2000
+
+
+# ==============================
+# HANDLERS
+# ==============================
+
+HANDLERS = {}
+
+# Id of the job the current task is running (set by JobWorker.execute)
+current_job = ContextVar("current_job", default=None)
+
+
+class JobHandler:
+    def __init__(self, name, func, queue, max_attempts):
+        self.name = name
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+
+
+def job(name, queue="default", max_attempts=None):
+    def decorator(func):
+        HANDLERS[name] = JobHandler(name, func, queue, max_attempts or JOB_MAX_ATTEMPTS)
+        return func
+
+    return decorator
+
+
+def enqueue(db, name, payload=None, queue=None, delay=None, max_attempts=None):
+    # Adds the job to the caller's transaction; the caller commits
+    handler = HANDLERS.get(name)
+    if handler is None:
+        raise ValueError(f"unknown job {name!r}")
+
+    queue = queue or handler.queue
+    if queue not in JOB_QUEUES:
+        raise ValueError(f"unknown job queue {queue!r}")
+
+    new_job = Job(
+        queue=queue,
+        name=name,
+        payload=payload or {},
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or handler.max_attempts,
+        run_at=datetime.utcnow() + (delay or timedelta()),
+        created_at=datetime.utcnow()
+    )
+    db.add(new_job)
+    return new_job
+
+
+async def report_progress(**progress):
+    # Saved right away, in its own transaction; a no-op outside a job
+    job_id = current_job.get()
+    if job_id is None:
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Job).filter(Job.id == job_id).values(progress=progress)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
+def backoff(attempts):
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+# ==============================
+# CLAIM / FINISH
+# ==============================
+
+async def claim(db: AsyncSession, queue, worker, wanted):
+    # Up to `wanted` due jobs of `queue`, within the queue's limit
+    await db.execute(
+        text("SELECT pg_advisory_xact_lock(:key, hashtext(:queue))"),
+        {"key": JOB_LOCK_KEY, "queue": queue}
+    )
+    running = await db.scalar(
+        select(func.count()).select_from(Job).filter(Job.queue == queue, Job.status == "running")
+    )
+    free = min(wanted, JOB_QUEUES[queue] - running)
+    if free <= 0:
+        await db.rollback()
+        return []
+
+    now = datetime.utcnow()
+    due = select(Job.id).filter(
+        Job.queue == queue,
+        Job.status == "queued",
+        Job.run_at <= now
+    ).order_by(Job.run_at).limit(free).with_for_update(skip_locked=True)
+
+    rows = (await db.execute(
+        update(Job).where(Job.id.in_(due.scalar_subquery())).values(
+            status="running",
+            attempts=Job.attempts + 1,
+            locked_at=now,
+            locked_by=worker
+        ).returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return rows
+
+
+async def finish(db: AsyncSession, claimed, worker, error=None):
+    # done, back to the queue with a delay, or failed; returns the new status
+    now = datetime.utcnow()
+    if error is None:
+        values = {"status": "done", "finished_at": now, "last_error": None}
+    elif claimed.attempts < claimed.max_attempts:
+        values = {"status": "queued", "run_at": now + backoff(claimed.attempts), "last_error": error}
+    else:
+        values = {"status": "failed", "finished_at": now, "last_error": error}
+
+    # A job the reaper took back in the meantime is left alone
+    await db.execute(
+        update(Job).filter(
+            Job.id == claimed.id, Job.status == "running", Job.locked_by == worker
+        ).values(locked_at=None, locked_by=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return values["status"]
+
+
+async def reap(db: AsyncSession):
+    # Requeue jobs of lost workers, purge old finished jobs. One process at
+    # a time; returns None when another one is at it
+    locked = await db.scalar(
+        text("SELECT pg_try_advisory_xact_lock(:key, 0)"), {"key": JOB_LOCK_KEY}
+    )
+    if not locked:
+        await db.rollback()
+        return None
+
+    now = datetime.utcnow()
+    stale = (Job.status == "running") & (Job.locked_at < now - JOB_STALE_AFTER)
+    lost = "worker lost (no result after %ss)" % int(JOB_STALE_AFTER.total_seconds())
+
+    requeued = (await db.execute(
+        update(Job).filter(stale, Job.attempts < Job.max_attempts).values(
+            status="queued", run_at=now, locked_at=None, locked_by=None, last_error=lost
+        ).execution_options(synchronize_session=False)
+    )).rowcount
+    failed = (await db.execute(
+        update(Job).filter(stale).values(
+            status="failed", finished_at=now, locked_at=None, locked_by=None, last_error=lost
+        ).execution_options(synchronize_session=False)
+    )).rowcount
+    purged = (await db.execute(
+        delete(Job).filter(
+            Job.status.in_(("done", "failed")),
+            Job.finished_at < now - timedelta(days=JOB_KEEP_DAYS)
+        ).execution_options(synchronize_session=False)
+    )).rowcount
+    await db.commit()
+    return requeued, failed, purged
+
+
+# ==============================
+# WORKER
+# ==============================
+
+class JobWorker:
+    def __init__(self, queues=None, concurrency=JOB_WORKERS):
+        self.queues = list(queues or JOB_QUEUES)
+        self.concurrency = concurrency
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = set()
+        self.stopping = False
+        self.wakeup = asyncio.Event()
+        self.counts = {"claimed": 0, "done": 0, "retried": 0, "failed": 0}
+
+    def stats(self):
+        return {"worker": self.name, "running": len(self.running), **self.counts}
+
+    async def run(self):
+        reaped_at = None
+        while not self.stopping:
+            try:
+                now = datetime.utcnow()
+                if reaped_at is None or now - reaped_at > timedelta(seconds=JOB_REAP_SECONDS):
+                    reaped_at = now
+                    async with AsyncSessionLocal() as db:
+                        result = await reap(db)
+                    if result and any(result):
+                        logger.info("jobs reaped: %s requeued, %s failed, %s purged", *result)
+
+                claimed = await self.claim_some()
+            except Exception:
+                logger.exception("job claim failed")
+                claimed = 0
+
+            # Busy: look again as soon as a job finishes; idle: poll
+            if not claimed or len(self.running) >= self.concurrency:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def claim_some(self):
+        claimed = 0
+        # Rotate, so a busy first queue does not starve the others
+        random.shuffle(self.queues)
+        for queue in self.queues:
+            free = self.concurrency - len(self.running)
+            if free <= 0 or self.stopping:
+                break
+            async with AsyncSessionLocal() as db:
+                rows = await claim(db, queue, self.name, free)
+            for row in rows:
+                task = asyncio.create_task(self.execute(row))
+                self.running.add(task)
+                task.add_done_callback(self._finished)
+            claimed += len(rows)
+        self.counts["claimed"] += claimed
+        return claimed
+
+    def _finished(self, task):
+        self.running.discard(task)
+        self.wakeup.set()
+
+    async def execute(self, claimed):
+        handler = HANDLERS.get(claimed.name)
+        error = None
+        try:
+            if handler is None:
+                raise LookupError(f"no handler for job {claimed.name!r}")
+            current_job.set(claimed.id)
+            async with AsyncSessionLocal() as db:
+                await asyncio.wait_for(handler.func(db, **claimed.payload), JOB_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            error = "cancelled (worker stopped)"
+        except asyncio.TimeoutError:
+            error = f"timed out after {JOB_TIMEOUT_SECONDS}s"
+        except Exception as exc:
+            logger.exception("job %s (%s) failed", claimed.id, claimed.name)
+            error = f"{type(exc).__name__}: {exc}"[:JOB_ERROR_MAX_LENGTH]
+
+        try:
+            async with AsyncSessionLocal() as db:
+                status = await finish(db, claimed, self.name, error)
+        except Exception:
+            # The reaper requeues it once it is stale
+            logger.exception("could not record the result of job %s", claimed.id)
+            return
+
+        self.counts[{"done": "done", "queued": "retried", "failed": "failed"}[status]] += 1
+
+    async def stop(self, grace=10):
+        # Stop claiming; running jobs get `grace` seconds, then are cancelled
+        # (and go back to the queue as a failed attempt)
+        self.stopping = True
+        self.wakeup.set()
+        if self.running:
+            done, pending = await asyncio.wait(set(self.running), timeout=grace)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+
+# ==============================
+# BUILT-IN JOBS
+# ==============================
+
+@job("db.analyze", queue="maintenance")
+async def analyze_tables(db, tables):
+    # Fresh planner statistics after a large write (e.g. an import)
+    unknown = set(tables) - set(Base.metadata.tables)
+    if unknown:
+        raise ValueError(f"unknown tables {sorted(unknown)}")
+
+    def run():
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(
+                text("ANALYZE " + ", ".join(tables))
+            )
+
+    await asyncio.to_thread(run)
+
+
+@job("counters.rebuild", queue="maintenance")
+async def rebuild_counters(db):
+    from counters import rebuild
+
+    def run():
+        with SessionLocal() as sync_db:
+            return rebuild(sync_db)
+
+    rows = await asyncio.to_thread(run)
+    logger.info("rebuilt task_counters: %s rows", rows)
+
+
+@job("timelog.rebuild", queue="maintenance")
+async def rebuild_effort(db):
+    from timelog import rebuild
+
+    def run():
+        with SessionLocal() as sync_db:
+            return rebuild(sync_db)
+
+    totals, weeks = await asyncio.to_thread(run)
+    logger.info("rebuilt effort rollups: %s totals, %s developer weeks", totals, weeks)
+
+
+@job("projects.delete")
+async def delete_project(db, project_id, requested_by=None):
+    # Batched, resumable: a retry carries on where the last attempt stopped
+    from purge import delete_project
+
+    await delete_project(db, project_id, report_progress)
+
+
+# ==============================
+# CLI
+# ==============================
+
+async def _work(queues, concurrency):
+    worker = JobWorker(queues, concurrency)
+    print(f"Worker {worker.name} on {', '.join(worker.queues)} (Ctrl+C to stop)")
+    try:
+        await worker.run()
+    finally:
+        await worker.stop()
+        print(f"Stopped: {worker.stats()}")
+
+
+async def _enqueue(name, payload, delay):
+    async with AsyncSessionLocal() as db:
+        new_job = enqueue(db, name, payload, delay=timedelta(seconds=delay))
+        await db.commit()
+        return new_job.id
+
+
+async def _stats():
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Job.queue, Job.status, func.count(), func.min(Job.run_at))
+            .group_by(Job.queue, Job.status).order_by(Job.queue, Job.status)
+        )).all()
+        running = (await db.execute(
+            select(Job.id, Job.name, Job.locked_by, Job.progress)
+            .filter(Job.status == "running").order_by(Job.id)
+        )).all()
+    return rows, running
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    work = sub.add_parser("work", help="run jobs until interrupted")
+    work.add_argument("--queue", action="append", choices=sorted(JOB_QUEUES),
+                      help="only this queue (repeatable; default: all)")
+    work.add_argument("--concurrency", type=int, default=max(JOB_WORKERS, 1),
+                      help="jobs run at once by this process")
+
+    add = sub.add_parser("enqueue", help="queue a job")
+    add.add_argument("name", choices=sorted(HANDLERS))
+    add.add_argument("--payload", type=json.loads, default={}, help="JSON object")
+    add.add_argument("--delay", type=int, default=0, help="seconds")
+
+    sub.add_parser("stats", help="jobs per queue and status")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "work":
+        try:
+            asyncio.run(_work(args.queue, args.concurrency))
+        except KeyboardInterrupt:
+            pass
+
+    elif args.command == "enqueue":
+        job_id = asyncio.run(_enqueue(args.name, args.payload, args.delay))
+        print(f"Queued job {job_id}")
+
+    elif args.command == "stats":
+        rows, running = asyncio.run(_stats())
+        for queue, status, count, oldest in rows:
+            print(f"{queue:<15} {status:<8} {count:>8}   oldest run_at {oldest:%Y-%m-%d %H:%M:%S}")
+        for job_id, name, worker, progress in running:
+            print(f"running #{job_id} {name} on {worker}: {json.dumps(progress or {})}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# live.py
+#
+# Live task events for the lead and manager pages (WebSocket /ws/tasks).
+#
+# Write handlers call `task_changed(db, ...)` / `tasks_changed(db, ...)`
+# next to `record_task_change`. The events are sent with Postgres NOTIFY
+# in the same transaction, so they go out on commit only, and every
+# uvicorn worker gets them on its one LISTEN connection - including the
+# worker that made the change.
+#
+# Each event is addressed with the project's cache tags (cache.py):
+#
+#   "lead:<id>"     the project's owner
+#   "manager:<id>"  the manager who created it
+#   "project:<id>"
+#
+# A socket subscribes to the tag of its session user, so it only ever
+# hears about projects that user owns / created. Events received by a
+# worker also drop those tags from its render cache.
+#
+# Per connection, events are coalesced for LIVE_COALESCE_MS and sent as
+# one message; several changes to one task collapse to the last one:
+#
+#   {"events": [{"action": "updated", "task": 12, "project": 3, "status": "COMPLETED",
+#                "counts": {"not_started": 4, "in_progress": 2, "completed": 7}}, ...]}
+#   {"events": [{"action": "updated", "task": 12, "project": 3, "status": "IN_PROGRESS",
+#                "changed": ["task", "assigned_to"]}]}
+#   {"events": [{"action": "imported", "project": 3, "count": 250}]}
+#   {"events": [{"action": "project_deleted", "project": 3}]}
+#   {"resync": true}     too many changes / events may have been missed
+#
+# "changed" lists what an update changed besides the status (name,
+# assignee, requirement, dates); pages can only repaint the status in
+# place and reload for anything else.
+#
+# "counts" are the project's task counters as of that commit, on the last
+# event of each project in a message; pages patch their rows and totals
+# with them instead of reloading (templates/live_updates.html).
+#
+# An idle connection is a parked coroutine and a set entry, so one worker
+# can hold thousands of them.
+#
+# Settings (environment):
+#   LIVE_UPDATES           0 to switch the channel off (default 1)
+#   LIVE_COALESCE_MS       batching window per connection (default 500)
+#   LIVE_MAX_PENDING       events queued per connection before it gets a
+#                          resync instead (default 500)
+#   LIVE_MAX_CONNECTIONS   sockets per worker (default 10000)
+
+import asyncio
+import json
+import logging
+import os
+
+import asyncpg
+from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session
+
+from cache import project_tags, render_cache
+from counters import STATUS_COLUMNS
+from database import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+from models import TaskCounter
+
+logger = logging.getLogger(__name__)
+
+LIVE_UPDATES = os.getenv("LIVE_UPDATES", "1") == "1"
+LIVE_COALESCE_SECONDS = int(os.getenv("LIVE_COALESCE_MS", "500")) / 1000
+LIVE_MAX_PENDING = int(os.getenv("LIVE_MAX_PENDING", "500"))
+LIVE_MAX_CONNECTIONS = int(os.getenv("LIVE_MAX_CONNECTIONS", "10000"))
+
+NOTIFY_CHANNEL = "task_events"
+
+# NOTIFY payloads must stay under 8000 bytes
+NOTIFY_BATCH = 50
+
+LIVE_ROLES = {"PROJECT_MANAGER": "manager", "LEAD": "lead"}
+
+
+# ==============================
+# PUBLISH (write side)
+# ==============================
+
+def task_changed(db, action, task, project):
+    # action: "created" / "updated" / "deleted". The task's id and status
+    # are read at commit, after the flush has assigned them.
+    # Call it after setting the new values: "changed" is read from the
+    # task's pending attribute history, which the flush clears.
+    tags = project_tags(project.id, project.project_owner, project.created_by)
+    item = {"action": action, "project": project.id}
+    if action == "updated":
+        changed = changed_fields(task)
+        if changed:
+            item["changed"] = changed
+    db.info.setdefault("live_events", []).append((tags, item, task))
+
+
+def changed_fields(task):
+    # Columns set to a new value since the task was loaded, status aside
+    state = inspect(task)
+    changed = []
+    for attr in state.mapper.column_attrs:
+        if attr.key in ("status", "updated_at"):
+            continue
+        history = state.attrs[attr.key].history
+        if history.added and list(history.added) != list(history.deleted):
+            changed.append(attr.key)
+    return changed
+
+
+def tasks_changed(db, tags, events):
+    # Ready-made events (bulk changes, imports)
+    queued = db.info.setdefault("live_events", [])
+    for item in events:
+        queued.append((tags, item, None))
+
+
+def _resolve(tags, item, task):
+    if task is not None:
+        item = {**item, "task": task.id}
+        if item["action"] != "deleted":
+            item["status"] = task.status.name
+    return tags, item
+
+
+def _project_counts(session, project_ids):
+    # Read after this transaction's own counter upsert (counters.py), which
+    # keeps the rows locked until commit: these are the counts at commit.
+    # Plain columns, so no TaskCounter already in the session is reused.
+    columns = list(STATUS_COLUMNS.values())
+    counts = {project_id: dict.fromkeys(columns, 0) for project_id in project_ids}
+    rows = session.execute(
+        select(TaskCounter.scope_id, *(getattr(TaskCounter, column) for column in columns)).filter(
+            TaskCounter.scope == "project",
+            TaskCounter.scope_id.in_(project_ids)
+        )
+    )
+    for row in rows:
+        counts[row.scope_id] = {column: getattr(row, column) for column in columns}
+    return counts
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_listeners(session):
+    queued = session.info.pop("live_events", None)
+    if not queued or not LIVE_UPDATES:
+        return
+
+    if any(task is not None for _, _, task in queued):
+        session.flush()
+
+    by_tags = {}
+    for tags, item in (_resolve(*entry) for entry in queued):
+        by_tags.setdefault(tuple(tags), []).append(item)
+
+    last = {}
+    for events in by_tags.values():
+        for item in events:
+            if item["action"] != "project_deleted":
+                last[item["project"]] = item
+    if last:
+        counts = _project_counts(session, sorted(last))
+        for project_id, item in last.items():
+            item["counts"] = counts[project_id]
+
+    for tags, events in by_tags.items():
+        for start in range(0, len(events), NOTIFY_BATCH):
+            payload = json.dumps(
+                {"tags": tags, "events": events[start:start + NOTIFY_BATCH]},
+                separators=(",", ":")
+            )
+            session.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": NOTIFY_CHANNEL, "payload": payload}
+            )
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session):
+    session.info.pop("live_events", None)
+
+
+# ==============================
+# CONNECTIONS
+# ==============================
+
+class LiveConnection:
+    def __init__(self, websocket, tag):
+        self.websocket = websocket
+        self.tag = tag
+        self.pending = {}          # (project, task) -> latest event
+        self.resync = False
+        self.wake = asyncio.Event()
+
+    def push(self, item):
+        key = (item["project"], item.get("task"))
+        previous = self.pending.get(key)
+
+        if previous is not None and previous["action"] == "created":
+            if item["action"] == "deleted":
+                # Created and gone within one window: nothing to report
+                del self.pending[key]
+                return
+            item = {**item, "action": "created"}
+        elif previous is not None and previous.get("changed") and item["action"] == "updated":
+            # A later status-only update must not hide the earlier change
+            item = {**item, "changed": sorted(set(previous["changed"]) | set(item.get("changed", ())))}
+
+        # Re-inserted, so the events go out in the order they happened and
+        # the newest counts of a project come last
+        self.pending.pop(key, None)
+        self.pending[key] = item
+        if len(self.pending) > LIVE_MAX_PENDING:
+            self.pending.clear()
+            self.resync = True
+        self.wake.set()
+
+    def push_resync(self):
+        self.pending.clear()
+        self.resync = True
+        self.wake.set()
+
+    async def send_loop(self):
+        while True:
+            await self.wake.wait()
+            await asyncio.sleep(LIVE_COALESCE_SECONDS)
+            self.wake.clear()
+
+            if self.resync:
+                self.resync = False
+                self.pending.clear()
+                await self.websocket.send_json({"resync": True})
+            elif self.pending:
+                events, self.pending = list(self.pending.values()), {}
+                await self.websocket.send_json({"events": events})
+
+
+class LiveHub:
+    def __init__(self):
+        self.subscribers = {}   # tag -> set(LiveConnection)
+        self.count = 0
+
+    def add(self, connection):
+        self.subscribers.setdefault(connection.tag, set()).add(connection)
+        self.count += 1
+
+    def remove(self, connection):
+        connections = self.subscribers.get(connection.tag)
+        if connections is not None and connection in connections:
+            connections.discard(connection)
+            self.count -= 1
+            if not connections:
+                del self.subscribers[connection.tag]
+
+    def publish(self, tags, events):
+        for tag in tags:
+            for connection in self.subscribers.get(tag, ()):
+                for item in events:
+                    connection.push(item)
+
+    def resync_all(self):
+        for connections in self.subscribers.values():
+            for connection in connections:
+                connection.push_resync()
+
+    def stats(self):
+        return {"connections": self.count, "subscribed_users": len(self.subscribers)}
+
+
+live_hub = LiveHub()
+
+
+async def serve_socket(websocket: WebSocket):
+    user_id = websocket.session.get("user_id")
+    scope = LIVE_ROLES.get(websocket.session.get("role"))
+
+    if user_id is None or scope is None:
+        await websocket.close(code=1008)
+        return
+
+    if not LIVE_UPDATES or live_hub.count >= LIVE_MAX_CONNECTIONS:
+        # Try again later; the page keeps working without live updates
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    connection = LiveConnection(websocket, f"{scope}:{user_id}")
+    live_hub.add(connection)
+    sender = asyncio.create_task(connection.send_loop())
+
+    try:
+        # Clients don't send anything; this only waits for the close
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_hub.remove(connection)
+        sender.cancel()
+
+
+# ==============================
+# LISTEN (cross-worker)
+# ==============================
+
+def _on_notify(connection, pid, channel, payload):
+    message = json.loads(payload)
+    render_cache.invalidate(*message["tags"])
+    live_hub.publish(message["tags"], message["events"])
+
+
+async def listen_for_task_events():
+    # Runs for the lifetime of the app; reconnects if Postgres goes away.
+    # Connected sockets get a resync after a reconnect - events may have
+    # been missed in between.
+    while True:
+        try:
+            conn = await asyncpg.connect(
+                user=DB_USER, password=DB_PASSWORD,
+                host=DB_HOST, port=DB_PORT, database=DB_NAME
+            )
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.warning("task event listener: connect failed (%s), retrying", exc)
+            await asyncio.sleep(5)
+            continue
+
+        try:
+            await conn.add_listener(NOTIFY_CHANNEL, _on_notify)
+            live_hub.resync_all()
+
+            while not conn.is_closed():
+                await asyncio.sleep(5)
+        finally:
+            if not conn.is_closed():
+                await conn.close()
+
+        logger.warning("task event listener: connection lost, reconnecting")
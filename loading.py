@@ -0,0 +1,178 @@
+# loading.py
+#
+# Named eager-loading profiles.
+#
+# Every page that renders relationships in its template has a profile here:
+# which relationships to load up front (selectinload for collections,
+# joinedload for many-to-one) and how many SQL statements the whole
+# request - queries + template render - is allowed to issue.
+#
+# Usage:
+#
+#   @app.get("/lead-manager/dashboard")
+#   @role_required("LEAD")
+#   @query_budget("lead_dashboard")
+#   async def lead_dashboard(...):
+#       select(Project).options(*profile_options("lead_dashboard"))
+#
+# Set QUERY_BUDGET_STRICT=1 (tests / local runs) to turn a blown budget
+# into an exception instead of a log warning. `python loadtest.py
+# --check-budgets` renders every profiled page that way against seeded data.
+
+import logging
+import os
+from contextvars import ContextVar
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload, joinedload, contains_eager
+
+from database import APP_ENGINES
+from models import Project, Requirement, Task
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+# ==============================
+# PROFILES
+# ==============================
+
+class LoadingProfile:
+    def __init__(self, options, max_queries):
+        self.options = options
+        self.max_queries = max_queries
+
+
+LOADING_PROFILES = {
+    # Project Manager
+    "manager_projects": LoadingProfile(
+        options=(
+            joinedload(Project.owner),
+        ),
+        max_queries=1
+    ),
+    "project_detail": LoadingProfile(
+        options=(
+            joinedload(Project.owner),
+            selectinload(Project.requirements).joinedload(Requirement.creator),
+            selectinload(Project.tasks).joinedload(Task.assignee),
+        ),
+        max_queries=4  # + task counters
+    ),
+
+    # Lead
+    "lead_dashboard": LoadingProfile(
+        options=(
+            selectinload(Project.tasks).joinedload(Task.assignee),
+            selectinload(Project.requirements),
+        ),
+        max_queries=4  # + task counters
+    ),
+    "lead_projects": LoadingProfile(
+        options=(),
+        max_queries=2  # + task counters
+    ),
+    "lead_project_detail": LoadingProfile(
+        options=(
+            selectinload(Project.requirements),
+            selectinload(Project.tasks).joinedload(Task.assignee),
+        ),
+        max_queries=3
+    ),
+    "create_task": LoadingProfile(
+        options=(
+            selectinload(Project.requirements),
+            selectinload(Project.tasks),
+        ),
+        max_queries=4  # + developers dropdown
+    ),
+    "lead_calendar": LoadingProfile(
+        options=(
+            joinedload(Task.assignee),
+            contains_eager(Task.project),  # already joined for the owner filter
+        ),
+        max_queries=1
+    ),
+    "lead_all_tasks": LoadingProfile(
+        options=(
+            joinedload(Task.project),
+            joinedload(Task.assignee),
+        ),
+        max_queries=3  # + projects dropdown + count
+    ),
+
+    # Developer
+    "developer_dashboard": LoadingProfile(
+        options=(
+            joinedload(Task.project),
+        ),
+        max_queries=2  # + task counters
+    ),
+    "developer_update_task": LoadingProfile(
+        options=(
+            joinedload(Task.project),
+        ),
+        max_queries=2  # + logged effort
+    ),
+}
+
+
+def profile_options(name):
+    return LOADING_PROFILES[name].options
+
+
+# ==============================
+# QUERY BUDGET
+# ==============================
+
+# Holds a one-item list while a budgeted view runs, so the counter is
+# shared even when SQLAlchemy copies the context into its greenlet
+_query_count = ContextVar("query_count", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+for _engine in APP_ENGINES:
+    event.listen(_engine.sync_engine, "before_cursor_execute", _count_query)
+
+
+def query_budget(name):
+    max_queries = LOADING_PROFILES[name].max_queries
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            counter = [0]
+            token = _query_count.set(counter)
+            try:
+                # TemplateResponse renders immediately, so lazy loads
+                # triggered by the template are counted here too
+                response = await func(*args, **kwargs)
+            finally:
+                _query_count.reset(token)
+
+            if counter[0] > max_queries:
+                message = (
+                    f"{name}: {counter[0]} SQL statements "
+                    f"(budget {max_queries})"
+                )
+                if QUERY_BUDGET_STRICT:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            else:
+                logger.debug("%s: %d SQL statements (budget %d)", name, counter[0], max_queries)
+
+            return response
+
+        return wrapper
+    return decorator
@@ -0,0 +1,472 @@
+# loadtest.py
+#
+# In-process route benchmark: drives the FastAPI app through httpx's ASGI
+# transport (no server, no network), so the numbers are the app and the
+# database only. Meant to be run against data from seed.py.
+#
+#   python seed.py --size medium --reset
+#   python loadtest.py
+#   python loadtest.py --scenario lead_dashboard --scenario lead_all_tasks \
+#       --requests 500 --concurrency 20
+#   python loadtest.py --no-cache --json results.json --max-p95 250
+#
+# It picks the busiest manager, lead and developer in the database (all
+# seeded users share one password, --password), logs each in once and runs
+# every scenario in turn: `--warmup` unmeasured requests, then `--requests`
+# timed ones with at most `--concurrency` in flight.
+#
+# Per scenario it reports p50 / p95 / p99 / max latency, throughput and
+# SQL statements per request (read from the Server-Timing header that
+# sqltrace.py adds when the request carries "X-SQL-Trace: 1").
+#
+# The write scenarios (create_task, update_task) really write: run them
+# against a throw-away database.
+#
+# --max-p95 makes the run fail (exit 1) if any scenario is slower than the
+# given p95 in ms, or if any request failed - usable as a CI gate.
+#
+# --check-budgets runs no benchmark: it renders every view that has a
+# loading profile (loading.py) once, with QUERY_BUDGET_STRICT=1 and the
+# render cache off, and fails if one goes over its max_queries.
+#
+#   python loadtest.py --check-budgets
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+from itertools import cycle
+
+import httpx
+from sqlalchemy import func, select
+
+from database import SessionLocal
+import tenancy  # noqa: F401  (scopes the fixture session below)
+from models import Project, Requirement, Task, User, UserRole, TaskStatus
+
+BASE_URL = "http://loadtest"
+TRACE_HEADERS = {"X-SQL-Trace": "1"}
+QUERIES = re.compile(r'desc="(\d+) queries"')
+NEXT_PAGE = re.compile(r'href="\?cursor=([^"&]*)')
+
+
+# ==============================
+# FIXTURES
+# ==============================
+
+def pick_fixtures():
+    # Busiest lead and their biggest project; the manager and developer are
+    # the busiest of the same tenant (a lead can't assign across tenants)
+    with SessionLocal() as db:
+        tenant_id, lead_id, lead_project = db.execute(
+            select(Project.tenant_id, Project.project_owner, Project.id)
+            .join(Task, Task.project_id == Project.id)
+            .group_by(Project.tenant_id, Project.project_owner, Project.id)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).one()
+        db.info["tenant_id"] = tenant_id
+
+        manager_id, manager_project = db.execute(
+            select(Project.created_by, func.min(Project.id))
+            .group_by(Project.created_by)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).one()
+
+        developer_id = db.execute(
+            select(Task.assigned_to)
+            .filter(Task.assigned_to.isnot(None))
+            .group_by(Task.assigned_to)
+            .order_by(func.count().desc())
+            .limit(1)
+        ).scalar_one()
+
+        requirement_id = db.execute(
+            select(func.min(Requirement.id)).filter(Requirement.project_id == lead_project)
+        ).scalar_one()
+
+        developer_tasks = db.execute(
+            select(Task.id)
+            .filter(Task.assigned_to == developer_id)
+            .order_by(Task.id)
+            .limit(200)
+        ).scalars().all()
+
+        emails = dict(db.execute(
+            select(User.id, User.email).filter(User.id.in_([manager_id, lead_id, developer_id]))
+        ).all())
+
+        any_developer = db.execute(
+            select(func.min(User.id)).filter(User.role == UserRole.DEVELOPER)
+        ).scalar_one()
+
+    return {
+        "emails": {
+            "manager": emails[manager_id],
+            "lead": emails[lead_id],
+            "developer": emails[developer_id],
+        },
+        "manager_project": manager_project,
+        "lead_project": lead_project,
+        "requirement_id": requirement_id,
+        "assignee_id": any_developer,
+        "developer_tasks": developer_tasks,
+    }
+
+
+# ==============================
+# SCENARIOS
+# ==============================
+#
+# A scenario is (role, expected status, factory). The factory is called
+# once, after login, and returns a coroutine function that performs one
+# request on the role's client and returns the response.
+
+def login_scenario(app, fixtures, args):
+    email = fixtures["emails"]["lead"]
+
+    async def request(_client):
+        # Fresh client: each iteration is a full login with bcrypt
+        async with _client_for(app) as client:
+            return await client.post(
+                "/login",
+                data={"email": email, "password": args.password},
+                headers=TRACE_HEADERS
+            )
+    return request
+
+
+def get_scenario(path):
+    def factory(app, fixtures, args):
+        url = path.format(**fixtures)
+
+        async def request(client):
+            return await client.get(url, headers=TRACE_HEADERS)
+        return request
+    return factory
+
+
+def lead_all_tasks_scenario(app, fixtures, args):
+    # The pages themselves are collected up front by following the "Next"
+    # links, then the timed requests cycle through them (deep pages included)
+    urls = cycle(fixtures["lead_pages"])
+
+    async def request(client):
+        return await client.get(next(urls), headers=TRACE_HEADERS)
+    return request
+
+
+def lead_calendar_scenario(app, fixtures, args):
+    urls = cycle([
+        "/lead-manager/calendar?view=month",
+        "/lead-manager/calendar?view=week",
+        "/lead-manager/calendar?view=month&start=2025-01-01",
+        "/lead-manager/calendar?view=week&start=2025-06-02",
+    ])
+
+    async def request(client):
+        return await client.get(next(urls), headers=TRACE_HEADERS)
+    return request
+
+
+def create_task_scenario(app, fixtures, args):
+    url = f"/lead-manager/projects/{fixtures['lead_project']}/tasks/create"
+    numbers = iter(range(1, sys.maxsize))
+
+    async def request(client):
+        return await client.post(
+            url,
+            data={
+                "task": f"Load test task {next(numbers)}",
+                "requirement_id": fixtures["requirement_id"],
+                "developer_id": fixtures["assignee_id"],
+                "start_time": "2025-03-03T09:00",
+                "end_time": "2025-03-07T17:00",
+            },
+            headers=TRACE_HEADERS
+        )
+    return request
+
+
+def update_task_scenario(app, fixtures, args):
+    updates = cycle(
+        (task_id, status.name)
+        for status in TaskStatus
+        for task_id in fixtures["developer_tasks"]
+    )
+
+    async def request(client):
+        task_id, status = next(updates)
+        return await client.post(
+            f"/developer/tasks/{task_id}/update",
+            data={"status": status},
+            headers=TRACE_HEADERS
+        )
+    return request
+
+
+SCENARIOS = {
+    "login": ("lead", 303, login_scenario),
+    "manager_dashboard": ("manager", 200, get_scenario("/project-manager/dashboard")),
+    "manager_project": ("manager", 200, get_scenario("/project-manager/projects/{manager_project}")),
+    "lead_dashboard": ("lead", 200, get_scenario("/lead-manager/dashboard")),
+    "lead_project": ("lead", 200, get_scenario("/lead-manager/projects/{lead_project}")),
+    "lead_all_tasks": ("lead", 200, lead_all_tasks_scenario),
+    "lead_calendar": ("lead", 200, lead_calendar_scenario),
+    "developer_dashboard": ("developer", 200, get_scenario("/developer/dashboard")),
+    "api_tasks": ("lead", 200, get_scenario("/api/v1/tasks?project_id={lead_project}")),
+    "create_task": ("lead", 303, create_task_scenario),
+    "update_task": ("developer", 303, update_task_scenario),
+}
+
+
+# ==============================
+# QUERY BUDGETS
+# ==============================
+
+# Loading profile -> (role, page that renders with it)
+BUDGET_PAGES = {
+    "manager_projects": ("manager", "/project-manager/projects"),
+    "project_detail": ("manager", "/project-manager/projects/{manager_project}"),
+    "lead_dashboard": ("lead", "/lead-manager/dashboard"),
+    "lead_projects": ("lead", "/lead-manager/projects"),
+    "lead_project_detail": ("lead", "/lead-manager/projects/{lead_project}"),
+    "create_task": ("lead", "/lead-manager/projects/{lead_project}/tasks/create"),
+    "lead_calendar": ("lead", "/lead-manager/calendar"),
+    "lead_all_tasks": ("lead", "/lead-manager/tasks"),
+    "developer_dashboard": ("developer", "/developer/dashboard"),
+    "developer_update_task": ("developer", "/developer/tasks/{developer_task}/update"),
+}
+
+
+class _BudgetCounts(logging.Handler):
+    # Picks up loading.py's per-view "<name>: <n> SQL statements" lines
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.counts = {}
+
+    def emit(self, record):
+        if record.args and len(record.args) == 3:
+            self.counts[record.args[0]] = record.args[1]
+
+
+async def check_budgets(clients, fixtures):
+    # Returns the profiles that failed
+    import loading
+    from loading import LOADING_PROFILES, QueryBudgetExceeded
+
+    loading.QUERY_BUDGET_STRICT = True
+    counts = _BudgetCounts()
+    loading_logger = logging.getLogger("loading")
+    loading_logger.addHandler(counts)
+    loading_logger.setLevel(logging.DEBUG)
+
+    failed = []
+    for name, profile in LOADING_PROFILES.items():
+        if name not in BUDGET_PAGES:
+            print(f"{name:<24} FAIL  no page to check it with (BUDGET_PAGES)")
+            failed.append(name)
+            continue
+
+        role, path = BUDGET_PAGES[name]
+        url = path.format(developer_task=fixtures["developer_tasks"][0], **fixtures)
+        try:
+            response = await clients[role].get(url)
+        except QueryBudgetExceeded as exc:
+            print(f"{name:<24} FAIL  {exc}")
+            failed.append(name)
+            continue
+
+        if response.status_code != 200:
+            print(f"{name:<24} FAIL  GET {url} answered {response.status_code}")
+            failed.append(name)
+            continue
+
+        if name not in counts.counts:
+            print(f"{name:<24} FAIL  GET {url} is not under @query_budget({name!r})")
+            failed.append(name)
+            continue
+
+        print(f"{name:<24} ok    {counts.counts[name]} SQL statements (budget {profile.max_queries})")
+
+    return failed
+
+
+# ==============================
+# RUNNER
+# ==============================
+
+def _client_for(app):
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url=BASE_URL,
+        timeout=120
+    )
+
+
+async def login(client, email, password):
+    response = await client.post("/login", data={"email": email, "password": password})
+    if response.status_code != 303:
+        raise SystemExit(f"Login failed for {email} (is the database seeded with seed.py?)")
+
+
+async def collect_pages(client, max_pages):
+    urls = ["/lead-manager/tasks"]
+    while len(urls) < max_pages:
+        response = await client.get(urls[-1])
+        cursors = NEXT_PAGE.findall(response.text)
+        # The second link is "Next"; an empty cursor means the last page
+        if len(cursors) < 2 or not cursors[-1]:
+            break
+        urls.append(f"/lead-manager/tasks?cursor={cursors[-1]}")
+    return urls
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run_scenario(request, client, expected, args):
+    latencies = []
+    queries = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(measure):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await request(client)
+            elapsed = time.perf_counter() - started
+
+        if not measure:
+            return
+        latencies.append(elapsed)
+        if response.status_code != expected:
+            errors += 1
+        match = QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            queries.append(int(match.group(1)))
+
+    for _ in range(args.warmup):
+        await one(False)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(True) for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "queries": round(sum(queries) / len(queries), 1) if queries else None,
+        "max_queries": max(queries) if queries else None,
+    }
+
+
+async def run(args):
+    # Imported here so --no-cache can switch the render cache off first
+    from main import app
+    import sqltrace
+
+    if sqltrace.settings.mode == "off":
+        sqltrace.settings.mode = "request"
+    # Keep the N+1 warnings, drop the per-request lines
+    logging.getLogger("sqltrace").setLevel(logging.WARNING)
+
+    fixtures = pick_fixtures()
+    results = {}
+
+    async with app.router.lifespan_context(app):
+        clients = {}
+        try:
+            for role, email in fixtures["emails"].items():
+                clients[role] = _client_for(app)
+                await login(clients[role], email, args.password)
+
+            if args.check_budgets:
+                return await check_budgets(clients, fixtures)
+
+            fixtures["lead_pages"] = await collect_pages(clients["lead"], args.pages)
+
+            for name in args.scenario or SCENARIOS:
+                role, expected, factory = SCENARIOS[name]
+                request = factory(app, fixtures, args)
+                results[name] = await run_scenario(request, clients[role], expected, args)
+                print_row(name, results[name])
+        finally:
+            for client in clients.values():
+                await client.aclose()
+
+    return results
+
+
+def print_header():
+    print(f"{'scenario':<20} {'reqs':>6} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'req/s':>8} {'queries':>8}")
+
+
+def print_row(name, result):
+    queries = "-" if result["queries"] is None else result["queries"]
+    print(
+        f"{name:<20} {result['requests']:>6} {result['errors']:>4} "
+        f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+        f"{result['max_ms']:>8} {result['req_per_s']:>8} {queries:>8}",
+        flush=True
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process route benchmark")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="repeatable, default: all")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20, help="lead_all_tasks pages to cycle through")
+    parser.add_argument("--no-cache", action="store_true", help="disable the render cache")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    parser.add_argument("--max-p95", type=float, metavar="MS", help="fail if any scenario's p95 is above")
+    parser.add_argument("--check-budgets", action="store_true",
+                        help="render each profiled view once in strict query budget mode instead")
+    args = parser.parse_args()
+
+    if args.check_budgets:
+        os.environ["RENDER_CACHE_SIZE"] = "0"
+        failed = asyncio.run(run(args))
+        if failed:
+            print(f"Over budget: {', '.join(failed)}")
+            sys.exit(1)
+        return
+
+    if args.no_cache:
+        os.environ["RENDER_CACHE_SIZE"] = "0"
+
+    print_header()
+    results = asyncio.run(run(args))
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+
+    failed = [
+        name for name, result in results.items()
+        if result["errors"] or (args.max_p95 is not None and result["p95_ms"] > args.max_p95)
+    ]
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
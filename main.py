@@ -1,51 +1,112 @@
-from math import ceil
 from fastapi import Query
-from fastapi import FastAPI, Request, Form, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, Depends, File, UploadFile, WebSocket
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
-from sqlalchemy.orm import Session
-from database import get_db,Base,engine
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, contains_eager
+from database import get_db, async_engine, replica_engine
+import tenancy  # noqa: F401  (tenant scoping of every request session)
+from auth import role_required
+from replica import read_replica, ReplicaRoutingMiddleware
+from api import router as api_router
+from sqltrace import SQLTraceMiddleware
+import sqltrace
+from loading import profile_options, query_budget
+from counters import task_snapshot, record_task_change, get_counters, get_counter
+from pagination import keyset_page, clamp_page_size, DEFAULT_PAGE_SIZE
+from passwords import verify_password, PasswordQueueFull
+import passwords
+from cache import cached_view, mark_stale, mark_project_stale, render_cache, listen_for_invalidations, RENDER_CACHE_NOTIFY
+from live import task_changed, serve_socket, live_hub, listen_for_task_events, LIVE_UPDATES
+from importer import import_tasks, detect_format, IMPORT_FORMATS
+from export import export_query, stream_export, EXPORT_KINDS, EXPORT_FORMATS
+from startup import warm_up, shutting_down, template_environment, readiness
+from search import search
+from snapshots import run_snapshots, SNAPSHOTS_ENABLED
+from jobs import JobWorker, JOB_WORKERS
+from purge import queue_project_delete
+from timelog import log_time, get_effort, entry_error, format_duration, TIME_ENTRY_MAX_HOURS
+from schedule import calendar_window, lead_calendar_days
+from etags import conditional_view, manager_project_stamp, lead_project_stamp, developer_dashboard_stamp, lead_calendar_stamp
 from models import User
 
 from models import Project, Requirement, Task, User, UserRole, TaskStatus
 
-from functools import wraps
-from passlib.context import CryptContext
 from typing import Optional
+import asyncio
+import io
+from contextlib import asynccontextmanager
 
 from fastapi.responses import PlainTextResponse
-app = FastAPI()
 
 
-# This creates all tables in PostgreSQL
-# Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
-print(Base.metadata.tables.keys())
+@asynccontextmanager
+async def lifespan(app):
+    # Schema check, pool and template warm-up; /ready says 200 after this
+    await warm_up(templates.env)
 
-# Add session middleware
-app.add_middleware(SessionMiddleware, secret_key="super-secret-key")
+    # Other workers' writes reach this worker's render cache via LISTEN
+    listener = None
+    if RENDER_CACHE_NOTIFY:
+        listener = asyncio.create_task(listen_for_invalidations())
+
+    # Task events for the live sockets, from every worker (live.py)
+    live_listener = None
+    if LIVE_UPDATES:
+        live_listener = asyncio.create_task(listen_for_task_events())
+
+    # Daily per-project status history (snapshots.py)
+    snapshot_job = None
+    if SNAPSHOTS_ENABLED:
+        snapshot_job = asyncio.create_task(run_snapshots())
 
-templates = Jinja2Templates(directory="templates")
+    # Background jobs (jobs.py); JOB_WORKERS=0 leaves them to `jobs.py work`
+    job_runner = None
+    if JOB_WORKERS > 0:
+        app.state.job_worker = JobWorker()
+        job_runner = asyncio.create_task(app.state.job_worker.run())
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    yield
 
+    shutting_down()
+    if job_runner:
+        await app.state.job_worker.stop()
+        job_runner.cancel()
+    if snapshot_job:
+        snapshot_job.cancel()
+    if live_listener:
+        live_listener.cancel()
+    if listener:
+        listener.cancel()
+    passwords.shutdown_pool()
+    await async_engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
 
-def role_required(*roles):
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(request: Request, *args, **kwargs):
 
-            if "user_id" not in request.session:
-                return RedirectResponse("/login", status_code=303)
+app = FastAPI(lifespan=lifespan)
 
-            if request.session.get("role") not in roles:
-                return RedirectResponse("/dashboard", status_code=303)
 
-            return await func(request, *args, **kwargs)
+# Tables are managed by migrations, not at import time:
+#   python migrate.py upgrade
+
+# Add session middleware
+app.add_middleware(SessionMiddleware, secret_key="super-secret-key")
 
-        return wrapper
-    return decorator
+# Query count / DB time per request (Server-Timing header + JSON log)
+app.add_middleware(SQLTraceMiddleware)
+
+# Read-only handlers on the replica, with read-your-writes after a POST
+app.add_middleware(ReplicaRoutingMiddleware)
+
+# Compiled templates are cached on disk, see startup.py
+templates = Jinja2Templates(env=template_environment("templates"))
+templates.env.filters["duration"] = format_duration
+
+# JSON API (/api/v1)
+app.include_router(api_router)
 
 
 @app.get('/')
@@ -83,23 +144,52 @@ def login_page(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.post("/login")
-def login(
+async def login(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    print("Email",email,"Password",password)
-    user = db.query(User).filter(User.email == email).first()
+    # A new login starts a new session, and the lookup isn't scoped to
+    # the tenant of whoever was logged in before (emails are unique
+    # across tenants)
+    request.session.clear()
+    db.info["tenant_id"] = None
 
-    if not user or not pwd_context.verify(password, user.password):
+    user = (await db.execute(
+        select(User).filter(User.email == email)
+    )).scalars().first()
+
+    if not user:
         return templates.TemplateResponse(
             "index.html",
             {"request": request, "error": "Invalid email or password"}
         )
 
+    # bcrypt runs in its own process pool (see passwords.py)
+    try:
+        valid, new_hash = await verify_password(password, user.password)
+    except PasswordQueueFull:
+        return templates.TemplateResponse(
+            "index.html",
+            {"request": request, "error": "Too many login attempts, please retry in a moment"},
+            status_code=503
+        )
+
+    if not valid:
+        return templates.TemplateResponse(
+            "index.html",
+            {"request": request, "error": "Invalid email or password"}
+        )
+
+    # BCRYPT_ROUNDS changed since this hash was made
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+
     # Store session
     request.session["user_id"] = user.id
+    request.session["tenant_id"] = user.tenant_id
     request.session["name"] = user.name
     request.session["role"] = user.role.name  # IMPORTANT
 
@@ -129,70 +219,46 @@ from sqlalchemy import func
 from models import Project, Requirement, User, UserRole
 from fastapi import Depends
 from database import get_db
-from sqlalchemy.orm import Session
+from stats import (
+    manager_dashboard_stats,
+    manager_recent_projects,
+    manager_lead_distribution
+)
 
 @app.get("/project-manager/dashboard")
 @role_required("PROJECT_MANAGER")
+@read_replica
+@cached_view("manager_dashboard", scope="manager")
 async def manager_dashboard(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     manager_id = request.session.get("user_id")
 
     # ===============================
-    # Basic Stats
-    # ===============================
-
-    total_projects = db.query(Project).filter(
-        Project.created_by == manager_id
-    ).count()
-
-    total_tasks = db.query(Task).join(Project).filter(
-        Project.created_by == manager_id
-    ).count()
-
-    completed_tasks = db.query(Task).join(Project).filter(
-        Project.created_by == manager_id,
-        Task.status == TaskStatus.COMPLETED
-    ).count()
-
-    pending_tasks = db.query(Task).join(Project).filter(
-        Project.created_by == manager_id,
-        Task.status != TaskStatus.COMPLETED
-    ).count()
-
-    # ===============================
-    # Alerts Section
+    # Basic Stats + Alerts (one query)
     # ===============================
 
-    projects_without_lead = db.query(Project).filter(
-        Project.created_by == manager_id,
-        Project.project_owner == None
-    ).count()
+    stats = await manager_dashboard_stats(db, manager_id)
 
-    projects_without_requirements = db.query(Project).filter(
-        Project.created_by == manager_id,
-        ~Project.requirements.any()
-    ).count()
+    total_projects = stats["total_projects"]
+    total_tasks = stats["total_tasks"]
+    completed_tasks = stats["completed_tasks"]
+    pending_tasks = stats["pending_tasks"]
+    projects_without_lead = stats["projects_without_lead"]
+    projects_without_requirements = stats["projects_without_requirements"]
 
     # ===============================
     # Recent Projects
     # ===============================
 
-    recent_projects = db.query(Project).filter(
-        Project.created_by == manager_id
-    ).order_by(Project.created_at.desc()).limit(5).all()
+    recent_projects = await manager_recent_projects(db, manager_id)
 
     # ===============================
     # Lead Distribution
     # ===============================
 
-    lead_distribution = db.query(
-        User.name,
-        func.count(Project.id)
-    ).join(Project, Project.project_owner == User.id)\
-     .filter(Project.created_by == manager_id)\
-     .group_by(User.name).all()
+    lead_distribution = await manager_lead_distribution(db, manager_id)
 
     # ===============================
     # Overall Progress %
@@ -220,15 +286,22 @@ async def manager_dashboard(
 
 @app.get("/lead-manager/dashboard")
 @role_required("LEAD")
+@read_replica
+@cached_view("lead_dashboard", scope="lead")
+@query_budget("lead_dashboard")
 async def lead_dashboard(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    projects = db.query(Project).filter(
-        Project.project_owner == lead_id
-    ).all()
+    projects = (await db.execute(
+        select(Project).filter(
+            Project.project_owner == lead_id
+        ).options(*profile_options("lead_dashboard"))
+    )).scalars().all()
+
+    counters = await get_counters(db, "project", [p.id for p in projects])
 
     dashboard_data = []
 
@@ -236,26 +309,17 @@ async def lead_dashboard(
     completed_tasks = 0
 
     for project in projects:
-        tasks = project.tasks
-
-        project_total = len(tasks)
-        project_completed = sum(
-            1 for t in tasks if t.status == TaskStatus.COMPLETED
-        )
+        counter = counters[project.id]
 
-        total_tasks += project_total
-        completed_tasks += project_completed
-
-        progress = 0
-        if project_total > 0:
-            progress = int((project_completed / project_total) * 100)
+        total_tasks += counter.total
+        completed_tasks += counter.completed
 
         dashboard_data.append({
             "project": project,
-            "tasks": tasks,
-            "total_tasks": project_total,
-            "completed_tasks": project_completed,
-            "progress": progress
+            "tasks": project.tasks,
+            "total_tasks": counter.total,
+            "completed_tasks": counter.completed,
+            "progress": counter.progress
         })
 
     overall_progress = 0
@@ -279,25 +343,30 @@ async def lead_dashboard(
 
 @app.get("/developer/dashboard")
 @role_required("DEVELOPER")
+@read_replica
+@conditional_view("developer_dashboard", developer_dashboard_stamp)
+@query_budget("developer_dashboard")
 async def developer_dashboard(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     developer_id = request.session.get("user_id")
 
-    tasks = db.query(Task).filter(
-        Task.assigned_to == developer_id
-    ).all()
+    tasks = (await db.execute(
+        select(Task).filter(
+            Task.assigned_to == developer_id
+        ).options(*profile_options("developer_dashboard"))
+    )).scalars().all()
 
-    total_tasks = len(tasks)
+    counter = await get_counter(db, "assignee", developer_id)
 
-    completed = sum(1 for t in tasks if t.status == TaskStatus.COMPLETED)
-    in_progress = sum(1 for t in tasks if t.status == TaskStatus.IN_PROGRESS)
-    not_started = sum(1 for t in tasks if t.status == TaskStatus.NOT_STARTED)
+    total_tasks = counter.total
 
-    progress = 0
-    if total_tasks > 0:
-        progress = int((completed / total_tasks) * 100)
+    completed = counter.completed
+    in_progress = counter.in_progress
+    not_started = counter.not_started
+
+    progress = counter.progress
 
     return templates.TemplateResponse(
         "developer_dashboard.html",
@@ -314,26 +383,33 @@ async def developer_dashboard(
 
 @app.get("/developer/tasks/{task_id}/update")
 @role_required("DEVELOPER")
+@query_budget("developer_update_task")
 async def update_task_page(
     request: Request,
     task_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     developer_id = request.session.get("user_id")
 
-    task = db.query(Task).filter(
-        Task.id == task_id,
-        Task.assigned_to == developer_id
-    ).first()
+    task = (await db.execute(
+        select(Task).filter(
+            Task.id == task_id,
+            Task.assigned_to == developer_id
+        ).options(*profile_options("developer_update_task"))
+    )).scalars().first()
 
     if not task:
         raise HTTPException(status_code=404)
 
+    effort = (await get_effort(db, "task", [task.id]))[task.id]
+
     return templates.TemplateResponse(
         "developer_update_task.html",
         {
             "request": request,
-            "task": task
+            "task": task,
+            "effort": effort,
+            "max_hours": TIME_ENTRY_MAX_HOURS
         }
     )
 
@@ -343,21 +419,30 @@ async def update_task(
     request: Request,
     task_id: int,
     status: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     developer_id = request.session.get("user_id")
 
-    task = db.query(Task).filter(
-        Task.id == task_id,
-        Task.assigned_to == developer_id
-    ).first()
+    task = (await db.execute(
+        select(Task).filter(
+            Task.id == task_id,
+            Task.assigned_to == developer_id
+        ).options(joinedload(Task.project))
+        # Locked, so a concurrent change cannot snapshot the same old status
+        .with_for_update(of=Task)
+    )).scalars().first()
 
     if not task:
         raise HTTPException(status_code=404)
 
+    before = task_snapshot(task)
+
     task.status = TaskStatus[status]
 
-    db.commit()
+    await record_task_change(db, before, task_snapshot(task))
+    mark_project_stale(db, task.project)
+    task_changed(db, "updated", task, task.project)
+    await db.commit()
 
     return RedirectResponse(
         "/developer/dashboard",
@@ -365,6 +450,61 @@ async def update_task(
     )
 
 
+def form_datetime(name, value):
+    # Optional ISO 8601 form field -> naive UTC datetime (as stored), 400
+    # when it doesn't parse
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} is not an ISO 8601 date/time")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+@app.post("/developer/tasks/{task_id}/time")
+@role_required("DEVELOPER")
+async def log_task_time(
+    request: Request,
+    task_id: int,
+    minutes: int = Form(...),
+    started_at: str = Form(None),
+    db: AsyncSession = Depends(get_db)
+):
+    developer_id = request.session.get("user_id")
+
+    task = (await db.execute(
+        select(Task).filter(
+            Task.id == task_id,
+            Task.assigned_to == developer_id
+        )
+    )).scalars().first()
+
+    if not task:
+        raise HTTPException(status_code=404)
+
+    duration = minutes * 60
+    start = form_datetime("started_at", started_at)
+    if start is None:
+        # Without a start, the work is taken to have just finished
+        start = datetime.utcnow() - timedelta(seconds=duration)
+
+    error = entry_error(start, duration)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    await log_time(db, task, developer_id, start, duration)
+    await db.commit()
+
+    return RedirectResponse(
+        f"/developer/tasks/{task_id}/update",
+        status_code=303
+    )
+
+
 
 @app.get("/logout")
 def logout(request: Request):
@@ -372,6 +512,61 @@ def logout(request: Request):
     return RedirectResponse(url="/login", status_code=303)
 
 
+# ============================
+# Live task events (lead / manager pages, see live.py)
+# ============================
+
+@app.websocket("/ws/tasks")
+async def task_events_socket(websocket: WebSocket):
+    await serve_socket(websocket)
+
+
+# ============================
+# Readiness (load balancer / orchestrator probe)
+# ============================
+
+@app.get("/ready")
+def ready():
+    return JSONResponse(readiness.as_dict(), status_code=200 if readiness.ready else 503)
+
+
+# ============================
+# Internal Metrics (localhost only)
+# ============================
+
+@app.get("/internal/metrics")
+def internal_metrics(request: Request):
+    localhost_only(request)
+
+    return {
+        "passwords": passwords.metrics.snapshot(),
+        "render_cache": render_cache.stats(),
+        "live": live_hub.stats(),
+        "jobs": request.app.state.job_worker.stats() if JOB_WORKERS > 0 else None
+    }
+
+
+def localhost_only(request: Request):
+    if request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=404)
+
+
+@app.get("/internal/sql-trace")
+def sql_trace_mode(request: Request):
+    localhost_only(request)
+    return {"mode": sqltrace.settings.mode}
+
+
+@app.post("/internal/sql-trace")
+def set_sql_trace_mode(request: Request, mode: str = Query(...)):
+    # Per worker, until restart (SQL_TRACE sets the startup mode)
+    localhost_only(request)
+    if mode not in sqltrace.SQL_TRACE_MODES:
+        raise HTTPException(status_code=400, detail="mode must be off, request or all")
+    sqltrace.settings.mode = mode
+    return {"mode": mode}
+
+
 
 
 # ============================
@@ -380,15 +575,21 @@ def logout(request: Request):
 
 @app.get("/project-manager/projects")
 @role_required("PROJECT_MANAGER")
+@read_replica
+@query_budget("manager_projects")
 async def project_list(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     manager_id = request.session.get("user_id")
 
-    projects = db.query(Project).filter(
-        Project.created_by == manager_id
-    ).order_by(Project.created_at.desc()).all()
+    projects = (await db.execute(
+        select(Project).filter(
+            Project.created_by == manager_id
+        ).options(
+            *profile_options("manager_projects")
+        ).order_by(Project.created_at.desc())
+    )).scalars().all()
 
     return templates.TemplateResponse(
         "manager_projects.html",
@@ -407,11 +608,13 @@ async def project_list(
 @role_required("PROJECT_MANAGER")
 async def create_project_page(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    leads = db.query(User).filter(
-        User.role == UserRole.LEAD
-    ).all()
+    leads = (await db.execute(
+        select(User).filter(
+            User.role == UserRole.LEAD
+        )
+    )).scalars().all()
 
     return templates.TemplateResponse(
         "create_project.html",
@@ -432,7 +635,7 @@ async def create_project(
     request: Request,
     name: str = Form(...),
     lead_id: int = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     manager_id = request.session.get("user_id")
 
@@ -443,7 +646,8 @@ async def create_project(
     )
 
     db.add(project)
-    db.commit()
+    mark_stale(db, f"manager:{manager_id}", f"lead:{lead_id}")
+    await db.commit()
 
     return RedirectResponse(
         "/manager_dashboard.html",
@@ -455,34 +659,37 @@ from fastapi import HTTPException
 
 @app.get("/project-manager/projects/{project_id}")
 @role_required("PROJECT_MANAGER")
+@read_replica
+@conditional_view("project_detail", manager_project_stamp)
+@cached_view("project_detail", scope="project")
+@query_budget("project_detail")
 async def project_detail(
     request: Request,
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     manager_id = request.session.get("user_id")
 
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.created_by == manager_id
-    ).first()
+    project = (await db.execute(
+        select(Project).filter(
+            Project.id == project_id,
+            Project.created_by == manager_id
+        ).options(*profile_options("project_detail"))
+    )).scalars().first()
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    counter = await get_counter(db, "project", project.id)
+
     total_requirements = len(project.requirements)
-    total_tasks = len(project.tasks)
+    total_tasks = counter.total
 
-    completed_tasks = sum(
-        1 for task in project.tasks
-        if task.status == TaskStatus.COMPLETED
-    )
+    completed_tasks = counter.completed
 
     pending_tasks = total_tasks - completed_tasks
 
-    progress_percentage = 0
-    if total_tasks > 0:
-        progress_percentage = int((completed_tasks / total_tasks) * 100)
+    progress_percentage = counter.progress
 
     return templates.TemplateResponse(
         "project_detail.html",
@@ -502,11 +709,13 @@ async def project_detail(
 async def add_requirement_page(
     request: Request,
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    project = db.query(Project).filter(
-        Project.id == project_id
-    ).first()
+    project = (await db.execute(
+        select(Project).filter(
+            Project.id == project_id
+        )
+    )).scalars().first()
 
     if not project:
         raise HTTPException(status_code=404)
@@ -526,7 +735,7 @@ async def create_requirement(
     request: Request,
     project_id: int,
     requirement: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     manager_id = request.session.get("user_id")
 
@@ -536,34 +745,70 @@ async def create_requirement(
         created_by=manager_id
     )
 
+    project = await db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404)
+
     db.add(new_requirement)
-    db.commit()
+    mark_project_stale(db, project)
+    await db.commit()
 
     return RedirectResponse(
         f"/project-manager/projects/{project_id}",
         status_code=303
     )
 
+
+@app.post("/project-manager/projects/{project_id}/delete")
+@role_required("PROJECT_MANAGER")
+async def delete_project(
+    request: Request,
+    project_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    manager_id = request.session.get("user_id")
+
+    project = (await db.execute(
+        select(Project).filter(
+            Project.id == project_id,
+            Project.created_by == manager_id
+        )
+    )).scalars().first()
+
+    if not project:
+        raise HTTPException(status_code=404)
+
+    # Deleted in batches by a background job (purge.py)
+    await queue_project_delete(db, project, manager_id)
+    await db.commit()
+
+    return RedirectResponse("/project-manager/projects", status_code=303)
+
 @app.get("/lead-manager/projects/{project_id}/tasks/create")
 @role_required("LEAD")
+@query_budget("create_task")
 async def create_task_page(
     request: Request,
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.project_owner == lead_id
-    ).first()
+    project = (await db.execute(
+        select(Project).filter(
+            Project.id == project_id,
+            Project.project_owner == lead_id
+        ).options(*profile_options("create_task"))
+    )).scalars().first()
 
     if not project:
         raise HTTPException(status_code=404)
 
-    developers = db.query(User).filter(
-        User.role == UserRole.DEVELOPER
-    ).all()
+    developers = (await db.execute(
+        select(User).filter(
+            User.role == UserRole.DEVELOPER
+        )
+    )).scalars().all()
 
     return templates.TemplateResponse(
         "create_task.html",
@@ -575,6 +820,27 @@ async def create_task_page(
     )
 
 
+async def check_task_form(db, developer_id, project_id=None, requirement_id=None):
+    developer = await db.scalar(
+        select(User.id).filter(
+            User.id == developer_id,
+            User.role == UserRole.DEVELOPER
+        )
+    )
+    if not developer:
+        raise HTTPException(status_code=400, detail="Unknown developer")
+
+    if requirement_id is not None:
+        requirement = await db.scalar(
+            select(Requirement.id).filter(
+                Requirement.id == requirement_id,
+                Requirement.project_id == project_id
+            )
+        )
+        if not requirement:
+            raise HTTPException(status_code=400, detail="Unknown requirement")
+
+
 @app.post("/lead-manager/projects/{project_id}/tasks/create")
 @role_required("LEAD")
 async def create_task(
@@ -585,62 +851,114 @@ async def create_task(
     developer_id: int = Form(...),
     start_time: str = Form(None),
     end_time: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.project_owner == lead_id
-    ).first()
+    project = (await db.execute(
+        select(Project).filter(
+            Project.id == project_id,
+            Project.project_owner == lead_id
+        )
+    )).scalars().first()
 
     if not project:
         raise HTTPException(status_code=404)
 
+    # asyncpg needs real datetime objects
+    start = form_datetime("start_time", start_time)
+    end = form_datetime("end_time", end_time)
+    if start and end and end < start:
+        raise HTTPException(status_code=400, detail="end_time is before start_time")
+
+    # Foreign keys don't know about tenants: the form ids must resolve
+    # through this (tenant-scoped) session
+    await check_task_form(db, developer_id, project_id=project_id, requirement_id=requirement_id)
+
     new_task = Task(
         task=task,
         project_id=project_id,
         requirement_id=requirement_id,
         created_by=lead_id,
         assigned_to=developer_id,
-        status=TaskStatus.NOT_STARTED
+        status=TaskStatus.NOT_STARTED,
+        start_time=start,
+        end_time=end
     )
 
-    # Optional datetime parsing
-    if start_time:
-        new_task.start_time = start_time
-
-    if end_time:
-        new_task.end_time = end_time
-
     db.add(new_task)
-    db.commit()
+    await record_task_change(db, None, task_snapshot(new_task))
+    mark_project_stale(db, project)
+    task_changed(db, "created", new_task, project)
+    await db.commit()
 
     return RedirectResponse(
         f"/lead-manager/projects/{project_id}/tasks/create",
         status_code=303
     )
 
+@app.post("/lead-manager/projects/{project_id}/tasks/import")
+@role_required("LEAD")
+async def import_tasks_upload(
+    request: Request,
+    project_id: int,
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    skip_invalid: bool = Form(False),
+    dry_run: bool = Form(False),
+    db: AsyncSession = Depends(get_db)
+):
+    lead_id = request.session.get("user_id")
+
+    project = (await db.execute(
+        select(Project).filter(
+            Project.id == project_id,
+            Project.project_owner == lead_id
+        )
+    )).scalars().first()
+
+    if not project:
+        raise HTTPException(status_code=404)
+
+    fmt = format or detect_format(file.filename)
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or jsonl")
+
+    # Read straight from the spooled upload, chunk by chunk, in a worker
+    # thread (see importer.py)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    report = await import_tasks(
+        db, project, lead_id, stream, fmt,
+        skip_invalid=skip_invalid, dry_run=dry_run
+    )
+
+    ok = report.committed or (dry_run and not report.error_count)
+    return JSONResponse(report.as_dict(), status_code=200 if ok else 422)
+
 @app.get("/lead-manager/tasks/{task_id}/edit")
 @role_required("LEAD")
 async def edit_task_page(
     request: Request,
     task_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    task = db.query(Task).join(Project).filter(
-        Task.id == task_id,
-        Project.project_owner == lead_id
-    ).first()
+    task = (await db.execute(
+        select(Task).join(Project).filter(
+            Task.id == task_id,
+            Project.project_owner == lead_id
+        )
+    )).scalars().first()
 
     if not task:
         raise HTTPException(status_code=404)
 
-    developers = db.query(User).filter(
-        User.role == UserRole.DEVELOPER
-    ).all()
+    developers = (await db.execute(
+        select(User).filter(
+            User.role == UserRole.DEVELOPER
+        )
+    )).scalars().all()
 
     return templates.TemplateResponse(
         "edit_task.html",
@@ -659,23 +977,32 @@ async def edit_task(
     task_name: str = Form(...),
     developer_id: int = Form(...),
     status: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    task = db.query(Task).join(Project).filter(
-        Task.id == task_id,
-        Project.project_owner == lead_id
-    ).first()
+    task = (await db.execute(
+        select(Task).join(Project).filter(
+            Task.id == task_id,
+            Project.project_owner == lead_id
+        ).options(contains_eager(Task.project)).with_for_update(of=Task)
+    )).scalars().first()
 
     if not task:
         raise HTTPException(status_code=404)
 
+    await check_task_form(db, developer_id)
+
+    before = task_snapshot(task)
+
     task.task = task_name
     task.assigned_to = developer_id
     task.status = TaskStatus[status]
 
-    db.commit()
+    await record_task_change(db, before, task_snapshot(task))
+    mark_project_stale(db, task.project)
+    task_changed(db, "updated", task, task.project)
+    await db.commit()
 
     return RedirectResponse(
         f"/lead-manager/projects/{task.project_id}",
@@ -685,17 +1012,23 @@ async def edit_task(
 
 @app.get("/lead-manager/projects/{project_id}")
 @role_required("LEAD")
+@read_replica
+@conditional_view("lead_project_detail", lead_project_stamp)
+@cached_view("lead_project_detail", scope="project")
+@query_budget("lead_project_detail")
 async def lead_project_detail(
     request: Request,
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.project_owner == lead_id
-    ).first()
+    project = (await db.execute(
+        select(Project).filter(
+            Project.id == project_id,
+            Project.project_owner == lead_id
+        ).options(*profile_options("lead_project_detail"))
+    )).scalars().first()
 
     if not project:
         raise HTTPException(status_code=404)
@@ -714,22 +1047,29 @@ async def lead_project_detail(
 async def delete_task(
     request: Request,
     task_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    task = db.query(Task).join(Project).filter(
-        Task.id == task_id,
-        Project.project_owner == lead_id
-    ).first()
+    task = (await db.execute(
+        select(Task).join(Project).filter(
+            Task.id == task_id,
+            Project.project_owner == lead_id
+        ).options(contains_eager(Task.project)).with_for_update(of=Task)
+    )).scalars().first()
 
     if not task:
         raise HTTPException(status_code=404)
 
     project_id = task.project_id
 
-    db.delete(task)
-    db.commit()
+    # Logged time stays, with its effort totals (see timelog.py); unlike a
+    # project delete (purge.py), the requirement and project are still there
+    await record_task_change(db, task_snapshot(task), None)
+    mark_project_stale(db, task.project)
+    task_changed(db, "deleted", task, task.project)
+    await db.delete(task)
+    await db.commit()
 
     return RedirectResponse(
         f"/lead-manager/projects/{project_id}",
@@ -737,58 +1077,129 @@ async def delete_task(
     )
 
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 
 @app.get("/lead-manager/calendar")
 @role_required("LEAD")
+@read_replica
+@conditional_view("lead_calendar", lead_calendar_stamp)
+@query_budget("lead_calendar")
 async def lead_calendar(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    view: str = Query("month"),
+    start: Optional[date] = Query(None)
 ):
     lead_id = request.session.get("user_id")
 
-    tasks = db.query(Task).join(Project).filter(
-        Project.project_owner == lead_id,
-        Task.start_time != None
-    ).all()
-
-    # Group tasks by date
-    calendar_data = {}
+    window = calendar_window(view, start)
 
-    for task in tasks:
-        date_key = task.start_time.date()
-
-        if date_key not in calendar_data:
-            calendar_data[date_key] = []
-
-        calendar_data[date_key].append(task)
+    # Filtered to the window and grouped by day in SQL (see schedule.py)
+    calendar_data = await lead_calendar_days(
+        db, lead_id, window, profile_options("lead_calendar")
+    )
 
     return templates.TemplateResponse(
         "lead_calendar.html",
         {
             "request": request,
-            "calendar_data": calendar_data
+            "calendar_data": calendar_data,
+            "window": window
         }
     )
 
 
+# ==============================
+# EXPORT (CSV / NDJSON, streamed)
+# ==============================
+
+async def export_response(db, kind, scope_filter, project_id, format, gzip):
+    if kind not in EXPORT_KINDS or format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404)
+
+    if project_id is not None:
+        found = await db.scalar(
+            select(Project.id).filter(Project.id == project_id, scope_filter)
+        )
+        if not found:
+            raise HTTPException(status_code=404)
+
+    filename = f"{kind}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        stream_export(
+            export_query(kind, scope_filter, project_id), format, gzip,
+            tenant_id=db.info.get("tenant_id")
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/project-manager/export/{kind}")
+@role_required("PROJECT_MANAGER")
+@read_replica
+async def manager_export(
+    request: Request,
+    kind: str,
+    project_id: Optional[int] = Query(None),
+    format: str = Query("csv"),
+    gzip: bool = Query(False),
+    db: AsyncSession = Depends(get_db)
+):
+    manager_id = request.session.get("user_id")
+
+    return await export_response(
+        db, kind, Project.created_by == manager_id, project_id, format, gzip
+    )
+
+
+@app.get("/lead-manager/export/{kind}")
+@role_required("LEAD")
+@read_replica
+async def lead_export(
+    request: Request,
+    kind: str,
+    project_id: Optional[int] = Query(None),
+    format: str = Query("csv"),
+    gzip: bool = Query(False),
+    db: AsyncSession = Depends(get_db)
+):
+    lead_id = request.session.get("user_id")
+
+    return await export_response(
+        db, kind, Project.project_owner == lead_id, project_id, format, gzip
+    )
+
+
 @app.get("/lead-manager/projects")
 @role_required("LEAD")
+@read_replica
+@query_budget("lead_projects")
 async def lead_projects(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     lead_id = request.session.get("user_id")
 
-    projects = db.query(Project).filter(
-        Project.project_owner == lead_id
-    ).all()
+    projects = (await db.execute(
+        select(Project).filter(
+            Project.project_owner == lead_id
+        ).options(*profile_options("lead_projects"))
+    )).scalars().all()
+
+    counters = await get_counters(db, "project", [p.id for p in projects])
 
     return templates.TemplateResponse(
         "lead_projects.html",
         {
             "request": request,
-            "projects": projects
+            "projects": projects,
+            "counters": counters
         }
     )
 
@@ -797,39 +1208,46 @@ async def lead_projects(
 
 @app.get("/lead-manager/tasks")
 # @role_required("LEAD")
+@read_replica
+@query_budget("lead_all_tasks")
 async def lead_all_tasks(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     project_id: Optional[int] = Query(None),
-    page: int = Query(1)
+    cursor: Optional[str] = Query(None),
+    page_size: int = Query(DEFAULT_PAGE_SIZE)
 ):
     lead_id = request.session.get("user_id")
 
-    page_size = 5
-    offset = (page - 1) * page_size
+    page_size = clamp_page_size(page_size)
 
     # Get lead projects for dropdown
-    projects = db.query(Project).filter(
-        Project.project_owner == lead_id
-    ).all()
+    projects = (await db.execute(
+        select(Project).filter(
+            Project.project_owner == lead_id
+        )
+    )).scalars().all()
 
     # Base query
-    query = db.query(Task).join(Project).filter(
+    query = select(Task).join(Project).filter(
         Project.project_owner == lead_id
-    )
+    ).options(*profile_options("lead_all_tasks"))
 
     # Filter by project
     if project_id:
         query = query.filter(Task.project_id == project_id)
 
-    total_tasks = query.count()
-
-    tasks = query.order_by(Task.created_at.desc()) \
-                 .offset(offset) \
-                 .limit(page_size) \
-                 .all()
+    tasks, next_cursor, prev_cursor = await keyset_page(
+        db, query, Task, cursor=cursor, page_size=page_size
+    )
 
-    total_pages = ceil(total_tasks / page_size) if total_tasks else 1
+    # Total from the maintained counters instead of COUNT(*) per page
+    counted_ids = [
+        p.id for p in projects
+        if not project_id or p.id == project_id
+    ]
+    counters = await get_counters(db, "project", counted_ids)
+    total_tasks = sum(c.total for c in counters.values())
 
     return templates.TemplateResponse(
         "lead_all_tasks.html",
@@ -838,7 +1256,37 @@ async def lead_all_tasks(
             "tasks": tasks,
             "projects": projects,
             "selected_project": project_id,
-            "page": page,
-            "total_pages": total_pages
+            "page_size": page_size,
+            "total_tasks": total_tasks,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
+        }
+    )
+
+
+# ============================
+# Search (all roles, scoped to what the user can see)
+# ============================
+
+@app.get("/search")
+@role_required("PROJECT_MANAGER", "LEAD", "DEVELOPER")
+@read_replica
+async def search_page(
+    request: Request,
+    q: str = Query(""),
+    db: AsyncSession = Depends(get_db)
+):
+    results = await search(
+        db, q,
+        request.session.get("user_id"),
+        request.session.get("role")
+    )
+
+    return templates.TemplateResponse(
+        "search.html",
+        {
+            "request": request,
+            "q": q,
+            "results": results
         }
     )
@@ -0,0 +1,184 @@
+# migrate.py
+#
+# Schema migrations (Alembic, scripts in migrations/versions/).
+#
+#   python migrate.py upgrade              # to the latest revision
+#   python migrate.py downgrade -1         # one step back
+#   python migrate.py current              # revision the database is at
+#   python migrate.py history
+#   python migrate.py stamp 0001           # existing create_all database
+#   python migrate.py revision -m "add x"  # new script (autogenerate)
+#   python migrate.py check-indexes        # EXPLAIN the hot queries
+#
+# `check-indexes` plans every dashboard / list query with sequential scans
+# disabled. If Postgres still picks a Seq Scan on one of our tables, no
+# usable index exists for that query and the command exits with 1.
+# Queries are planned scoped to a tenant, as the request sessions run them.
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from database import engine
+from models import Project, Requirement, Task
+from stats import manager_dashboard_stats_query, manager_recent_projects_query
+from schedule import calendar_window, lead_calendar_query
+from search import task_search_query, requirement_search_query
+from etags import manager_project_stamp, developer_dashboard_stamp, lead_calendar_stamp
+from tenancy import scoped
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+CHECKED_TABLES = {"users", "projects", "requirements", "tasks"}
+
+# tasks_p0, tasks_p1 ... (migration 0005)
+TASK_PARTITION = re.compile(r"^tasks_p\d+$")
+
+
+def alembic_config():
+    return Config(str(ALEMBIC_INI))
+
+
+# ==============================
+# EXPLAIN CHECK
+# ==============================
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def hot_queries():
+    # Same shape as the route queries; ids are placeholders,
+    # the planner only needs the predicates.
+    lead_tasks = select(Task).join(Project).filter(
+        Project.project_owner == 1
+    )
+
+    queries = {
+        "manager_dashboard_stats": manager_dashboard_stats_query(1),
+        "manager_recent_projects": manager_recent_projects_query(1),
+        "manager_project_list": select(Project).filter(
+            Project.created_by == 1
+        ).order_by(Project.created_at.desc()),
+        "lead_projects": select(Project).filter(
+            Project.project_owner == 1
+        ),
+        "lead_task_list_project": lead_tasks.filter(
+            Task.project_id == 1
+        ).order_by(Task.created_at.desc(), Task.id.desc()).limit(6),
+        "lead_calendar": lead_calendar_query(1, calendar_window("month")),
+        "project_tasks": select(Task).filter(
+            Task.project_id.in_([1, 2, 3])
+        ),
+        "project_requirements": select(Requirement).filter(
+            Requirement.project_id.in_([1, 2, 3])
+        ),
+        "developer_tasks": select(Task).filter(
+            Task.assigned_to == 1
+        ),
+        # ETag stamps run on every conditional GET
+        "project_stamp": manager_project_stamp(1, project_id=1),
+        "developer_dashboard_stamp": developer_dashboard_stamp(1),
+        "lead_calendar_stamp": lead_calendar_stamp(1, "month"),
+        # Search must stay on the GIN indexes
+        "task_search": task_search_query("login:*", 1, "PROJECT_MANAGER", 20),
+        "requirement_search": requirement_search_query("login:*", 1, "DEVELOPER", 20),
+    }
+    return {name: scoped(statement, 1) for name, statement in queries.items()}
+
+
+def _seq_scans(plan):
+    found = []
+    relation = plan.get("Relation Name") or ""
+    if plan.get("Node Type") == "Seq Scan" and (
+        relation in CHECKED_TABLES or TASK_PARTITION.match(relation)
+    ):
+        found.append(relation)
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def check_indexes():
+    failed = []
+
+    with engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+
+        for name, statement in hot_queries().items():
+            raw = conn.execute(Explain(statement)).scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+
+            seq_scans = _seq_scans(plan)
+            if seq_scans:
+                failed.append(name)
+                print(f"FAIL  {name}: Seq Scan on {', '.join(seq_scans)}")
+            else:
+                print(f"OK    {name}")
+
+    return not failed
+
+
+# ==============================
+# CLI
+# ==============================
+
+def main():
+    parser = argparse.ArgumentParser(description="Database migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    upgrade = sub.add_parser("upgrade")
+    upgrade.add_argument("revision", nargs="?", default="head")
+    upgrade.add_argument("--sql", action="store_true", help="print DDL only")
+
+    downgrade = sub.add_parser("downgrade")
+    downgrade.add_argument("revision", nargs="?", default="-1")
+
+    stamp = sub.add_parser("stamp")
+    stamp.add_argument("revision")
+
+    revision = sub.add_parser("revision")
+    revision.add_argument("-m", "--message", required=True)
+
+    sub.add_parser("current")
+    sub.add_parser("history")
+    sub.add_parser("check-indexes")
+
+    args = parser.parse_args()
+    config = alembic_config()
+
+    if args.command == "upgrade":
+        command.upgrade(config, args.revision, sql=args.sql)
+    elif args.command == "downgrade":
+        command.downgrade(config, args.revision)
+    elif args.command == "stamp":
+        command.stamp(config, args.revision)
+    elif args.command == "revision":
+        command.revision(config, message=args.message, autogenerate=True)
+    elif args.command == "current":
+        command.current(config, verbose=True)
+    elif args.command == "history":
+        command.history(config)
+    elif args.command == "check-indexes":
+        if not check_indexes():
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
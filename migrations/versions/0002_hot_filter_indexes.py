@@ -0,0 +1,60 @@
+"""indexes for the hot route filters
+
+Each index maps to the queries in main.py / stats.py that use it:
+
+  ix_tasks_project_created_at_id   project pages (tasks by project_id),
+                                   lead task list keyset pagination
+                                   (created_at, id), manager stats
+                                   (status is INCLUDEd -> index-only scan)
+  ix_tasks_assigned_to_created_at  developer dashboard
+  ix_tasks_project_start_time      lead calendar
+  ix_tasks_requirement_id          requirement -> tasks
+  ix_projects_created_by_created_at  manager dashboard / project list
+  ix_projects_project_owner        every lead page
+  ix_requirements_project_id       project -> requirements, "no requirements" alert
+
+Built CONCURRENTLY so the upgrade does not block writes on a live table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_tasks_project_created_at_id", "tasks", ["project_id", "created_at", "id"], {"postgresql_include": ["status"]}),
+    ("ix_tasks_assigned_to_created_at", "tasks", ["assigned_to", "created_at"], {}),
+    ("ix_tasks_project_start_time", "tasks", ["project_id", "start_time"], {}),
+    ("ix_tasks_requirement_id", "tasks", ["requirement_id"], {}),
+    ("ix_projects_created_by_created_at", "projects", ["created_by", "created_at"], {}),
+    ("ix_projects_project_owner", "projects", ["project_owner"], {}),
+    ("ix_requirements_project_id", "requirements", ["project_id"], {}),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+                **kwargs
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True
+            )
@@ -0,0 +1,41 @@
+"""index for the lead calendar window
+
+The calendar shows tasks that start inside the visible month / week and
+tasks that started earlier but are still running into it:
+
+  start_time < :window_end AND
+  (start_time >= :window_start OR end_time >= :window_start)
+
+ix_tasks_project_start_time serves the first branch,
+ix_tasks_project_end_time the second (bitmap OR), so the page no longer
+reads the lead's whole task history.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tasks_project_end_time", "tasks", ["project_id", "end_time"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_project_end_time", table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
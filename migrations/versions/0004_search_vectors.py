@@ -0,0 +1,69 @@
+"""full-text search columns and GIN indexes
+
+requirements.search_vector and tasks.search_vector are stored generated
+columns (to_tsvector over the requirement / task text), so Postgres keeps
+them current on every INSERT, UPDATE and COPY - no triggers, nothing for
+the application to maintain.
+
+Adding a stored generated column rewrites the table under an exclusive
+lock (seconds for a million tasks); the GIN indexes are then built
+concurrently.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Same configuration as models.SEARCH_CONFIG at the time of this revision
+SEARCH_CONFIG = "english"
+
+
+def upgrade():
+    op.add_column("requirements", sa.Column(
+        "search_vector", TSVECTOR,
+        sa.Computed(f"to_tsvector('{SEARCH_CONFIG}', requirement)", persisted=True)
+    ))
+    op.add_column("tasks", sa.Column(
+        "search_vector", TSVECTOR,
+        sa.Computed(f"to_tsvector('{SEARCH_CONFIG}', task)", persisted=True)
+    ))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_requirements_search_vector", "requirements", ["search_vector"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            "ix_tasks_search_vector", "tasks", ["search_vector"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_tasks_search_vector", table_name="tasks",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.drop_index(
+            "ix_requirements_search_vector", table_name="requirements",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+
+    op.drop_column("tasks", "search_vector")
+    op.drop_column("requirements", "search_vector")
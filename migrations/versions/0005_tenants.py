@@ -0,0 +1,177 @@
+"""tenants, tenant_id everywhere, tasks partitioned by tenant
+
+- new `tenants` table; existing data becomes tenant 1 ("Default")
+- tenant_id on users, projects, requirements and tasks
+- tasks is rebuilt as a table partitioned by HASH (tenant_id) into
+  TASK_PARTITIONS partitions, primary key (tenant_id, id); the id
+  sequence is kept, so task ids don't change
+- the route indexes are recreated with tenant_id as leading column
+
+The tasks rebuild copies every row inside the migration transaction and
+holds an exclusive lock on tasks until it commits: run it in a
+maintenance window on large installations.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ENUM, TSVECTOR
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+TASK_PARTITIONS = 16
+
+TENANT_TABLES = ("users", "projects", "requirements")
+
+TASK_FOREIGN_KEYS = (
+    "tasks_project_id_fkey", "tasks_requirement_id_fkey",
+    "tasks_created_by_fkey", "tasks_assigned_to_fkey",
+)
+
+TASK_COLUMNS = (
+    "id, task, project_id, requirement_id, created_by, assigned_to, "
+    "start_time, end_time, effort, status, created_at, updated_at"
+)
+
+# name -> (table, columns, kwargs); before and after this revision
+OLD_INDEXES = {
+    "ix_projects_created_by_created_at": ("projects", ["created_by", "created_at"], {}),
+    "ix_projects_project_owner": ("projects", ["project_owner"], {}),
+    "ix_requirements_project_id": ("requirements", ["project_id"], {}),
+}
+NEW_INDEXES = {
+    "ix_users_tenant_id_role": ("users", ["tenant_id", "role"], {}),
+    "ix_projects_tenant_created_by_created_at": ("projects", ["tenant_id", "created_by", "created_at"], {}),
+    "ix_projects_tenant_project_owner": ("projects", ["tenant_id", "project_owner"], {}),
+    "ix_requirements_tenant_project_id": ("requirements", ["tenant_id", "project_id"], {}),
+}
+OLD_TASK_INDEXES = {
+    "ix_tasks_id": (["id"], {}),
+    "ix_tasks_project_created_at_id": (["project_id", "created_at", "id"], {"postgresql_include": ["status"]}),
+    "ix_tasks_assigned_to_created_at": (["assigned_to", "created_at"], {}),
+    "ix_tasks_project_start_time": (["project_id", "start_time"], {}),
+    "ix_tasks_project_end_time": (["project_id", "end_time"], {}),
+    "ix_tasks_requirement_id": (["requirement_id"], {}),
+    "ix_tasks_search_vector": (["search_vector"], {"postgresql_using": "gin"}),
+}
+NEW_TASK_INDEXES = {
+    "ix_tasks_tenant_project_created_at_id": (
+        ["tenant_id", "project_id", "created_at", "id"], {"postgresql_include": ["status"]}
+    ),
+    "ix_tasks_tenant_assigned_to_created_at": (["tenant_id", "assigned_to", "created_at"], {}),
+    "ix_tasks_tenant_project_start_time": (["tenant_id", "project_id", "start_time"], {}),
+    "ix_tasks_tenant_project_end_time": (["tenant_id", "project_id", "end_time"], {}),
+    "ix_tasks_tenant_requirement_id": (["tenant_id", "requirement_id"], {}),
+    "ix_tasks_search_vector": (["search_vector"], {"postgresql_using": "gin"}),
+}
+
+
+def _task_columns(partitioned):
+    columns = [
+        sa.Column("id", sa.Integer, server_default=sa.text("nextval('tasks_id_seq')"), nullable=False),
+        sa.Column("task", sa.String(255), nullable=False),
+        sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id"), nullable=False),
+        sa.Column("requirement_id", sa.Integer, sa.ForeignKey("requirements.id"), nullable=False),
+        sa.Column("created_by", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("assigned_to", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("start_time", sa.DateTime, nullable=True),
+        sa.Column("end_time", sa.DateTime, nullable=True),
+        sa.Column("effort", sa.Time, nullable=True),
+        sa.Column("status", ENUM(name="taskstatus", create_type=False)),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+        sa.Column(
+            "search_vector", TSVECTOR,
+            sa.Computed("to_tsvector('english', task)", persisted=True)
+        ),
+    ]
+    if partitioned:
+        columns += [
+            sa.Column("tenant_id", sa.Integer, sa.ForeignKey("tenants.id"), nullable=False),
+            sa.PrimaryKeyConstraint("tenant_id", "id", name="tasks_pkey"),
+        ]
+    else:
+        columns.append(sa.PrimaryKeyConstraint("id", name="tasks_pkey"))
+    return columns
+
+
+def _replace_tasks_table(partitioned, copy_select):
+    # Keep the sequence (and so every task id) across the rebuild
+    op.execute("ALTER SEQUENCE tasks_id_seq OWNED BY NONE")
+    op.rename_table("tasks", "tasks_old")
+    # Free the constraint / index names for the new table
+    op.execute("ALTER TABLE tasks_old RENAME CONSTRAINT tasks_pkey TO tasks_old_pkey")
+    for name in TASK_FOREIGN_KEYS:
+        op.drop_constraint(name, "tasks_old", type_="foreignkey")
+    for name in (NEW_TASK_INDEXES if not partitioned else OLD_TASK_INDEXES):
+        op.drop_index(name, table_name="tasks_old", if_exists=True)
+
+    if partitioned:
+        op.create_table("tasks", *_task_columns(True), postgresql_partition_by="HASH (tenant_id)")
+        for remainder in range(TASK_PARTITIONS):
+            op.execute(
+                f"CREATE TABLE tasks_p{remainder} PARTITION OF tasks "
+                f"FOR VALUES WITH (MODULUS {TASK_PARTITIONS}, REMAINDER {remainder})"
+            )
+    else:
+        op.create_table("tasks", *_task_columns(False))
+
+    op.execute(copy_select)
+    op.drop_table("tasks_old")
+    op.execute("ALTER SEQUENCE tasks_id_seq OWNED BY tasks.id")
+
+    # Indexes after the copy: one sort per index instead of row-by-row inserts
+    for name, (columns, kwargs) in (NEW_TASK_INDEXES if partitioned else OLD_TASK_INDEXES).items():
+        op.create_index(name, "tasks", columns, **kwargs)
+    op.execute("ANALYZE tasks")
+
+
+def upgrade():
+    op.create_table(
+        "tenants",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    )
+    op.execute("INSERT INTO tenants (id, name, created_at) VALUES (1, 'Default', now())")
+    op.execute("SELECT setval('tenants_id_seq', 1)")
+
+    # Constant default: no table rewrite, existing rows read as tenant 1
+    for table in TENANT_TABLES:
+        op.add_column(table, sa.Column("tenant_id", sa.Integer, nullable=False, server_default="1"))
+        op.alter_column(table, "tenant_id", server_default=None)
+        op.create_foreign_key(f"{table}_tenant_id_fkey", table, "tenants", ["tenant_id"], ["id"])
+
+    for name, (table, _, _) in OLD_INDEXES.items():
+        op.drop_index(name, table_name=table)
+    for name, (table, columns, kwargs) in NEW_INDEXES.items():
+        op.create_index(name, table, columns, **kwargs)
+
+    _replace_tasks_table(True, (
+        f"INSERT INTO tasks (tenant_id, {TASK_COLUMNS}) "
+        f"SELECT projects.tenant_id, {', '.join('tasks_old.' + c for c in TASK_COLUMNS.split(', '))} "
+        f"FROM tasks_old JOIN projects ON projects.id = tasks_old.project_id"
+    ))
+
+
+def downgrade():
+    _replace_tasks_table(False, (
+        f"INSERT INTO tasks ({TASK_COLUMNS}) SELECT {TASK_COLUMNS} FROM tasks_old"
+    ))
+
+    for name, (table, _, _) in NEW_INDEXES.items():
+        op.drop_index(name, table_name=table)
+    for name, (table, columns, kwargs) in OLD_INDEXES.items():
+        op.create_index(name, table, columns, **kwargs)
+
+    for table in TENANT_TABLES:
+        op.drop_constraint(f"{table}_tenant_id_fkey", table, type_="foreignkey")
+        op.drop_column(table, "tenant_id")
+
+    op.drop_table("tenants")
@@ -0,0 +1,121 @@
+"""time entries and effort rollups
+
+- time_entries: append-only log (task, developer, start, duration);
+  a trigger rejects UPDATE and DELETE
+- effort_totals: seconds / entries per task, requirement, project and
+  developer
+- weekly_effort: seconds / entries per developer and week
+
+Existing `tasks.effort` values are carried over as one entry each (for
+tasks with an assignee), started at the task's start_time or created_at,
+and the rollups are built from the log.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+APPEND_ONLY_FUNCTION = """
+CREATE FUNCTION time_entries_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'time_entries is append-only (% rejected)', TG_OP;
+END
+$$ LANGUAGE plpgsql
+"""
+
+APPEND_ONLY_TRIGGER = """
+CREATE TRIGGER time_entries_append_only
+BEFORE UPDATE OR DELETE ON time_entries
+FOR EACH ROW EXECUTE FUNCTION time_entries_append_only()
+"""
+
+BACKFILL = """
+INSERT INTO time_entries
+    (tenant_id, task_id, requirement_id, project_id, developer_id,
+     started_at, duration_seconds, created_at)
+SELECT tenant_id, id, requirement_id, project_id, assigned_to,
+       COALESCE(start_time, created_at, now()),
+       EXTRACT(EPOCH FROM effort)::integer, now()
+FROM tasks
+WHERE effort IS NOT NULL
+  AND assigned_to IS NOT NULL
+  AND EXTRACT(EPOCH FROM effort) > 0
+"""
+
+ROLLUP_TOTALS = """
+INSERT INTO effort_totals (scope, scope_id, seconds, entries, updated_at)
+SELECT scope, scope_id, SUM(duration_seconds), COUNT(*), now()
+FROM time_entries,
+     LATERAL (VALUES ('task', task_id), ('requirement', requirement_id),
+                     ('project', project_id), ('developer', developer_id)) AS s (scope, scope_id)
+GROUP BY scope, scope_id
+"""
+
+ROLLUP_WEEKS = """
+INSERT INTO weekly_effort (developer_id, week, seconds, entries, updated_at)
+SELECT developer_id, date_trunc('week', started_at)::date, SUM(duration_seconds), COUNT(*), now()
+FROM time_entries
+GROUP BY 1, 2
+"""
+
+
+def upgrade():
+    op.create_table(
+        "time_entries",
+        sa.Column("id", sa.BigInteger, primary_key=True),
+        sa.Column("tenant_id", sa.Integer, sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("task_id", sa.Integer, nullable=False),
+        sa.Column("requirement_id", sa.Integer, sa.ForeignKey("requirements.id"), nullable=False),
+        sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id"), nullable=False),
+        sa.Column("developer_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("started_at", sa.DateTime, nullable=False),
+        sa.Column("duration_seconds", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+        sa.CheckConstraint("duration_seconds > 0", name="ck_time_entries_duration_positive"),
+    )
+    op.create_index(
+        "ix_time_entries_tenant_task_started_at", "time_entries",
+        ["tenant_id", "task_id", "started_at"]
+    )
+    op.create_index(
+        "ix_time_entries_tenant_developer_started_at", "time_entries",
+        ["tenant_id", "developer_id", "started_at"]
+    )
+    op.execute(APPEND_ONLY_FUNCTION)
+    op.execute(APPEND_ONLY_TRIGGER)
+
+    op.create_table(
+        "effort_totals",
+        sa.Column("scope", sa.String(20), primary_key=True),
+        sa.Column("scope_id", sa.Integer, primary_key=True),
+        sa.Column("seconds", sa.BigInteger, nullable=False),
+        sa.Column("entries", sa.Integer, nullable=False),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    op.create_table(
+        "weekly_effort",
+        sa.Column("developer_id", sa.Integer, primary_key=True),
+        sa.Column("week", sa.Date, primary_key=True),
+        sa.Column("seconds", sa.BigInteger, nullable=False),
+        sa.Column("entries", sa.Integer, nullable=False),
+        sa.Column("updated_at", sa.DateTime),
+    )
+
+    op.execute(BACKFILL)
+    op.execute(ROLLUP_TOTALS)
+    op.execute(ROLLUP_WEEKS)
+
+
+def downgrade():
+    op.drop_table("weekly_effort")
+    op.drop_table("effort_totals")
+    op.drop_table("time_entries")
+    op.execute("DROP FUNCTION time_entries_append_only()")
@@ -0,0 +1,34 @@
+"""daily per-project task status history
+
+project_daily_status holds one row per project and day, written by the
+snapshot job (snapshots.py). There is no activity log to rebuild past days
+from, so history starts with the first snapshot after this revision.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "project_daily_status",
+        sa.Column("project_id", sa.Integer, sa.ForeignKey("projects.id"), primary_key=True),
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("not_started", sa.Integer, nullable=False),
+        sa.Column("in_progress", sa.Integer, nullable=False),
+        sa.Column("completed", sa.Integer, nullable=False),
+        sa.Column("taken_at", sa.DateTime),
+    )
+
+
+def downgrade():
+    op.drop_table("project_daily_status")
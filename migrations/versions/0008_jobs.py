@@ -0,0 +1,51 @@
+"""jobs table for deferred work
+
+One row per job (jobs.py). Workers claim queued jobs with
+SELECT ... FOR UPDATE SKIP LOCKED on the partial index over
+status = 'queued'.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.BigInteger, primary_key=True),
+        sa.Column("queue", sa.String(50), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("payload", JSONB, nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("max_attempts", sa.Integer, nullable=False),
+        sa.Column("run_at", sa.DateTime, nullable=False),
+        sa.Column("locked_at", sa.DateTime, nullable=True),
+        sa.Column("locked_by", sa.String(100), nullable=True),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("finished_at", sa.DateTime, nullable=True),
+    )
+    op.create_index(
+        "ix_jobs_queue_run_at_queued", "jobs", ["queue", "run_at"],
+        postgresql_where=sa.text("status = 'queued'")
+    )
+    op.create_index(
+        "ix_jobs_queue_locked_at_running", "jobs", ["queue", "locked_at"],
+        postgresql_where=sa.text("status = 'running'")
+    )
+    op.create_index("ix_jobs_status_finished_at", "jobs", ["status", "finished_at"])
+
+
+def downgrade():
+    op.drop_table("jobs")
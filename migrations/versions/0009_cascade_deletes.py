@@ -0,0 +1,88 @@
+"""ON DELETE CASCADE for project data, batched project delete support
+
+- requirements, tasks, time_entries and project_daily_status go with
+  their project (and tasks / time entries with their requirement)
+- the time_entries append-only trigger lets deletes through when they
+  come from one of those cascades, or from purge.py (which sets
+  time_entries.allow_delete for its transaction)
+- tasks / time_entries get a (requirement_id, id) index, so the foreign
+  key checks of a requirement delete and the batches of purge.py are
+  index lookups; it replaces ix_tasks_tenant_requirement_id
+- jobs.progress for the progress of long jobs
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table)
+CASCADE_FOREIGN_KEYS = [
+    ("requirements", "project_id", "projects"),
+    ("tasks", "project_id", "projects"),
+    ("tasks", "requirement_id", "requirements"),
+    ("time_entries", "project_id", "projects"),
+    ("time_entries", "requirement_id", "requirements"),
+    ("project_daily_status", "project_id", "projects"),
+]
+
+# Cascaded deletes run inside the foreign key's own trigger, hence
+# pg_trigger_depth() > 1
+APPEND_ONLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION time_entries_append_only() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' AND (
+        pg_trigger_depth() > 1
+        OR current_setting('time_entries.allow_delete', true) = 'on'
+    ) THEN
+        RETURN OLD;
+    END IF;
+    RAISE EXCEPTION 'time_entries is append-only (% rejected)', TG_OP;
+END
+$$ LANGUAGE plpgsql
+"""
+
+STRICT_APPEND_ONLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION time_entries_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'time_entries is append-only (% rejected)', TG_OP;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _replace_foreign_keys(ondelete):
+    for table, column, referenced in CASCADE_FOREIGN_KEYS:
+        name = f"{table}_{column}_fkey"
+        op.drop_constraint(name, table, type_="foreignkey")
+        op.create_foreign_key(name, table, referenced, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys("CASCADE")
+    op.execute(APPEND_ONLY_FUNCTION)
+
+    op.drop_index("ix_tasks_tenant_requirement_id", table_name="tasks")
+    op.create_index("ix_tasks_requirement_id_id", "tasks", ["requirement_id", "id"])
+    op.create_index("ix_time_entries_requirement_id_id", "time_entries", ["requirement_id", "id"])
+
+    op.add_column("jobs", sa.Column("progress", JSONB, nullable=True))
+
+
+def downgrade():
+    op.drop_column("jobs", "progress")
+
+    op.drop_index("ix_time_entries_requirement_id_id", table_name="time_entries")
+    op.drop_index("ix_tasks_requirement_id_id", table_name="tasks")
+    op.create_index("ix_tasks_tenant_requirement_id", "tasks", ["tenant_id", "requirement_id"])
+
+    op.execute(STRICT_APPEND_ONLY_FUNCTION)
+    _replace_foreign_keys(None)
@@ -10,11 +10,23 @@ from sqlalchemy import (
     ForeignKey,
     DateTime,
     Enum as SqlEnum,
-    Time
+    Index,
+    Time,
+    Computed,
+    Sequence,
+    PrimaryKeyConstraint,
+    BigInteger,
+    Date,
+    CheckConstraint,
+    text
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
+from sqlalchemy.orm import relationship, deferred, declared_attr
 from database import Base  # <-- Use the shared Base from database.py
 
+# Text search configuration of the search_vector columns (see search.py)
+SEARCH_CONFIG = "english"
+
 # -------------------------
 # ENUMS
 # -------------------------
@@ -30,10 +42,30 @@ class TaskStatus(Enum):
     COMPLETED = "Completed"
 
 
+# -------------------------
+# TENANTS TABLE
+# -------------------------
+# One customer organisation. Users, projects, requirements and tasks all
+# carry its id; request sessions only ever see their own tenant's rows
+# (see tenancy.py).
+class Tenant(Base):
+    __tablename__ = "tenants"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TenantScoped:
+    @declared_attr
+    def tenant_id(cls):
+        return Column(Integer, ForeignKey("tenants.id"), nullable=False)
+
+
 # -------------------------
 # USERS TABLE
 # -------------------------
-class User(Base):
+class User(TenantScoped, Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -74,12 +106,15 @@ class User(Base):
         foreign_keys="Task.assigned_to"
     )
 
+    __table_args__ = (
+        Index("ix_users_tenant_id_role", "tenant_id", "role"),
+    )
 
 
 # -------------------------
 # PROJECTS TABLE
 # -------------------------
-class Project(Base):
+class Project(TenantScoped, Base):
     __tablename__ = "projects"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -98,44 +133,75 @@ class Project(Base):
     creator = relationship(
         "User", back_populates="created_projects", foreign_keys=[created_by]
     )
+    # Rows go with the project through ON DELETE CASCADE (migration 0009);
+    # the ORM does not load them to delete them one by one. Large projects
+    # are deleted in batches instead, see purge.py.
     requirements = relationship(
-        "Requirement", back_populates="project", cascade="all, delete"
+        "Requirement", back_populates="project", cascade="all, delete", passive_deletes=True
+    )
+    tasks = relationship(
+        "Task", back_populates="project", cascade="all, delete", passive_deletes=True
+    )
+
+    # Every index leads with tenant_id (see migrations/versions/0005).
+    # Manager pages: created_by + newest first. Lead pages: project_owner.
+    __table_args__ = (
+        Index("ix_projects_tenant_created_by_created_at", "tenant_id", "created_by", "created_at"),
+        Index("ix_projects_tenant_project_owner", "tenant_id", "project_owner"),
     )
-    tasks = relationship("Task", back_populates="project", cascade="all, delete")
 
 
 # -------------------------
 # REQUIREMENTS TABLE
 # -------------------------
-class Requirement(Base):
+class Requirement(TenantScoped, Base):
     __tablename__ = "requirements"
 
     id = Column(Integer, primary_key=True, index=True)
     requirement = Column(Text, nullable=False)
 
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Maintained by Postgres on every insert / update (generated column);
+    # deferred so ORM loads don't carry it
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', requirement)", persisted=True)
+    ))
+
     # Relationships
     project = relationship("Project", back_populates="requirements")
     creator = relationship("User", back_populates="created_requirements")
-    tasks = relationship("Task", back_populates="requirement", cascade="all, delete")
+    tasks = relationship(
+        "Task", back_populates="requirement", cascade="all, delete", passive_deletes=True
+    )
+
+    __table_args__ = (
+        Index("ix_requirements_tenant_project_id", "tenant_id", "project_id"),
+        Index("ix_requirements_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
 
 # -------------------------
 # TASKS TABLE
 # -------------------------
-class Task(Base):
+# Hash-partitioned by tenant_id (migration 0005), so the primary key is
+# (tenant_id, id); the ORM still identifies a task by its id alone.
+TASK_ID_SEQ = Sequence("tasks_id_seq")
+
+
+class Task(TenantScoped, Base):
     __tablename__ = "tasks"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, TASK_ID_SEQ, server_default=TASK_ID_SEQ.next_value(), nullable=False)
     task = Column(String(255), nullable=False)
 
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
-    requirement_id = Column(Integer, ForeignKey("requirements.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    requirement_id = Column(Integer, ForeignKey("requirements.id", ondelete="CASCADE"), nullable=False)
 
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     assigned_to = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -149,8 +215,192 @@ class Task(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', task)", persisted=True)
+    ))
+
     # Relationships
     project = relationship("Project", back_populates="tasks")
     requirement = relationship("Requirement", back_populates="tasks")
     creator = relationship("User", back_populates="created_tasks", foreign_keys=[created_by])
     assignee = relationship("User", back_populates="assigned_tasks", foreign_keys=[assigned_to])
+
+    # Indexes follow the route queries, behind tenant_id
+    # (see migrations/versions/0002 and 0005)
+    __table_args__ = (
+        PrimaryKeyConstraint("tenant_id", "id"),
+        # project pages, keyset pagination, manager stats (status index-only)
+        Index(
+            "ix_tasks_tenant_project_created_at_id",
+            "tenant_id", "project_id", "created_at", "id",
+            postgresql_include=["status"]
+        ),
+        # developer dashboard
+        Index("ix_tasks_tenant_assigned_to_created_at", "tenant_id", "assigned_to", "created_at"),
+        # lead calendar window (tasks starting in it / still running into it)
+        Index("ix_tasks_tenant_project_start_time", "tenant_id", "project_id", "start_time"),
+        Index("ix_tasks_tenant_project_end_time", "tenant_id", "project_id", "end_time"),
+        # requirement -> tasks; without tenant_id so the foreign key checks
+        # of a requirement delete can use it (id for batched deletes)
+        Index("ix_tasks_requirement_id_id", "requirement_id", "id"),
+        # full-text search (searched within the tenant's partition)
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+        {"postgresql_partition_by": "HASH (tenant_id)"},
+    )
+
+    __mapper_args__ = {"primary_key": [id]}
+
+
+# -------------------------
+# TASK COUNTERS TABLE
+# -------------------------
+# Denormalized status counts, kept in step with `tasks` by the write
+# handlers (see counters.py). One row per (scope, scope_id):
+#   scope = "project" | "requirement" | "assignee"
+class TaskCounter(Base):
+    __tablename__ = "task_counters"
+
+    scope = Column(String(20), primary_key=True)
+    scope_id = Column(Integer, primary_key=True)
+
+    not_started = Column(Integer, nullable=False, default=0)
+    in_progress = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def total(self):
+        return self.not_started + self.in_progress + self.completed
+
+    @property
+    def progress(self):
+        if self.total == 0:
+            return 0
+        return int((self.completed / self.total) * 100)
+
+
+# -------------------------
+# TIME ENTRIES TABLE
+# -------------------------
+# Append-only log of time worked (see timelog.py); rows are never updated
+# or deleted (a trigger enforces it, migrations/versions/0006). Project and
+# requirement are copied from the task when the entry is written, so the
+# rollups below never join back to `tasks`. task_id has no foreign key:
+# the log outlives deleted tasks.
+class TimeEntry(TenantScoped, Base):
+    __tablename__ = "time_entries"
+
+    id = Column(BigInteger, primary_key=True)
+
+    task_id = Column(Integer, nullable=False)
+    requirement_id = Column(Integer, ForeignKey("requirements.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    developer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    started_at = Column(DateTime, nullable=False)
+    duration_seconds = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        CheckConstraint("duration_seconds > 0", name="ck_time_entries_duration_positive"),
+        Index("ix_time_entries_tenant_task_started_at", "tenant_id", "task_id", "started_at"),
+        Index("ix_time_entries_tenant_developer_started_at", "tenant_id", "developer_id", "started_at"),
+        # requirement deletes (foreign key checks, purge.py batches)
+        Index("ix_time_entries_requirement_id_id", "requirement_id", "id"),
+    )
+
+
+# -------------------------
+# EFFORT ROLLUPS TABLES
+# -------------------------
+# Running totals over time_entries, incremented in the same transaction
+# as every insert (see timelog.py). One row per (scope, scope_id):
+#   scope = "task" | "requirement" | "project" | "developer"
+class EffortTotal(Base):
+    __tablename__ = "effort_totals"
+
+    scope = Column(String(20), primary_key=True)
+    scope_id = Column(Integer, primary_key=True)
+
+    seconds = Column(BigInteger, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Per developer and ISO week (week = the Monday, by started_at)
+class WeeklyEffort(Base):
+    __tablename__ = "weekly_effort"
+
+    developer_id = Column(Integer, primary_key=True)
+    week = Column(Date, primary_key=True)
+
+    seconds = Column(BigInteger, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# -------------------------
+# PROJECT DAILY STATUS TABLE
+# -------------------------
+# Task status counts per project and day, written by the daily snapshot
+# job from task_counters (see snapshots.py). Burndown / velocity read one
+# row per day shown.
+class ProjectDailyStatus(Base):
+    __tablename__ = "project_daily_status"
+
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    not_started = Column(Integer, nullable=False, default=0)
+    in_progress = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+
+    taken_at = Column(DateTime, default=datetime.utcnow)
+
+
+# -------------------------
+# JOBS TABLE
+# -------------------------
+# Deferred work (see jobs.py). status: queued -> running -> done, or back
+# to queued with a later run_at after a failure, or failed after the last
+# attempt.
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(BigInteger, primary_key=True)
+
+    queue = Column(String(50), nullable=False)
+    name = Column(String(100), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    progress = Column(JSONB, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # dequeue: only the waiting jobs are indexed
+        Index(
+            "ix_jobs_queue_run_at_queued", "queue", "run_at",
+            postgresql_where=text("status = 'queued'")
+        ),
+        # concurrency limit and stale-job check
+        Index(
+            "ix_jobs_queue_locked_at_running", "queue", "locked_at",
+            postgresql_where=text("status = 'running'")
+        ),
+        Index("ix_jobs_status_finished_at", "status", "finished_at"),
+    )
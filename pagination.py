@@ -0,0 +1,93 @@
+# pagination.py
+#
+# Keyset (cursor) pagination over (created_at, id), newest first.
+#
+# Instead of OFFSET - which makes Postgres walk and discard every earlier
+# row - each page remembers where it stopped and the next query starts
+# from there with `WHERE (created_at, id) < (:created_at, :id)`.
+# Page 10,000 costs the same as page 1.
+#
+# Cursors are opaque url-safe tokens; clients only pass them back.
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at, row_id, direction):
+    payload = json.dumps({
+        "c": created_at.isoformat(),
+        "i": row_id,
+        "d": direction
+    })
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        direction = payload["d"]
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload["c"]), int(payload["i"]), direction
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def clamp_page_size(page_size):
+    if not page_size or page_size < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+async def keyset_page(db, query, model, cursor=None, page_size=DEFAULT_PAGE_SIZE, scalars=True):
+    # `model` needs `created_at` and `id` columns.
+    # scalars=False pages over plain rows (e.g. select(Task.id, Task.created_at, ...));
+    # they must include `created_at` and `id` under those names.
+    # Returns (rows, next_cursor, prev_cursor); a cursor is None at either end.
+    key = tuple_(model.created_at, model.id)
+
+    direction = "next"
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        if direction == "next":
+            query = query.filter(key < tuple_(created_at, row_id))
+        else:
+            query = query.filter(key > tuple_(created_at, row_id))
+
+    if direction == "next":
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    # One extra row tells us whether there is another page
+    result = await db.execute(query.limit(page_size + 1))
+    rows = list(result.scalars() if scalars else result)
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if direction == "prev":
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    first, last = rows[0], rows[-1]
+
+    if direction == "next":
+        has_next, has_prev = has_more, cursor is not None
+    else:
+        has_next, has_prev = True, has_more
+
+    next_cursor = encode_cursor(last.created_at, last.id, "next") if has_next else None
+    prev_cursor = encode_cursor(first.created_at, first.id, "prev") if has_prev else None
+
+    return rows, next_cursor, prev_cursor
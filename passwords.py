@@ -0,0 +1,166 @@
+# passwords.py
+#
+# bcrypt hashing / verification in a dedicated process pool.
+#
+# bcrypt is deliberately slow CPU work. Run in Starlette's threadpool it
+# competes with every other blocking call and holds the GIL, so a burst of
+# logins stalls the dashboards. Here it runs in its own small pool of
+# processes, with a cap on how many requests may wait for it.
+#
+# Settings (environment):
+#   BCRYPT_ROUNDS          cost for new hashes (default 12). Raising it
+#                          rehashes each user's password on their next login.
+#   PASSWORD_WORKERS       processes per app worker (default 2)
+#   PASSWORD_MAX_PENDING   verifications queued or running before logins
+#                          are rejected with PasswordQueueFull (default 64)
+
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+
+
+class PasswordQueueFull(RuntimeError):
+    pass
+
+
+# ==============================
+# WORKER SIDE (runs in the pool)
+# ==============================
+
+_contexts = {}
+
+
+def _context(rounds):
+    if rounds not in _contexts:
+        _contexts[rounds] = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=rounds
+        )
+    return _contexts[rounds]
+
+
+def _verify_and_update(password, hashed, rounds):
+    # new_hash is set when `hashed` uses another cost than `rounds`
+    started = time.perf_counter()
+    valid, new_hash = _context(rounds).verify_and_update(password, hashed)
+    return valid, new_hash, time.perf_counter() - started
+
+
+def _hash(password, rounds):
+    return _context(rounds).hash(password)
+
+
+# ==============================
+# METRICS
+# ==============================
+
+class PasswordMetrics:
+    def __init__(self, window=1000):
+        self.verified = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.pending = 0
+        self.latencies = deque(maxlen=window)   # wait + bcrypt, seconds
+        self.cpu_times = deque(maxlen=window)   # bcrypt only, seconds
+
+    def snapshot(self):
+        def percentile(values, p):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 1)
+
+        return {
+            "verified": self.verified,
+            "rejected_queue_full": self.rejected,
+            "rehashed": self.rehashed,
+            "pending": self.pending,
+            "max_pending": PASSWORD_MAX_PENDING,
+            "workers": PASSWORD_WORKERS,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "verify_ms_p50": percentile(self.latencies, 0.50),
+            "verify_ms_p95": percentile(self.latencies, 0.95),
+            "verify_ms_p99": percentile(self.latencies, 0.99),
+            "bcrypt_ms_p50": percentile(self.cpu_times, 0.50),
+        }
+
+
+metrics = PasswordMetrics()
+
+
+# ==============================
+# POOL
+# ==============================
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: never fork a process that is running an event loop
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _submit(fn, *args):
+    if metrics.pending >= PASSWORD_MAX_PENDING:
+        metrics.rejected += 1
+        raise PasswordQueueFull("Too many password checks in flight")
+
+    metrics.pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_pool(), fn, *args)
+    finally:
+        metrics.pending -= 1
+
+
+# ==============================
+# PUBLIC API
+# ==============================
+
+async def verify_password(password, hashed):
+    # Returns (valid, new_hash). Store new_hash when it is not None.
+    started = time.perf_counter()
+
+    valid, new_hash, cpu_time = await _submit(
+        _verify_and_update, password, hashed, BCRYPT_ROUNDS
+    )
+
+    metrics.verified += 1
+    metrics.latencies.append(time.perf_counter() - started)
+    metrics.cpu_times.append(cpu_time)
+    if new_hash:
+        metrics.rehashed += 1
+
+    return valid, new_hash
+
+
+async def hash_password(password):
+    return await _submit(_hash, password, BCRYPT_ROUNDS)
+
+
+def hash_password_sync(password):
+    # For scripts (seeding, user creation) that run outside the app
+    return _hash(password, BCRYPT_ROUNDS)
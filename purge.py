@@ -0,0 +1,295 @@
+# purge.py
+#
+# Batched project delete.
+#
+# A plain DELETE of the project row cascades to its requirements, tasks,
+# time entries and daily status rows (ON DELETE CASCADE, migration 0009),
+# but as one statement: for a project with 200k tasks that is one long
+# transaction holding every row lock and bloating the counters it never
+# updates. `delete_project` takes the project apart in batches of
+# PURGE_BATCH_SIZE rows instead, each in its own short transaction:
+#
+#   for each requirement (oldest first):
+#       time entries   DELETE ... RETURNING, next PURGE_BATCH_SIZE by (requirement_id, id)
+#       tasks          same
+#       the requirement row
+#       last pass, then the requirement row
+#   tasks left over (requirement of another project)
+#   last pass, then daily status rows and the project row
+#
+# Every batch takes its rows out of task_counters and the effort rollups
+# (timelog.py) in its own transaction, so they stay right while the delete
+# runs, and a delete that stopped half way just carries on when run again.
+#
+# The project stays editable meanwhile. The last pass runs in the
+# transaction that deletes the requirement / project row, after locking
+# that row FOR UPDATE: a new or moved task or time entry needs a key-share
+# lock on it for its foreign key check, so nothing more can come in, and
+# whatever came in since the batches is taken out of the counters before
+# the cascade would drop it unseen.
+#
+# Managers delete a project from its page or with DELETE
+# /api/v1/projects/{id}. That only queues a "projects.delete" job
+# (jobs.py); progress is saved in the job's row as it goes. From a shell:
+#
+#   python purge.py 12          # in the foreground, with progress
+#
+# Settings (environment):
+#   PURGE_BATCH_SIZE   rows per transaction (default 5000)
+
+import argparse
+import asyncio
+import os
+
+from sqlalchemy import select, delete, func, text, tuple_, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import mark_stale, project_tags
+from counters import record_task_changes
+from database import AsyncSessionLocal
+from jobs import enqueue
+from live import tasks_changed
+from models import (
+    Project, Requirement, Task, TimeEntry, TaskCounter, EffortTotal, ProjectDailyStatus, Job
+)
+from timelog import record_entries
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "5000"))
+
+
+# ==============================
+# QUEUE (request side)
+# ==============================
+
+async def queue_project_delete(db: AsyncSession, project, requested_by):
+    # The "projects.delete" job of this project: the one already waiting /
+    # running, or a new one. Caller commits.
+    existing = await db.scalar(
+        select(Job).filter(
+            Job.name == "projects.delete",
+            Job.status.in_(("queued", "running")),
+            Job.payload["project_id"].as_integer() == project.id
+        ).limit(1)
+    )
+    if existing:
+        return existing
+
+    new_job = enqueue(db, "projects.delete", {"project_id": project.id, "requested_by": requested_by})
+    await db.flush()
+    return new_job
+
+
+# ==============================
+# BATCHES
+# ==============================
+
+async def _delete_time_entries(db, tenant_id, after, requirement_id):
+    # One batch after id `after`; returns (last id deleted or None, count)
+    await db.execute(text("SELECT set_config('time_entries.allow_delete', 'on', true)"))
+
+    batch = select(TimeEntry.id).filter(
+        TimeEntry.tenant_id == tenant_id,
+        TimeEntry.requirement_id == requirement_id,
+        TimeEntry.id > after
+    ).order_by(TimeEntry.id).limit(PURGE_BATCH_SIZE)
+
+    rows = (await db.execute(
+        delete(TimeEntry).where(TimeEntry.id.in_(batch.scalar_subquery())).returning(
+            TimeEntry.id,
+            TimeEntry.task_id,
+            TimeEntry.requirement_id,
+            TimeEntry.project_id,
+            TimeEntry.developer_id,
+            TimeEntry.started_at,
+            TimeEntry.duration_seconds
+        ).execution_options(synchronize_session=False)
+    )).all()
+
+    # The task rows of the effort rollups go with the tasks themselves
+    await record_entries(db, rows, sign=-1, scopes=("requirement", "project", "developer"))
+    return max((row.id for row in rows), default=None), len(rows)
+
+
+async def _delete_tasks(db, tenant_id, after, requirement_id=None, project_id=None):
+    # One batch of one requirement's (or, at the end, the project's) tasks
+    if requirement_id is not None:
+        owner = Task.requirement_id == requirement_id
+    else:
+        owner = Task.project_id == project_id
+
+    batch = select(Task.id).filter(
+        Task.tenant_id == tenant_id, owner, Task.id > after
+    ).order_by(Task.id).limit(PURGE_BATCH_SIZE)
+
+    rows = (await db.execute(
+        delete(Task).where(
+            Task.tenant_id == tenant_id,
+            Task.id.in_(batch.scalar_subquery())
+        ).returning(
+            Task.id, Task.project_id, Task.requirement_id, Task.assigned_to, Task.status
+        ).execution_options(synchronize_session=False)
+    )).all()
+
+    await record_task_changes(db, [
+        ({
+            "project": row.project_id,
+            "requirement": row.requirement_id,
+            "assignee": row.assigned_to,
+            "status": row.status,
+        }, None)
+        for row in rows
+    ])
+    if rows:
+        await db.execute(
+            delete(EffortTotal).filter(
+                EffortTotal.scope == "task",
+                EffortTotal.scope_id == any_(bindparam("ids", [row.id for row in rows], type_=ARRAY(Integer)))
+            )
+        )
+    return max((row.id for row in rows), default=None), len(rows)
+
+
+async def _drop_rollups(db, scope, scope_ids):
+    # Counter / effort rows of a requirement or project that no longer exists
+    keys = [(scope, scope_id) for scope_id in scope_ids]
+    await db.execute(delete(TaskCounter).filter(tuple_(TaskCounter.scope, TaskCounter.scope_id).in_(keys)))
+    await db.execute(delete(EffortTotal).filter(tuple_(EffortTotal.scope, EffortTotal.scope_id).in_(keys)))
+
+
+# ==============================
+# PROJECT DELETE
+# ==============================
+
+async def delete_project(db: AsyncSession, project_id, report=None):
+    # Returns the final progress dict, None if there is no such project.
+    # `report` (async) gets the progress after every batch.
+    project = await db.get(Project, project_id)
+    if project is None:
+        return None
+
+    tenant_id = project.tenant_id
+    tags = project_tags(project.id, project.project_owner, project.created_by)
+
+    requirement_ids = (await db.scalars(
+        select(Requirement.id).filter(
+            Requirement.tenant_id == tenant_id,
+            Requirement.project_id == project_id
+        ).order_by(Requirement.id)
+    )).all()
+    totals = (await db.execute(
+        select(
+            select(func.coalesce(func.sum(
+                TaskCounter.not_started + TaskCounter.in_progress + TaskCounter.completed
+            ), 0)).filter(TaskCounter.scope == "project", TaskCounter.scope_id == project_id)
+            .scalar_subquery(),
+            select(func.coalesce(func.sum(EffortTotal.entries), 0))
+            .filter(EffortTotal.scope == "project", EffortTotal.scope_id == project_id)
+            .scalar_subquery()
+        )
+    )).one()
+    await db.rollback()
+
+    progress = {
+        "project_id": project_id,
+        "requirements": len(requirement_ids),
+        "requirements_deleted": 0,
+        "tasks": totals[0],
+        "tasks_deleted": 0,
+        "time_entries": totals[1],
+        "time_entries_deleted": 0,
+        "done": False,
+    }
+
+    async def batches(step, key, commit=True, **kwargs):
+        # One transaction per batch, until a batch comes back empty
+        after = 0
+        while after is not None:
+            after, count = await step(db, tenant_id, after, **kwargs)
+            progress[key] += count
+            if commit:
+                mark_stale(db, *tags)
+                await db.commit()
+                if count and report:
+                    await report(**progress)
+
+    async def last_pass(requirement_id):
+        # Caller holds the lock and commits
+        await batches(_delete_time_entries, "time_entries_deleted", commit=False, requirement_id=requirement_id)
+        await batches(_delete_tasks, "tasks_deleted", commit=False, requirement_id=requirement_id)
+        await db.execute(delete(Requirement).filter(Requirement.id == requirement_id))
+        await _drop_rollups(db, "requirement", [requirement_id])
+        progress["requirements_deleted"] += 1
+
+    for requirement_id in requirement_ids:
+        await batches(_delete_time_entries, "time_entries_deleted", requirement_id=requirement_id)
+        await batches(_delete_tasks, "tasks_deleted", requirement_id=requirement_id)
+
+        await db.execute(select(Requirement.id).filter(Requirement.id == requirement_id).with_for_update())
+        await last_pass(requirement_id)
+        mark_stale(db, *tags)
+        await db.commit()
+        if report:
+            await report(**progress)
+
+    await batches(_delete_tasks, "tasks_deleted", project_id=project_id)
+
+    # Locking the project freezes all of it: requirements added since the
+    # start, and their tasks, go the same way
+    await db.execute(select(Project.id).filter(Project.id == project_id).with_for_update())
+    late_requirement_ids = (await db.scalars(
+        select(Requirement.id).filter(
+            Requirement.tenant_id == tenant_id,
+            Requirement.project_id == project_id
+        ).order_by(Requirement.id)
+    )).all()
+    progress["requirements"] += len(late_requirement_ids)
+    for requirement_id in late_requirement_ids:
+        await last_pass(requirement_id)
+    await batches(_delete_tasks, "tasks_deleted", commit=False, project_id=project_id)
+
+    await db.execute(delete(ProjectDailyStatus).filter(ProjectDailyStatus.project_id == project_id))
+    await db.execute(delete(Project).filter(Project.id == project_id))
+    await _drop_rollups(db, "project", [project_id])
+    mark_stale(db, *tags)
+    tasks_changed(db, tags, [{"action": "project_deleted", "project": project_id}])
+    await db.commit()
+
+    progress["done"] = True
+    if report:
+        await report(**progress)
+    return progress
+
+
+# ==============================
+# CLI
+# ==============================
+
+async def _print_progress(**progress):
+    print(
+        f"  requirements {progress['requirements_deleted']}/{progress['requirements']}"
+        f"  tasks {progress['tasks_deleted']}/{progress['tasks']}"
+        f"  time entries {progress['time_entries_deleted']}/{progress['time_entries']}",
+        flush=True
+    )
+
+
+async def _delete(project_id):
+    async with AsyncSessionLocal() as db:
+        return await delete_project(db, project_id, _print_progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete a project in batches")
+    parser.add_argument("project_id", type=int)
+    args = parser.parse_args()
+
+    progress = asyncio.run(_delete(args.project_id))
+    if progress is None:
+        print(f"No project {args.project_id}")
+    else:
+        print(f"Deleted project {args.project_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# replica.py
+#
+# Read/write splitting.
+#
+# With DB_REPLICA_HOST set (see database.py), handlers marked
+# @read_replica - dashboards, lists, the calendar, exports - run their
+# reads on the replica engine. Everything else, and every write, stays on
+# the primary.
+#
+# Replicas lag. So that a user sees their own change on the page they are
+# redirected to, any successful non-GET request sets a short-lived cookie
+# and that browser's reads stay on the primary for DB_REPLICA_STICKY_SECONDS
+# (default 5). The cookie only ever forces the primary, so a forged one is
+# harmless. Live pages (templates/live_updates.html) set it themselves
+# before they reload, and the render cache (cache.py) is skipped while it
+# is set.
+#
+# Without a replica the middleware and the decorator do nothing.
+
+import os
+import time
+from functools import wraps
+
+from database import db_routing, replica_engine
+
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+STICKY_COOKIE = "db_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RoutingState:
+    def __init__(self, sticky):
+        self.sticky = sticky
+        self.read_only = False
+
+    @property
+    def use_replica(self):
+        return self.read_only and not self.sticky
+
+
+def read_replica(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        # The state object is shared with the request's session (see
+        # database.RoutingSession), so flipping it here is enough
+        routing = db_routing.get()
+        if routing is not None:
+            routing.read_only = True
+        return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def _sticky_until(scope):
+    for name, value in scope.get("headers", ()):
+        if name != b"cookie":
+            continue
+        for part in value.decode("latin-1").split(";"):
+            key, _, cookie = part.strip().partition("=")
+            if key == STICKY_COOKIE:
+                try:
+                    return float(cookie)
+                except ValueError:
+                    return 0.0
+    return 0.0
+
+
+def wants_primary(request):
+    # Also without a replica: the cookie set by a live page's reload
+    return _sticky_until(request.scope) > time.time()
+
+
+class ReplicaRoutingMiddleware:
+    # Plain ASGI middleware, like SQLTraceMiddleware
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or replica_engine is None:
+            await self.app(scope, receive, send)
+            return
+
+        now = time.time()
+        token = db_routing.set(RoutingState(sticky=_sticky_until(scope) > now))
+        writing = scope["method"] not in SAFE_METHODS
+
+        async def send_with_cookie(message):
+            if writing and message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{STICKY_COOKIE}={time.time() + DB_REPLICA_STICKY_SECONDS:.3f}; "
+                    f"Max-Age={DB_REPLICA_STICKY_SECONDS}; Path=/; HttpOnly; SameSite=lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            db_routing.reset(token)
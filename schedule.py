@@ -0,0 +1,116 @@
+# schedule.py
+#
+# Lead calendar: one month or one week at a time.
+#
+# The date filter and the day bucketing both run in Postgres:
+#
+#   - a task is in the window if it starts before the window ends and
+#     starts or ends inside / after the window start (tasks that began
+#     earlier but are still running show up too);
+#   - generate_series() expands every task into one row per day it covers,
+#     clipped to the window, so the page receives rows already ordered by
+#     day and only for the visible range.
+#
+# The two halves of the window predicate are served by
+# ix_tasks_project_start_time and ix_tasks_project_end_time.
+
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, and_, or_, true, literal_column
+
+from models import Project, Task
+
+CALENDAR_VIEWS = ("month", "week")
+
+ONE_DAY = literal_column("interval '1 day'")
+
+
+class CalendarWindow:
+    def __init__(self, view, start, end, prev_start, next_start):
+        self.view = view
+        self.start = start
+        self.end = end              # exclusive
+        self.prev_start = prev_start
+        self.next_start = next_start
+
+    @property
+    def start_time(self):
+        return datetime.combine(self.start, datetime.min.time())
+
+    @property
+    def end_time(self):
+        return datetime.combine(self.end, datetime.min.time())
+
+    @property
+    def label(self):
+        if self.view == "month":
+            return self.start.strftime("%B %Y")
+        last = self.end - timedelta(days=1)
+        return f"{self.start.strftime('%d %b')} - {last.strftime('%d %b %Y')}"
+
+
+def calendar_window(view="month", anchor=None):
+    if view not in CALENDAR_VIEWS:
+        raise HTTPException(status_code=400, detail="Invalid calendar view")
+
+    anchor = anchor or date.today()
+
+    if view == "week":
+        start = anchor - timedelta(days=anchor.weekday())
+        week = timedelta(days=7)
+        return CalendarWindow(view, start, start + week, start - week, start + week)
+
+    start = anchor.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    prev_start = (start - timedelta(days=1)).replace(day=1)
+    return CalendarWindow(view, start, end, prev_start, end)
+
+
+# ==============================
+# QUERIES
+# ==============================
+
+def lead_calendar_filter(lead_id, window):
+    return and_(
+        Project.project_owner == lead_id,
+        Task.start_time < window.end_time,
+        or_(
+            Task.start_time >= window.start_time,
+            Task.end_time >= window.start_time
+        )
+    )
+
+
+def lead_calendar_query(lead_id, window):
+    # Rows of (day, Task), one per day the task covers inside the window.
+    # greatest() ignores NULL, so a task without end_time covers one day
+    # and a task ending before it starts is still shown on its start day.
+    first_day = func.greatest(
+        func.date_trunc("day", Task.start_time),
+        window.start_time
+    )
+    last_day = func.least(
+        func.date_trunc("day", func.greatest(Task.end_time, Task.start_time)),
+        window.end_time - timedelta(days=1)
+    )
+    days = func.generate_series(
+        first_day, last_day, ONE_DAY
+    ).table_valued("day").render_derived(name="days").lateral()
+
+    return select(days.c.day, Task).join(Project).join(days, true()).filter(
+        lead_calendar_filter(lead_id, window)
+    ).order_by(days.c.day, Task.start_time, Task.id)
+
+
+async def lead_calendar_days(db, lead_id, window, options=()):
+    # {date: [Task, ...]} in day order
+    rows = (await db.execute(
+        lead_calendar_query(lead_id, window).options(*options)
+    )).all()
+
+    calendar_data = {}
+    for day, task in rows:
+        calendar_data.setdefault(day.date(), []).append(task)
+
+    return calendar_data
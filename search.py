@@ -0,0 +1,184 @@
+# search.py
+#
+# Full-text search over tasks and requirements.
+#
+# Both tables carry a generated `search_vector` column with a GIN index
+# (migration 0004). The query text is split into words and every word is
+# matched as a prefix ("logi chec" finds "login checkout"), all words must
+# match. Matches are ranked with ts_rank_cd; only the top SEARCH_LIMIT
+# rows per kind get a ts_headline snippet.
+#
+# Results are limited to what the caller can see:
+#
+#   PROJECT_MANAGER  projects they created
+#   LEAD             projects they own
+#   DEVELOPER        tasks assigned to them, and the requirements of
+#                    projects they have a task in
+#
+# Snippets come back HTML-escaped with the matched words in <mark>.
+
+import os
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import select, func, literal, cast, any_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from models import Project, Requirement, Task, SEARCH_CONFIG
+
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "20"))
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_TERMS = 8
+
+SEARCH_KINDS = ("tasks", "requirements")
+
+# Control characters as markers, so the snippet can be escaped first and
+# the markers swapped for <mark> afterwards
+START_SEL = "\x02"
+STOP_SEL = "\x03"
+TASK_HEADLINE = f"StartSel={START_SEL}, StopSel={STOP_SEL}, HighlightAll=true"
+REQUIREMENT_HEADLINE = (
+    f"StartSel={START_SEL}, StopSel={STOP_SEL}, "
+    "MaxFragments=2, MaxWords=25, MinWords=10, FragmentDelimiter=\" … \""
+)
+
+_TERMS = re.compile(r"\w+")
+
+
+def prefix_query(text):
+    # "Login chec" -> "login:* & chec:*". Only word characters reach
+    # to_tsquery, so user input can't produce a syntax error
+    terms = _TERMS.findall((text or "").lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def highlight(snippet):
+    return Markup(
+        str(escape(snippet))
+        .replace(START_SEL, "<mark>")
+        .replace(STOP_SEL, "</mark>")
+    )
+
+
+def clamp_limit(limit):
+    return max(1, min(limit or SEARCH_LIMIT, SEARCH_MAX_LIMIT))
+
+
+# ==============================
+# SCOPES
+# ==============================
+
+def project_scope(user_id, role):
+    if role == "PROJECT_MANAGER":
+        return Project.created_by == user_id
+    return Project.project_owner == user_id
+
+
+def task_scope(user_id, role):
+    if role == "DEVELOPER":
+        return Task.assigned_to == user_id
+    return project_scope(user_id, role)
+
+
+def requirement_scope(user_id, role):
+    if role == "DEVELOPER":
+        # The developer's (few) projects, collected once into an array
+        # (an InitPlan), rather than probing tasks for every matching
+        # requirement
+        return Requirement.project_id == any_(func.array(
+            select(Task.project_id).filter(Task.assigned_to == user_id).distinct().scalar_subquery()
+        ))
+    return project_scope(user_id, role)
+
+
+# ==============================
+# QUERIES
+# ==============================
+
+def _tsquery(terms):
+    config = cast(literal(SEARCH_CONFIG), REGCONFIG)
+    return config, func.to_tsquery(config, terms)
+
+
+def task_search_query(terms, user_id, role, limit):
+    config, tsquery = _tsquery(terms)
+    rank = func.ts_rank_cd(Task.search_vector, tsquery)
+
+    # Rank and limit first; the headline is only built for the survivors
+    top = select(
+        Task.id, rank.label("rank")
+    ).join(
+        Project, Project.id == Task.project_id
+    ).filter(
+        Task.search_vector.op("@@")(tsquery),
+        task_scope(user_id, role)
+    ).order_by(rank.desc(), Task.id.desc()).limit(limit).subquery()
+
+    return select(
+        Task.id,
+        Task.project_id,
+        Project.name.label("project_name"),
+        Task.task,
+        Task.status,
+        Task.assigned_to,
+        top.c.rank,
+        func.ts_headline(config, Task.task, tsquery, TASK_HEADLINE).label("snippet")
+    ).join(
+        top, top.c.id == Task.id
+    ).join(
+        Project, Project.id == Task.project_id
+    ).order_by(top.c.rank.desc(), Task.id.desc())
+
+
+def requirement_search_query(terms, user_id, role, limit):
+    config, tsquery = _tsquery(terms)
+    rank = func.ts_rank_cd(Requirement.search_vector, tsquery)
+
+    top = select(
+        Requirement.id, rank.label("rank")
+    ).join(
+        Project, Project.id == Requirement.project_id
+    ).filter(
+        Requirement.search_vector.op("@@")(tsquery),
+        requirement_scope(user_id, role)
+    ).order_by(rank.desc(), Requirement.id.desc()).limit(limit).subquery()
+
+    return select(
+        Requirement.id,
+        Requirement.project_id,
+        Project.name.label("project_name"),
+        top.c.rank,
+        func.ts_headline(
+            config, Requirement.requirement, tsquery, REQUIREMENT_HEADLINE
+        ).label("snippet")
+    ).join(
+        top, top.c.id == Requirement.id
+    ).join(
+        Project, Project.id == Requirement.project_id
+    ).order_by(top.c.rank.desc(), Requirement.id.desc())
+
+
+SEARCH_QUERIES = {
+    "tasks": task_search_query,
+    "requirements": requirement_search_query,
+}
+
+
+async def search(db, text, user_id, role, kinds=SEARCH_KINDS, limit=None):
+    terms = prefix_query(text)
+    results = {kind: [] for kind in kinds}
+    if terms is None:
+        return results
+
+    for kind in kinds:
+        rows = (await db.execute(
+            SEARCH_QUERIES[kind](terms, user_id, role, clamp_limit(limit))
+        )).mappings().all()
+        results[kind] = [
+            {**row, "rank": round(row["rank"], 4), "snippet": highlight(row["snippet"])}
+            for row in rows
+        ]
+
+    return results
@@ -0,0 +1,347 @@
+# seed.py
+#
+# Synthetic organisation for load tests and query-plan checks.
+#
+#   python migrate.py upgrade
+#   python seed.py --size medium --reset
+#   python seed.py --size large --reset          # 10k projects, 1M tasks
+#   python seed.py --projects 500 --tasks 50000 --reset
+#   python seed.py --size medium --tenants 8 --reset   # 8 organisations
+#
+# Users are manager1..N@example.com, lead1..N@example.com and
+# dev1..N@example.com, all with the same password (--password, default
+# "secret"; hashed once). With --tenants, every tenant gets the whole
+# preset; tenant 2 onwards log in as manager1@tenant2.example.com etc.
+#
+# The shape is meant to look like real data, not uniform noise:
+#   - task counts per project follow a long-tailed (Pareto) distribution,
+#     so a few projects are huge;
+#   - tasks are created over the last two years; older tasks are more
+#     likely to be completed, ~70% are scheduled, ~10% unassigned;
+#   - requirements carry a few hundred words of text;
+#   - time entries (15 min to 8 h) are logged by the assignee on started
+#     tasks, from the task's creation up to now.
+#
+# Rows are generated in batches and loaded with COPY, then task_counters
+# and the effort rollups are rebuilt and the tables are ANALYZEd.
+
+import argparse
+import csv
+import io
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from counters import rebuild
+from timelog import rebuild as rebuild_effort
+from database import SessionLocal, engine
+from models import TaskStatus
+from passwords import hash_password_sync
+
+SIZES = {
+    "small": dict(managers=2, leads=5, developers=20, projects=50, tasks=5_000, time_entries=20_000),
+    "medium": dict(managers=5, leads=25, developers=150, projects=1_000, tasks=100_000, time_entries=400_000),
+    "large": dict(managers=20, leads=100, developers=800, projects=10_000, tasks=1_000_000, time_entries=4_000_000),
+}
+
+COPY_BATCH = 50_000
+
+NOUNS = (
+    "account admin alert api audit backlog billing browser budget cache "
+    "calendar checkout client cloud config customer dashboard data deploy "
+    "device email export field filter form gateway import invoice latency "
+    "layout login mobile module notify onboarding order page partner "
+    "payment permission portal profile query queue report request review "
+    "role schedule search security server session settings signup sprint "
+    "status storage support sync team tenant ticket timeline token upload "
+    "user validation vendor webhook workflow"
+).split()
+WORDS = NOUNS + "should must when the a for with and to of on in every each all new existing".split()
+
+VERBS = "Add Fix Refactor Test Document Review Migrate Remove Optimize Design".split()
+
+
+# ==============================
+# COPY HELPERS
+# ==============================
+
+def copy_rows(cursor, table, columns, rows):
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)   # None -> empty unquoted field -> NULL
+        count += 1
+        if count % COPY_BATCH == 0:
+            flush()
+
+    if buffer.tell():
+        flush()
+
+    return count
+
+
+def fetch_ids(cursor, sql):
+    cursor.execute(sql)
+    return [row[0] for row in cursor.fetchall()]
+
+
+# ==============================
+# GENERATORS
+# ==============================
+
+def email_domain(tenant_id):
+    return "example.com" if tenant_id == 1 else f"tenant{tenant_id}.example.com"
+
+
+def user_rows(tenant_id, size, password_hash, now):
+    domain = email_domain(tenant_id)
+    for role, prefix, count in (
+        ("PROJECT_MANAGER", "manager", size["managers"]),
+        ("LEAD", "lead", size["leads"]),
+        ("DEVELOPER", "dev", size["developers"]),
+    ):
+        for number in range(1, count + 1):
+            yield (tenant_id, f"{prefix.title()} {number}", role, f"{prefix}{number}@{domain}", password_hash, now, now)
+
+
+def project_rows(rnd, tenant_id, size, managers, leads, now):
+    for number in range(1, size["projects"] + 1):
+        created_at = now - timedelta(days=rnd.uniform(30, 730))
+        yield (tenant_id, f"Project {number}", rnd.choice(leads), rnd.choice(managers), created_at, created_at)
+
+
+def requirement_text(rnd):
+    sentences = []
+    for _ in range(rnd.randint(3, 25)):
+        words = rnd.choices(WORDS, k=rnd.randint(8, 25))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def requirement_rows(rnd, tenant_id, projects, managers):
+    for project_id, created_at in projects:
+        for _ in range(rnd.randint(1, 15)):
+            yield (tenant_id, requirement_text(rnd), project_id, rnd.choice(managers), created_at, created_at)
+
+
+def task_rows(rnd, tenant_id, size, projects, requirements_by_project, developers, leads, now):
+    project_ids = [project_id for project_id, _ in projects]
+    project_created = dict(projects)
+
+    # Long tail: a handful of projects hold a large share of the tasks
+    weights = [rnd.paretovariate(1.2) for _ in project_ids]
+    chosen = rnd.choices(project_ids, weights=weights, k=size["tasks"])
+
+    statuses = [TaskStatus.NOT_STARTED.name, TaskStatus.IN_PROGRESS.name, TaskStatus.COMPLETED.name]
+
+    for number, project_id in enumerate(chosen, 1):
+        created_at = project_created[project_id] + timedelta(
+            seconds=rnd.uniform(0, (now - project_created[project_id]).total_seconds())
+        )
+        age = (now - created_at).days / 730
+
+        start_time = end_time = None
+        if rnd.random() < 0.7:
+            start_time = created_at + timedelta(days=rnd.randint(0, 30), hours=rnd.choice((9, 10, 13, 15)))
+            start_time = start_time.replace(minute=0, second=0, microsecond=0)
+            end_time = start_time + timedelta(days=rnd.randint(0, 14))
+
+        status = rnd.choices(statuses, weights=(1 - age, 0.5, 0.3 + 2 * age))[0]
+        updated_at = min(now, created_at + timedelta(days=rnd.uniform(0, 30)))
+
+        yield (
+            tenant_id,
+            f"{rnd.choice(VERBS)} {' '.join(rnd.choices(NOUNS, k=rnd.randint(2, 5)))} #{number}",
+            project_id,
+            rnd.choice(requirements_by_project[project_id]),
+            rnd.choice(leads),
+            rnd.choice(developers) if rnd.random() > 0.1 else None,
+            start_time,
+            end_time,
+            status,
+            created_at,
+            updated_at,
+        )
+
+
+def time_entry_rows(rnd, tenant_id, size, tasks, now):
+    # tasks: (id, requirement_id, project_id, assigned_to, created_at)
+    if not tasks:
+        return
+
+    for _ in range(size["time_entries"]):
+        task_id, requirement_id, project_id, developer_id, created_at = rnd.choice(tasks)
+        started_at = created_at + timedelta(
+            seconds=rnd.uniform(0, max(0.0, (now - created_at).total_seconds() - 8 * 3600))
+        )
+        yield (
+            tenant_id, task_id, requirement_id, project_id, developer_id,
+            started_at.replace(microsecond=0),
+            rnd.choice((15, 30, 45, 60, 90, 120, 180, 240, 480)) * 60,
+            now,
+        )
+
+
+# ==============================
+# SEED
+# ==============================
+
+def seed_tenant(cursor, rnd, tenant_id, size, password_hash, now, timings):
+    cursor.execute(
+        "INSERT INTO tenants (id, name, created_at) VALUES (%s, %s, %s)",
+        (tenant_id, f"Tenant {tenant_id}", now)
+    )
+
+    started = time.perf_counter()
+    copy_rows(
+        cursor, "users",
+        ["tenant_id", "name", "role", "email", "password", "created_at", "updated_at"],
+        user_rows(tenant_id, size, password_hash, now)
+    )
+    users = f"SELECT id FROM users WHERE tenant_id = {tenant_id} AND role = '{{}}' ORDER BY id"
+    managers = fetch_ids(cursor, users.format("PROJECT_MANAGER"))
+    leads = fetch_ids(cursor, users.format("LEAD"))
+    developers = fetch_ids(cursor, users.format("DEVELOPER"))
+    timings["users"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    copy_rows(
+        cursor, "projects",
+        ["tenant_id", "name", "project_owner", "created_by", "created_at", "updated_at"],
+        project_rows(rnd, tenant_id, size, managers, leads, now)
+    )
+    cursor.execute("SELECT id, created_at FROM projects WHERE tenant_id = %s ORDER BY id", (tenant_id,))
+    projects = cursor.fetchall()
+    timings["projects"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    copy_rows(
+        cursor, "requirements",
+        ["tenant_id", "requirement", "project_id", "created_by", "created_at", "updated_at"],
+        requirement_rows(rnd, tenant_id, projects, managers)
+    )
+    requirements_by_project = {}
+    cursor.execute("SELECT id, project_id FROM requirements WHERE tenant_id = %s", (tenant_id,))
+    for requirement_id, project_id in cursor.fetchall():
+        requirements_by_project.setdefault(project_id, []).append(requirement_id)
+    timings["requirements"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    copy_rows(
+        cursor, "tasks",
+        ["tenant_id", "task", "project_id", "requirement_id", "created_by", "assigned_to",
+         "start_time", "end_time", "status", "created_at", "updated_at"],
+        task_rows(rnd, tenant_id, size, projects, requirements_by_project, developers, leads, now)
+    )
+    timings["tasks"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    cursor.execute(
+        "SELECT id, requirement_id, project_id, assigned_to, created_at FROM tasks "
+        "WHERE tenant_id = %s AND assigned_to IS NOT NULL AND status <> 'NOT_STARTED'",
+        (tenant_id,)
+    )
+    copy_rows(
+        cursor, "time_entries",
+        ["tenant_id", "task_id", "requirement_id", "project_id", "developer_id",
+         "started_at", "duration_seconds", "created_at"],
+        time_entry_rows(rnd, tenant_id, size, cursor.fetchall(), now)
+    )
+    timings["time_entries"] += time.perf_counter() - started
+
+
+def seed(size, tenants, password, reset, rnd):
+    now = datetime.utcnow().replace(microsecond=0)
+    timings = dict.fromkeys(("users", "projects", "requirements", "tasks", "time_entries"), 0.0)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+
+        if reset:
+            cursor.execute(
+                "TRUNCATE effort_totals, weekly_effort, time_entries, "
+                "task_counters, tasks, requirements, projects, users, tenants "
+                "RESTART IDENTITY CASCADE"
+            )
+        else:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM users)")
+            if cursor.fetchone()[0]:
+                raise SystemExit("Database is not empty; use --reset to replace its data")
+            cursor.execute("DELETE FROM tenants")
+
+        password_hash = hash_password_sync(password)
+        for tenant_id in range(1, tenants + 1):
+            seed_tenant(cursor, rnd, tenant_id, size, password_hash, now, timings)
+        cursor.execute("SELECT setval('tenants_id_seq', %s)", (tenants,))
+
+        raw.commit()
+    finally:
+        raw.close()
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        rebuild(db)
+    timings["counters"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        rebuild_effort(db)
+    timings["effort"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(
+            text(
+                "ANALYZE tenants, users, projects, requirements, tasks, task_counters, "
+                "time_entries, effort_totals, weekly_effort"
+            )
+        )
+    timings["analyze"] = time.perf_counter() - started
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic organisation")
+    parser.add_argument("--size", choices=SIZES, default="small")
+    for name in SIZES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int, help=f"override the preset's {name}")
+    parser.add_argument("--tenants", type=int, default=1, help="organisations, each with the whole preset")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="TRUNCATE existing data first")
+    args = parser.parse_args()
+
+    size = dict(SIZES[args.size])
+    for name in size:
+        if getattr(args, name) is not None:
+            size[name] = getattr(args, name)
+
+    if min(size["managers"], size["leads"], size["developers"], size["projects"], args.tenants) < 1:
+        sys.exit("Need at least one manager, lead, developer and project")
+
+    started = time.perf_counter()
+    timings = seed(size, args.tenants, args.password, args.reset, random.Random(args.random_seed))
+
+    for step, seconds in timings.items():
+        print(f"{step:<13} {seconds:7.1f}s")
+    print(f"{'total':<13} {time.perf_counter() - started:7.1f}s")
+    print(", ".join(f"{count} {name}" for name, count in size.items()) + f" per tenant, {args.tenants} tenant(s)")
+    print(f"Log in as manager1@example.com / lead1@example.com / dev1@example.com, password {args.password!r}")
+
+
+if __name__ == "__main__":
+    main()
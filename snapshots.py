@@ -0,0 +1,218 @@
+# snapshots.py
+#
+# Daily task status history per project, for burndown and velocity.
+#
+# Once a day (SNAPSHOT_AT, UTC) the app copies the project rows of
+# task_counters into project_daily_status - one INSERT ... SELECT over the
+# projects, no task scan. It also runs at startup, so the current day is
+# covered after a deploy; a later run on the same day overwrites that
+# day's row. With several workers, a Postgres advisory lock makes sure
+# only one of them writes.
+#
+# Reading a burndown / velocity series costs one row per day shown, plus
+# the live counter for today. Days the job missed (app down) repeat the
+# day before. History starts with the first snapshot: there is no
+# activity log to rebuild earlier days from.
+#
+#   python snapshots.py take            # e.g. from cron with SNAPSHOTS=0
+#
+# Settings (environment):
+#   SNAPSHOTS      0 to disable the in-process job (default 1)
+#   SNAPSHOT_AT    HH:MM UTC of the daily run (default 23:55)
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, time as dtime
+
+from sqlalchemy import select, func, text, literal, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from counters import get_counter
+from database import AsyncSessionLocal
+from models import Project, TaskCounter, ProjectDailyStatus
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS", "1") == "1"
+SNAPSHOT_AT = dtime.fromisoformat(os.getenv("SNAPSHOT_AT", "23:55"))
+
+SNAPSHOT_MAX_DAYS = 366
+SNAPSHOT_MAX_WEEKS = 52
+
+# pg_try_advisory_xact_lock key ("snap")
+SNAPSHOT_LOCK_KEY = 0x736E6170
+
+STATUS_COLUMNS = ("not_started", "in_progress", "completed")
+
+
+# ==============================
+# WRITE SIDE (the job)
+# ==============================
+
+def snapshot_statement(day):
+    # Projects without a counter row have no tasks yet: zeros
+    counts = select(
+        Project.id,
+        literal(day, Date),
+        *(func.coalesce(getattr(TaskCounter, column), 0) for column in STATUS_COLUMNS),
+        func.now()
+    ).outerjoin(
+        TaskCounter,
+        (TaskCounter.scope == "project") & (TaskCounter.scope_id == Project.id)
+    )
+
+    stmt = pg_insert(ProjectDailyStatus).from_select(
+        ["project_id", "day", *STATUS_COLUMNS, "taken_at"], counts
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[ProjectDailyStatus.project_id, ProjectDailyStatus.day],
+        set_={column: getattr(stmt.excluded, column) for column in (*STATUS_COLUMNS, "taken_at")}
+    )
+
+
+async def take_snapshot(db: AsyncSession):
+    # Today's row for every project (counts as of now); None if another
+    # worker is taking it right now
+    day = datetime.utcnow().date()
+
+    locked = await db.scalar(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SNAPSHOT_LOCK_KEY}
+    )
+    if not locked:
+        await db.rollback()
+        return None
+
+    result = await db.execute(snapshot_statement(day))
+    await db.commit()
+    return result.rowcount
+
+
+def next_run(now):
+    run = datetime.combine(now.date(), SNAPSHOT_AT)
+    if run <= now:
+        run += timedelta(days=1)
+    return run
+
+
+async def run_snapshots():
+    # Lifespan task: once at startup, then daily at SNAPSHOT_AT
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                rows = await take_snapshot(db)
+            if rows is not None:
+                logger.info("project status snapshot: %s projects", rows)
+        except Exception:
+            logger.exception("project status snapshot failed")
+
+        now = datetime.utcnow()
+        await asyncio.sleep((next_run(now) - now).total_seconds())
+
+
+# ==============================
+# READ SIDE
+# ==============================
+
+async def daily_series(db: AsyncSession, project_id, first, last):
+    # [(day, {status counts})] from `first` to `last`, gaps carried forward,
+    # `last` from the live counter when it is today
+    today = datetime.utcnow().date()
+
+    columns = (ProjectDailyStatus.day, *(getattr(ProjectDailyStatus, c) for c in STATUS_COLUMNS))
+    rows = (await db.execute(
+        select(*columns).filter(
+            ProjectDailyStatus.project_id == project_id,
+            ProjectDailyStatus.day >= first,
+            ProjectDailyStatus.day <= last
+        ).order_by(ProjectDailyStatus.day)
+    )).all()
+
+    # Last snapshot before the window, to carry into its first days
+    before = (await db.execute(
+        select(*columns).filter(
+            ProjectDailyStatus.project_id == project_id,
+            ProjectDailyStatus.day < first
+        ).order_by(ProjectDailyStatus.day.desc()).limit(1)
+    )).first()
+
+    by_day = {row.day: dict(zip(STATUS_COLUMNS, row[1:])) for row in rows}
+    if last == today:
+        counter = await get_counter(db, "project", project_id)
+        by_day[today] = {column: getattr(counter, column) for column in STATUS_COLUMNS}
+
+    current = dict(zip(STATUS_COLUMNS, before[1:])) if before else None
+    series = []
+    day = first
+    while day <= last:
+        current = by_day.get(day, current)
+        if current is not None:
+            series.append((day, current))
+        day += timedelta(days=1)
+    return series
+
+
+async def burndown(db: AsyncSession, project_id, days):
+    last = datetime.utcnow().date()
+    first = last - timedelta(days=days - 1)
+
+    return [
+        {
+            "day": day,
+            "remaining": counts["not_started"] + counts["in_progress"],
+            "completed": counts["completed"],
+            "total": sum(counts.values()),
+        }
+        for day, counts in await daily_series(db, project_id, first, last)
+    ]
+
+
+async def velocity(db: AsyncSession, project_id, weeks):
+    # Net tasks completed per week (Monday to Sunday; the current week so
+    # far). Reopened tasks count against the week they were reopened in.
+    last = datetime.utcnow().date()
+    this_week = last - timedelta(days=last.weekday())
+    first_week = this_week - timedelta(weeks=weeks - 1)
+
+    # The Sunday before the first week is the baseline
+    series = dict(await daily_series(db, project_id, first_week - timedelta(days=1), last))
+
+    result = []
+    for number in range(weeks):
+        week = first_week + timedelta(weeks=number)
+        start = series.get(week - timedelta(days=1))
+        end = series.get(min(week + timedelta(days=6), last))
+        result.append({
+            "week": week,
+            "completed": end["completed"] - start["completed"] if start and end else None,
+        })
+    return result
+
+
+# ==============================
+# CLI
+# ==============================
+
+async def _take():
+    async with AsyncSessionLocal() as db:
+        return await take_snapshot(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project status snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("take", help="snapshot today's project status counts")
+    args = parser.parse_args()
+
+    if args.command == "take":
+        rows = asyncio.run(_take())
+        if rows is None:
+            print("Another process is taking the snapshot")
+        else:
+            print(f"Snapshot written: {rows} projects")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# sqltrace.py
+#
+# Per-request SQL instrumentation (replaces engine echo=True).
+#
+# For every traced request we record how many statements ran, the time
+# spent in the database and how often each statement *shape* (its
+# fingerprint: literals, bind parameters and IN lists collapsed) was
+# executed. The numbers go out as
+#
+#   Server-Timing: db;dur=12.4;desc="7 queries", app;dur=31.0
+#
+# (visible in the browser dev tools) and as one JSON log line on the
+# "sqltrace" logger. A fingerprint executed SQL_TRACE_N_PLUS_ONE times or
+# more in one request is reported as a suspected N+1, with the route.
+#
+# Modes (SQL_TRACE, or switched at runtime via /internal/sql-trace):
+#
+#   off      nothing is traced
+#   request  only requests with the header "X-SQL-Trace: 1" (default)
+#   all      every request
+
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+
+from database import APP_ENGINES
+
+logger = logging.getLogger("sqltrace")
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    # One JSON object per line on stderr, whatever the app's logging setup
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+SQL_TRACE_MODES = ("off", "request", "all")
+SQL_TRACE_N_PLUS_ONE = int(os.getenv("SQL_TRACE_N_PLUS_ONE", "5"))
+TRACE_HEADER = b"x-sql-trace"
+
+
+class TraceSettings:
+    def __init__(self, mode):
+        self.mode = mode if mode in SQL_TRACE_MODES else "request"
+
+
+settings = TraceSettings(os.getenv("SQL_TRACE", "request"))
+
+
+# ==============================
+# FINGERPRINTS
+# ==============================
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PARAMS = re.compile(r"\$\d+(?:::[\w\[\] ]+)?|%\(\w+\)s|\?")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement):
+    text = _STRINGS.sub("?", statement)
+    text = _PARAMS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _IN_LISTS.sub("(?...)", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+# ==============================
+# PER-REQUEST STATS
+# ==============================
+
+class RequestTrace:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self):
+        return [
+            {"count": count, "statement": statement}
+            for statement, count in self.fingerprints.most_common()
+            if count >= SQL_TRACE_N_PLUS_ONE
+        ]
+
+
+# The object is mutated, never replaced, so SQLAlchemy's greenlet copy of
+# the context still records into the request's trace
+_current = ContextVar("sql_trace", default=None)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("sql_trace_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current.get()
+    started = conn.info.get("sql_trace_started")
+    if trace is not None and started:
+        trace.record(statement, time.perf_counter() - started.pop())
+
+
+for _engine in APP_ENGINES:
+    event.listen(_engine.sync_engine, "before_cursor_execute", _before_execute)
+    event.listen(_engine.sync_engine, "after_cursor_execute", _after_execute)
+
+
+# ==============================
+# MIDDLEWARE
+# ==============================
+
+def _route_name(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path")
+
+
+class SQLTraceMiddleware:
+    # Plain ASGI middleware: works with streamed responses and adds the
+    # header on http.response.start without buffering the body
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope):
+        if settings.mode == "all":
+            return True
+        if settings.mode == "request":
+            return any(
+                name == TRACE_HEADER and value == b"1"
+                for name, value in scope.get("headers", ())
+            )
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _current.set(trace)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={trace.db_time * 1000:.1f};desc="{trace.queries} queries", '
+                    f"app;dur={total_ms:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self._log(scope, status[0], trace, time.perf_counter() - started)
+
+    def _log(self, scope, status, trace, duration):
+        route = _route_name(scope)
+
+        logger.info(json.dumps({
+            "method": scope.get("method"),
+            "route": route,
+            "status": status,
+            "queries": trace.queries,
+            "db_ms": round(trace.db_time * 1000, 1),
+            "total_ms": round(duration * 1000, 1),
+            "distinct_statements": len(trace.fingerprints),
+        }))
+
+        for entry in trace.repeated():
+            logger.warning(json.dumps({
+                "n_plus_one": True,
+                "method": scope.get("method"),
+                "route": route,
+                **entry,
+            }))
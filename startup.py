@@ -0,0 +1,156 @@
+# startup.py
+#
+# Worker startup, run from the FastAPI lifespan (main.py) before the first
+# request is accepted:
+#
+#   1. schema check  - one SELECT on alembic_version, compared with the
+#                      newest migration script. No DDL; the schema is
+#                      created by `python migrate.py upgrade`.
+#   2. pool warm-up  - opens STARTUP_POOL_CONNECTIONS connections per app
+#                      engine (primary and replica) so the first requests
+#                      don't pay for connection setup.
+#   3. templates     - compiles every template in templates/. Compiled
+#                      bytecode is kept on disk (TEMPLATE_CACHE_DIR), so a
+#                      restarted worker loads it instead of recompiling.
+#
+# GET /ready answers 503 until all of that is done (and again once
+# shutdown has started), then 200 with the step timings.
+#
+#   SCHEMA_CHECK                strict (refuse to start), warn or off (default strict)
+#   STARTUP_POOL_CONNECTIONS    default DB_POOL_SIZE
+#   TEMPLATE_CACHE_DIR          default: jinja's per-user directory in the system temp dir
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+import jinja2
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from database import APP_ENGINES, DB_POOL_SIZE, async_engine
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "strict")
+STARTUP_POOL_CONNECTIONS = int(os.getenv("STARTUP_POOL_CONNECTIONS", str(DB_POOL_SIZE)))
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.timings = {}
+
+    def as_dict(self):
+        return {"ready": self.ready, "startup_ms": self.timings}
+
+
+readiness = Readiness()
+
+
+# ==============================
+# SCHEMA CHECK
+# ==============================
+
+def expected_revision():
+    return ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+
+
+async def check_schema():
+    expected = expected_revision()
+
+    try:
+        async with async_engine.connect() as conn:
+            current = await conn.scalar(text("SELECT version_num FROM alembic_version"))
+    except DBAPIError:
+        current = None
+
+    if current == expected:
+        return
+
+    message = (
+        f"Database schema is at {current or 'no revision'}, "
+        f"this build expects {expected}: run `python migrate.py upgrade`"
+    )
+    if SCHEMA_CHECK == "strict":
+        raise SchemaOutOfDate(message)
+    logger.warning(message)
+
+
+# ==============================
+# WARM-UP
+# ==============================
+
+async def warm_pool(engine, connections):
+    # Hold them all at once, otherwise the pool would hand the same
+    # connection back every time
+    async with AsyncExitStack() as stack:
+        opened = await asyncio.gather(*(
+            stack.enter_async_context(engine.connect())
+            for _ in range(connections)
+        ))
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in opened))
+
+
+def template_environment(directory):
+    if TEMPLATE_CACHE_DIR:
+        Path(TEMPLATE_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(directory),
+        autoescape=True,
+        bytecode_cache=jinja2.FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+    )
+
+
+def warm_templates(env):
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+# ==============================
+# LIFESPAN STEPS
+# ==============================
+
+async def _timed(step, coro):
+    started = time.perf_counter()
+    result = await coro
+    readiness.timings[step] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def warm_up(template_env):
+    if SCHEMA_CHECK != "off":
+        await _timed("schema_check", check_schema())
+
+    if STARTUP_POOL_CONNECTIONS > 0:
+        connections = min(STARTUP_POOL_CONNECTIONS, DB_POOL_SIZE)
+        await _timed("pool", asyncio.gather(*(
+            warm_pool(engine, connections) for engine in APP_ENGINES
+        )))
+
+    # Compiling is CPU work; off the event loop like the bcrypt hashing
+    await _timed("templates", asyncio.to_thread(warm_templates, template_env))
+
+    readiness.ready = True
+    logger.info("Worker ready (%s)", ", ".join(
+        f"{step} {ms} ms" for step, ms in readiness.timings.items()
+    ))
+
+
+def shutting_down():
+    readiness.ready = False
@@ -0,0 +1,92 @@
+# stats.py
+#
+# Aggregate queries for the dashboards.
+# Each function returns everything a page needs in as few round trips as possible.
+
+from sqlalchemy import select, func, exists, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Project, Requirement, Task, User, TaskStatus
+
+
+# ==============================
+# PROJECT MANAGER DASHBOARD
+# ==============================
+
+def manager_dashboard_stats_query(manager_id: int):
+    # One statement, two single-row CTEs (projects / tasks) cross joined
+    has_requirements = exists().where(Requirement.project_id == Project.id)
+
+    project_stats = select(
+        func.count(Project.id).label("total_projects"),
+        func.count(Project.id).filter(
+            Project.project_owner == None
+        ).label("projects_without_lead"),
+        func.count(Project.id).filter(
+            ~has_requirements
+        ).label("projects_without_requirements")
+    ).filter(
+        Project.created_by == manager_id
+    ).cte("project_stats")
+
+    task_stats = select(
+        func.count(Task.id).label("total_tasks"),
+        func.count(Task.id).filter(
+            Task.status == TaskStatus.COMPLETED
+        ).label("completed_tasks"),
+        func.count(Task.id).filter(
+            Task.status != TaskStatus.COMPLETED
+        ).label("pending_tasks")
+    ).join(Project, Project.id == Task.project_id).filter(
+        Project.created_by == manager_id
+    ).cte("task_stats")
+
+    return select(project_stats, task_stats).select_from(
+        project_stats.join(task_stats, true())
+    )
+
+
+async def manager_dashboard_stats(db: AsyncSession, manager_id: int):
+    row = (await db.execute(
+        manager_dashboard_stats_query(manager_id)
+    )).one()
+
+    return row._asdict()
+
+
+def manager_recent_projects_query(manager_id: int, limit: int = 5):
+    # Lead name and requirement count come back as columns,
+    # so the template never touches project.owner / project.requirements
+    requirement_count = select(
+        func.count(Requirement.id)
+    ).filter(
+        Requirement.project_id == Project.id
+    ).scalar_subquery()
+
+    return select(
+        Project.id,
+        Project.name,
+        Project.created_at,
+        User.name.label("owner_name"),
+        requirement_count.label("requirement_count")
+    ).outerjoin(User, User.id == Project.project_owner) \
+     .filter(Project.created_by == manager_id) \
+     .order_by(Project.created_at.desc()) \
+     .limit(limit)
+
+
+async def manager_recent_projects(db: AsyncSession, manager_id: int, limit: int = 5):
+    return (await db.execute(
+        manager_recent_projects_query(manager_id, limit)
+    )).all()
+
+
+async def manager_lead_distribution(db: AsyncSession, manager_id: int):
+    return (await db.execute(
+        select(
+            User.name,
+            func.count(Project.id)
+        ).join(Project, Project.project_owner == User.id)
+         .filter(Project.created_by == manager_id)
+         .group_by(User.name)
+    )).all()
@@ -0,0 +1,60 @@
+# tenancy.py
+#
+# Automatic tenant scoping.
+#
+# A session whose `info["tenant_id"]` is set (get_db does it from the
+# login session) only sees that tenant's users, projects, requirements
+# and tasks: every ORM SELECT, UPDATE and DELETE it executes gets
+# `tenant_id = :tenant` added for each of those entities - joins,
+# subqueries, eager loads and relationship loads included - and new
+# objects are stamped with the tenant on flush.
+#
+# The extra predicate is also what makes the indexes (all tenant-leading)
+# usable and lets Postgres prune `tasks` to the tenant's partition.
+#
+# Sessions without a tenant (command line tools, the login lookup) are not
+# scoped. Plain-SQL statements (text()) are never scoped.
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from models import TenantScoped
+
+
+def tenant_criteria(tenant_id):
+    return with_loader_criteria(
+        TenantScoped,
+        lambda cls: cls.tenant_id == tenant_id,
+        include_aliases=True
+    )
+
+
+def scoped(statement, tenant_id):
+    # For statements compiled outside a session (EXPLAIN in migrate.py)
+    return statement.options(tenant_criteria(tenant_id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_tenant(state):
+    tenant_id = state.session.info.get("tenant_id")
+    if tenant_id is None:
+        return
+
+    # Lazy / column loads inherit the criteria from the query that loaded
+    # the parent object
+    if state.is_column_load or state.is_relationship_load:
+        return
+
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(tenant_criteria(tenant_id))
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_tenant(session, flush_context, instances):
+    tenant_id = session.info.get("tenant_id")
+    if tenant_id is None:
+        return
+
+    for obj in session.new:
+        if isinstance(obj, TenantScoped) and obj.tenant_id is None:
+            obj.tenant_id = tenant_id
@@ -0,0 +1,247 @@
+# timelog.py
+#
+# Time entries and effort rollups.
+#
+# Developers log time against their own tasks with `log_time`. The log
+# (`time_entries`) is append-only. Every insert also adds its duration to
+# the running totals in the same transaction:
+#
+#   effort_totals   per task / requirement / project / developer
+#   weekly_effort   per developer and week (Monday of started_at)
+#
+# so effort reports read a few rollup rows instead of summing years of
+# entries. Deleting a task leaves its entries and its "task" total alone
+# (time_entries.task_id has no foreign key); only a project delete
+# (purge.py) takes time out again. If the rollups ever drift (manual SQL,
+# a restore):
+#
+#   python timelog.py rebuild
+#
+# Settings (environment):
+#   TIME_ENTRY_MAX_HOURS   longest single entry (default 24)
+
+import argparse
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, delete, insert, literal, union_all, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import SessionLocal
+from models import TimeEntry, EffortTotal, WeeklyEffort
+
+TIME_ENTRY_MAX_HOURS = int(os.getenv("TIME_ENTRY_MAX_HOURS", "24"))
+
+EFFORT_SCOPES = ("task", "requirement", "project", "developer")
+
+# Clock skew allowance for "started in the future"
+FUTURE_GRACE = timedelta(minutes=5)
+
+
+def week_of(moment):
+    return (moment - timedelta(days=moment.weekday())).date()
+
+
+def format_duration(seconds):
+    # 9000 -> "2h 30m" (Jinja filter "duration")
+    minutes = (seconds or 0) // 60
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return f"{hours}h {minutes}m"
+    if hours:
+        return f"{hours}h"
+    return f"{minutes}m"
+
+
+# ==============================
+# WRITE SIDE
+# ==============================
+
+def entry_error(started_at, duration_seconds, now=None):
+    # None when the entry is acceptable, otherwise a message for the user
+    now = now or datetime.utcnow()
+    if duration_seconds <= 0:
+        return "duration must be positive"
+    if duration_seconds > TIME_ENTRY_MAX_HOURS * 3600:
+        return f"duration must be at most {TIME_ENTRY_MAX_HOURS} hours"
+    if started_at > now + FUTURE_GRACE:
+        return "started_at is in the future"
+    return None
+
+
+async def log_time(db: AsyncSession, task, developer_id, started_at, duration_seconds):
+    # Caller checks the task is the developer's and commits
+    entry = TimeEntry(
+        tenant_id=task.tenant_id,
+        task_id=task.id,
+        requirement_id=task.requirement_id,
+        project_id=task.project_id,
+        developer_id=developer_id,
+        started_at=started_at,
+        duration_seconds=duration_seconds
+    )
+    db.add(entry)
+    await record_entries(db, [entry])
+    return entry
+
+
+def _upsert(model, index_elements, rows):
+    stmt = pg_insert(model).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            "seconds": model.seconds + stmt.excluded.seconds,
+            "entries": model.entries + stmt.excluded.entries,
+            "updated_at": func.now(),
+        }
+    )
+
+
+async def record_entries(db: AsyncSession, entries, sign=1, scopes=EFFORT_SCOPES):
+    # sign=-1 takes deleted entries back out (project delete, purge.py)
+    totals = {}
+    weeks = {}
+    for entry in entries:
+        for scope, scope_id in (
+            ("task", entry.task_id),
+            ("requirement", entry.requirement_id),
+            ("project", entry.project_id),
+            ("developer", entry.developer_id),
+        ):
+            if scope not in scopes:
+                continue
+            row = totals.setdefault((scope, scope_id), [0, 0])
+            row[0] += sign * entry.duration_seconds
+            row[1] += sign
+
+        row = weeks.setdefault((entry.developer_id, week_of(entry.started_at)), [0, 0])
+        row[0] += sign * entry.duration_seconds
+        row[1] += sign
+
+    if not totals:
+        return
+
+    # Sorted, so concurrent writers lock rollup rows in the same order
+    await db.execute(_upsert(EffortTotal, [EffortTotal.scope, EffortTotal.scope_id], [
+        {"scope": scope, "scope_id": scope_id, "seconds": seconds, "entries": count}
+        for (scope, scope_id), (seconds, count) in sorted(totals.items())
+    ]))
+    await db.execute(_upsert(WeeklyEffort, [WeeklyEffort.developer_id, WeeklyEffort.week], [
+        {"developer_id": developer_id, "week": week, "seconds": seconds, "entries": count}
+        for (developer_id, week), (seconds, count) in sorted(weeks.items())
+    ]))
+
+
+# ==============================
+# READ SIDE
+# ==============================
+
+async def get_effort(db: AsyncSession, scope, scope_ids):
+    # {scope_id: {"seconds": ..., "entries": ...}}, zeros for no entries
+    scope_ids = list(scope_ids)
+    effort = {scope_id: {"seconds": 0, "entries": 0} for scope_id in scope_ids}
+
+    if scope_ids:
+        rows = (await db.execute(
+            select(EffortTotal.scope_id, EffortTotal.seconds, EffortTotal.entries).filter(
+                EffortTotal.scope == scope,
+                EffortTotal.scope_id.in_(scope_ids)
+            )
+        )).all()
+
+        for row in rows:
+            effort[row.scope_id] = {"seconds": row.seconds, "entries": row.entries}
+
+    return effort
+
+
+async def developer_weeks(db: AsyncSession, developer_id, weeks, today=None):
+    # The last `weeks` weeks, oldest first, including weeks with no entries
+    last = week_of(today or datetime.utcnow())
+    first = last - timedelta(weeks=weeks - 1)
+
+    rows = (await db.execute(
+        select(WeeklyEffort.week, WeeklyEffort.seconds, WeeklyEffort.entries).filter(
+            WeeklyEffort.developer_id == developer_id,
+            WeeklyEffort.week >= first,
+            WeeklyEffort.week <= last
+        )
+    )).all()
+    found = {row.week: row for row in rows}
+
+    result = []
+    for number in range(weeks):
+        week = first + timedelta(weeks=number)
+        row = found.get(week)
+        result.append({
+            "week": week,
+            "seconds": row.seconds if row else 0,
+            "entries": row.entries if row else 0,
+        })
+    return result
+
+
+# ==============================
+# REBUILD (repair drift)
+# ==============================
+
+def _totals_select(scope, column):
+    return select(
+        literal(scope).label("scope"),
+        column.label("scope_id"),
+        func.sum(TimeEntry.duration_seconds).label("seconds"),
+        func.count().label("entries"),
+        func.now().label("updated_at")
+    ).group_by(column)
+
+
+def rebuild(db):
+    week = func.date_trunc("week", TimeEntry.started_at).cast(Date)
+
+    db.execute(delete(EffortTotal))
+    db.execute(delete(WeeklyEffort))
+    db.execute(
+        insert(EffortTotal).from_select(
+            ["scope", "scope_id", "seconds", "entries", "updated_at"],
+            union_all(
+                _totals_select("task", TimeEntry.task_id),
+                _totals_select("requirement", TimeEntry.requirement_id),
+                _totals_select("project", TimeEntry.project_id),
+                _totals_select("developer", TimeEntry.developer_id)
+            )
+        )
+    )
+    db.execute(
+        insert(WeeklyEffort).from_select(
+            ["developer_id", "week", "seconds", "entries", "updated_at"],
+            select(
+                TimeEntry.developer_id,
+                week,
+                func.sum(TimeEntry.duration_seconds),
+                func.count(),
+                func.now()
+            ).group_by(TimeEntry.developer_id, week)
+        )
+    )
+    db.commit()
+
+    return (
+        db.scalar(select(func.count()).select_from(EffortTotal)),
+        db.scalar(select(func.count()).select_from(WeeklyEffort)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Effort rollups maintenance")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        with SessionLocal() as db:
+            totals, weeks = rebuild(db)
+        print(f"Rebuilt effort rollups: {totals} totals, {weeks} developer weeks")
+
+
+if __name__ == "__main__":
+    main()